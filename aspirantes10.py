@@ -8,11 +8,18 @@ import hashlib
 import base64
 import random
 import string
-from PIL import Image
-import paramiko
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from nucleo.cache_csv import cache_csv
+from nucleo.delta_log import anexar_operaciones, operacion_anexar
+from nucleo.escritura_atomica import version_de
+from nucleo.espejo_local import invalidar_espejo
+from nucleo.remoto import CargadorRemoto, EditorRemoto
+from nucleo.transaccion import recuperar_al_iniciar
+from nucleo.manifiesto_uploads import obtener_manifiesto_uploads
+from nucleo.transferencia import subir_por_bloques
+from nucleo.bandeja_correo import obtener_bandeja_correo
+from nucleo.pool_smtp import configuracion_smtp
+from nucleo.plantillas_correo import registrar_plantilla
+from nucleo.bitacora import registrar_evento
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -28,106 +35,93 @@ st.set_page_config(
 # SISTEMA DE CARGA REMOTA VIA SSH - CORREGIDO CON RUTAS CORRECTAS
 # =============================================================================
 
-class CargadorRemoto:
-    def __init__(self):
-        self.ssh = None
-        self.sftp = None
-        
-    def conectar(self):
-        """Establecer conexión SSH con el servidor remoto usando puerto 3792"""
-        try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # CONEXIÓN CON PUERTO 3792 - CORREGIDO
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],  # Usará 3792 del secrets.toml
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
-            return True
-        except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
-            return False
-    
-    def desconectar(self):
-        """Cerrar conexión SSH"""
-        try:
-            if self.sftp:
-                self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
-        except:
-            pass
-    
-    def crear_directorio_remoto(self, ruta):
-        """Crear directorio remoto recursivamente si no existe"""
-        try:
-            self.sftp.stat(ruta)
-            return True  # El directorio ya existe
-        except FileNotFoundError:
-            try:
-                # Crear directorio recursivamente
-                partes = ruta.strip('/').split('/')
-                path_actual = ''
-                for parte in partes:
-                    if parte:
-                        path_actual += '/' + parte
-                        try:
-                            self.sftp.stat(path_actual)
-                        except FileNotFoundError:
-                            self.sftp.mkdir(path_actual)
-                return True
-            except Exception as e:
-                st.error(f"❌ Error creando directorio {ruta}: {e}")
-                return False
-    
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto"""
-        try:
-            if not self.conectar():
-                return pd.DataFrame()
-            
-            # Verificar si el archivo existe en el servidor remoto
-            try:
-                self.sftp.stat(ruta_remota)
-            except FileNotFoundError:
-                # Si el archivo no existe, crear estructura vacía
-                return pd.DataFrame()
-            
-            # Leer archivo remoto
-            with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                # Intentar diferentes codificaciones
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
-                
-            return df
-            
-        except Exception as e:
-            st.warning(f"⚠️ Error cargando {os.path.basename(ruta_remota)}: {str(e)}")
-            return pd.DataFrame()
-        finally:
-            self.desconectar()
+class EditorAspirantes(EditorRemoto):
+    def avisar_conflicto(self, ruta_remota):
+        st.error(f"⚠️ {os.path.basename(ruta_remota)} cambió en el servidor mientras se registraba. "
+                 "Por favor, vuelve a enviar el formulario.")
 
 # =============================================================================
 # SISTEMA DE ENVÍO DE CORREOS ELECTRÓNICOS - CORREGIDO CON TUS CREDENCIALES
 # =============================================================================
 
+# Compilada una vez por proceso; cada envío solo rellena los huecos
+PLANTILLA_CONFIRMACION = registrar_plantilla(
+    "aspirantes_confirmacion",
+    "Confirmación de Pre-Inscripción - {matricula}",
+    """
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
+            <div style="text-align: center; background-color: #2E86AB; color: white; padding: 20px; border-radius: 10px 10px 0 0;">
+                <h1>🏥 Escuela de Enfermería</h1>
+                <h2>Confirmación de Pre-Inscripción</h2>
+            </div>
+
+            <div style="padding: 20px;">
+                <p>Estimado/a <strong>{nombre_estudiante}</strong>,</p>
+
+                <p>Hemos recibido exitosamente tu solicitud de pre-inscripción. A continuación encontrarás los detalles de tu registro:</p>
+
+                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
+                    <h3 style="color: #2E86AB; margin-top: 0;">📋 Datos de tu Registro</h3>
+                    <p><strong>Matrícula:</strong> {matricula}</p>
+                    <p><strong>Folio:</strong> {folio}</p>
+                    <p><strong>Programa:</strong> {programa}</p>
+                    <p><strong>Fecha de registro:</strong> {fecha}</p>
+                    <p><strong>Estatus:</strong> Pre-inscrito</p>
+                </div>
+
+                <h3 style="color: #2E86AB;">📬 Próximos Pasos</h3>
+                <ol>
+                    <li><strong>Revisión de documentos</strong> (2-3 días hábiles)</li>
+                    <li><strong>Correo de confirmación</strong> con fecha de examen</li>
+                    <li><strong>Examen de admisión</strong> (presencial/online)</li>
+                    <li><strong>Entrevista personal</strong> (si aplica)</li>
+                    <li><strong>Resultados finales</strong> (5-7 días después del examen)</li>
+                </ol>
+
+                <div style="background-color: #e8f4f8; padding: 15px; border-radius: 5px; margin: 15px 0;">
+                    <h4 style="color: #A23B72; margin-top: 0;">ℹ️ Información Importante</h4>
+                    <p>Guarda esta información, ya que tu matrícula y folio serán necesarios para cualquier consulta sobre tu proceso de admisión.</p>
+                </div>
+
+                <p>Si tienes alguna pregunta, no dudes en contactarnos:</p>
+                <ul>
+                    <li>📧 Email: admisiones@escuelaenfermeria.edu.mx</li>
+                    <li>📞 Teléfono: (55) 1234-5678</li>
+                    <li>🕒 Horario: Lunes a Viernes de 9:00 a 18:00 hrs</li>
+                </ul>
+
+                <p>¡Te deseamos mucho éxito en tu proceso de admisión!</p>
+
+                <p>Atentamente,<br>
+                <strong>Departamento de Admisiones</strong><br>
+                Escuela de Enfermería<br>
+                Formando Líderes en Salud Cardiovascular</p>
+            </div>
+
+            <div style="text-align: center; background-color: #f1f1f1; padding: 15px; border-radius: 0 0 10px 10px; font-size: 12px; color: #666;">
+                <p>Este es un correo automático, por favor no respondas a este mensaje.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+)
+
+
 class SistemaCorreos:
     def __init__(self):
         try:
-            # Usar las claves correctas de tu secrets.toml
-            self.smtp_server = st.secrets["smtp_server"]
-            self.smtp_port = st.secrets["smtp_port"]
-            self.smtp_username = st.secrets["email_user"]  # Corregido: email_user en lugar de smtp_username
-            self.smtp_password = st.secrets["email_password"]
-            self.email_from = st.secrets["email_user"]  # Usar el mismo email como remitente
+            # Las mismas claves de secrets.toml que usan el pool SMTP y escuela10.py
+            config = configuracion_smtp()
+            self.smtp_server = config['smtp_server']
+            self.smtp_port = config['smtp_port']
+            self.smtp_username = config['email_user']
+            self.smtp_password = config['email_password']
+            self.email_from = config['email_user']  # Usar el mismo email como remitente
+            if not self.smtp_username or not self.smtp_password:
+                raise KeyError("email_user / email_password")
             self.correos_habilitados = True
         except Exception as e:
             st.warning(f"⚠️ Configuración de correo no disponible: {e}")
@@ -140,85 +134,23 @@ class SistemaCorreos:
             return False
             
         try:
-            # Crear mensaje
-            mensaje = MIMEMultipart()
-            mensaje['From'] = self.email_from
-            mensaje['To'] = destinatario
-            mensaje['Subject'] = f"Confirmación de Pre-Inscripción - {matricula}"
-            
-            # Cuerpo del correo
-            cuerpo = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                    <div style="text-align: center; background-color: #2E86AB; color: white; padding: 20px; border-radius: 10px 10px 0 0;">
-                        <h1>🏥 Escuela de Enfermería</h1>
-                        <h2>Confirmación de Pre-Inscripción</h2>
-                    </div>
-                    
-                    <div style="padding: 20px;">
-                        <p>Estimado/a <strong>{nombre_estudiante}</strong>,</p>
-                        
-                        <p>Hemos recibido exitosamente tu solicitud de pre-inscripción. A continuación encontrarás los detalles de tu registro:</p>
-                        
-                        <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                            <h3 style="color: #2E86AB; margin-top: 0;">📋 Datos de tu Registro</h3>
-                            <p><strong>Matrícula:</strong> {matricula}</p>
-                            <p><strong>Folio:</strong> {folio}</p>
-                            <p><strong>Programa:</strong> {programa}</p>
-                            <p><strong>Fecha de registro:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-                            <p><strong>Estatus:</strong> Pre-inscrito</p>
-                        </div>
-                        
-                        <h3 style="color: #2E86AB;">📬 Próximos Pasos</h3>
-                        <ol>
-                            <li><strong>Revisión de documentos</strong> (2-3 días hábiles)</li>
-                            <li><strong>Correo de confirmación</strong> con fecha de examen</li>
-                            <li><strong>Examen de admisión</strong> (presencial/online)</li>
-                            <li><strong>Entrevista personal</strong> (si aplica)</li>
-                            <li><strong>Resultados finales</strong> (5-7 días después del examen)</li>
-                        </ol>
-                        
-                        <div style="background-color: #e8f4f8; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                            <h4 style="color: #A23B72; margin-top: 0;">ℹ️ Información Importante</h4>
-                            <p>Guarda esta información, ya que tu matrícula y folio serán necesarios para cualquier consulta sobre tu proceso de admisión.</p>
-                        </div>
-                        
-                        <p>Si tienes alguna pregunta, no dudes en contactarnos:</p>
-                        <ul>
-                            <li>📧 Email: admisiones@escuelaenfermeria.edu.mx</li>
-                            <li>📞 Teléfono: (55) 1234-5678</li>
-                            <li>🕒 Horario: Lunes a Viernes de 9:00 a 18:00 hrs</li>
-                        </ul>
-                        
-                        <p>¡Te deseamos mucho éxito en tu proceso de admisión!</p>
-                        
-                        <p>Atentamente,<br>
-                        <strong>Departamento de Admisiones</strong><br>
-                        Escuela de Enfermería<br>
-                        Formando Líderes en Salud Cardiovascular</p>
-                    </div>
-                    
-                    <div style="text-align: center; background-color: #f1f1f1; padding: 15px; border-radius: 0 0 10px 10px; font-size: 12px; color: #666;">
-                        <p>Este es un correo automático, por favor no respondas a este mensaje.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            mensaje.attach(MIMEText(cuerpo, 'html'))
+            # Crear mensaje desde la plantilla precompilada (HTML + texto plano)
+            mensaje = PLANTILLA_CONFIRMACION.mensaje(
+                self.email_from, destinatario,
+                nombre_estudiante=nombre_estudiante,
+                matricula=matricula,
+                folio=folio,
+                programa=programa,
+                fecha=datetime.now().strftime('%d/%m/%Y %H:%M')
+            )
             
-            # Enviar correo
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(mensaje)
+            # Encolar: el hilo de la bandeja lo envía (y reintenta) sin bloquear el registro
+            obtener_bandeja_correo().encolar(mensaje, [destinatario], remitente=self.email_from)
             
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al enviar correo de confirmación: {e}")
+            st.error(f"❌ Error al encolar correo de confirmación: {e}")
             return False
 
 # =============================================================================
@@ -230,27 +162,60 @@ class SistemaInscritos:
         # RUTAS CORREGIDAS - usando la estructura que necesitas
         self.BASE_DIR_REMOTO = st.secrets["remote_dir"]  # "/home/POLANCO6/ESCUELA"
         
-        # Archivos CSV en las rutas correctas
-        self.archivo_inscritos = os.path.join(self.BASE_DIR_REMOTO, "datos", "inscritos.csv")
-        self.archivo_usuarios = os.path.join(self.BASE_DIR_REMOTO, "config", "usuarios.csv")
-        
         # Carpeta para documentos PDF
         self.carpeta_documentos = os.path.join(self.BASE_DIR_REMOTO, "uploads")
         
-        # Instancia del cargador remoto
-        self.cargador_remoto = CargadorRemoto()
+        # Instancias del cargador y del editor remotos (sesión SFTP del pool compartido)
+        self.cargador_remoto = CargadorRemoto(avisar_faltantes=False)
+        self.editor = EditorAspirantes(self.cargador_remoto)
+        
+        # Archivos CSV en las rutas correctas
+        self.archivo_inscritos = self.editor.obtener_ruta_archivo('inscritos')
+        self.archivo_usuarios = self.editor.obtener_ruta_archivo('usuarios')
         
         # Instancia del sistema de correos
         self.sistema_correos = SistemaCorreos()
         
-        # Cargar datos iniciales
-        self.cargar_datos()
+        # Versión remota de cada CSV al cargarlo (los concat de registro pierden df.attrs)
+        self.versiones = {}
+        
+        # Los CSV se piden al servidor la primera vez que se usan (el formulario de
+        # inscripción): la portada, los programas y los testimonios no abren SSH
+        self._df_inscritos = None
+        self._df_usuarios = None
+    
+    @property
+    def df_inscritos(self):
+        if self._df_inscritos is None:
+            self.cargar_datos()
+        return self._df_inscritos
+    
+    @df_inscritos.setter
+    def df_inscritos(self, df):
+        self._df_inscritos = df
+    
+    @property
+    def df_usuarios(self):
+        if self._df_usuarios is None:
+            self.cargar_datos()
+        return self._df_usuarios
+    
+    @df_usuarios.setter
+    def df_usuarios(self, df):
+        self._df_usuarios = df
     
     def cargar_datos(self):
         """Cargar datos de inscritos desde el servidor remoto"""
+        # Completar migraciones que quedaron a medio aplicar antes de leer las tablas
+        try:
+            recuperar_al_iniciar()
+        except Exception as e:
+            st.warning(f"⚠️ No se pudo revisar el registro de transacciones: {e}")
+        
         try:
             # Cargar inscritos - desde datos/inscritos.csv
             self.df_inscritos = self.cargador_remoto.cargar_csv_remoto(self.archivo_inscritos)
+            self.versiones[self.archivo_inscritos] = version_de(self.df_inscritos)
             if self.df_inscritos.empty:
                 self.df_inscritos = pd.DataFrame(columns=[
                     'matricula', 'fecha_registro', 'nombre_completo', 'email', 
@@ -260,6 +225,7 @@ class SistemaInscritos:
             
             # Cargar usuarios - desde config/usuarios.csv
             self.df_usuarios = self.cargador_remoto.cargar_csv_remoto(self.archivo_usuarios)
+            self.versiones[self.archivo_usuarios] = version_de(self.df_usuarios)
             if self.df_usuarios.empty:
                 self.df_usuarios = pd.DataFrame(columns=[
                     'usuario', 'password', 'rol', 'nombre', 'email', 
@@ -282,6 +248,10 @@ class SistemaInscritos:
     def guardar_datos(self):
         """Guardar datos de inscritos en el servidor remoto - RUTAS CORREGIDAS"""
         try:
+            # Una sola sesión del pool para directorios + ambos CSV
+            if not self.cargador_remoto.conectar():
+                return False
+            
             # Crear directorios remotos si no existen
             if not self.crear_estructura_directorios():
                 return False
@@ -299,6 +269,8 @@ class SistemaInscritos:
         except Exception as e:
             st.error(f"❌ Error guardando datos de inscritos: {e}")
             return False
+        finally:
+            self.cargador_remoto.desconectar()
     
     def crear_estructura_directorios(self):
         """Crear estructura de directorios remota si no existe"""
@@ -321,41 +293,52 @@ class SistemaInscritos:
                 if not self.cargador_remoto.crear_directorio_remoto(directorio):
                     return False
             
-            self.cargador_remoto.desconectar()
             return True
             
         except Exception as e:
             st.error(f"❌ Error creando estructura de directorios: {e}")
             return False
+        finally:
+            self.cargador_remoto.desconectar()
     
-    def guardar_dataframe_remoto(self, dataframe, archivo_remoto):
-        """Guardar DataFrame en el servidor remoto"""
+    def anexar_registro_remoto(self, nuevo_inscrito, nuevo_usuario):
+        """Añadir solo las filas nuevas a inscritos.csv y usuarios.csv (sin reescribirlos)"""
         try:
             if not self.cargador_remoto.conectar():
-                st.error("❌ No se pudo conectar al servidor remoto")
-                return False
-            
-            # Crear directorio si no existe
-            directorio = os.path.dirname(archivo_remoto)
-            if not self.cargador_remoto.crear_directorio_remoto(directorio):
                 return False
             
-            # Convertir DataFrame a CSV en memoria
-            csv_data = dataframe.to_csv(index=False, encoding='utf-8')
-            
-            # Subir al servidor remoto
-            with self.cargador_remoto.sftp.file(archivo_remoto, 'w') as archivo_remoto_obj:
-                archivo_remoto_obj.write(csv_data)
-            
-            self.cargador_remoto.desconectar()
+            tablas = [(self.archivo_inscritos, nuevo_inscrito, self.df_inscritos),
+                      (self.archivo_usuarios, nuevo_usuario, self.df_usuarios)]
+            for archivo, fila, dataframe in tablas:
+                try:
+                    if anexar_operaciones(self.cargador_remoto.sftp, archivo, [operacion_anexar(fila)]):
+                        cache_csv.invalidar(archivo)
+                except FileNotFoundError:
+                    # Primera fila de esta tabla: solo ella se crea completa (la otra ya recibió su anexo)
+                    if not self.crear_estructura_directorios():
+                        return False
+                    if not self.guardar_dataframe_remoto(dataframe, archivo):
+                        return False
+                invalidar_espejo(archivo)
             return True
             
         except Exception as e:
             st.error(f"❌ Error al guardar en remoto: {e}")
             return False
+        finally:
+            self.cargador_remoto.desconectar()
     
-    def guardar_archivo_remoto(self, contenido_bytes, ruta_remota):
-        """Guardar archivo físico en el servidor remoto"""
+    def guardar_dataframe_remoto(self, dataframe, archivo_remoto):
+        """Guardar DataFrame en el servidor remoto (temporal + rename, solo si nadie lo cambió desde la carga)"""
+        version_esperada = self.versiones.get(archivo_remoto, version_de(dataframe))
+        if not self.editor.guardar_dataframe_remoto(dataframe, archivo_remoto, version_esperada,
+                                                    crear_directorio=True):
+            return False
+        self.versiones[archivo_remoto] = version_de(dataframe)
+        return True
+    
+    def guardar_archivo_remoto(self, contenido, ruta_remota, progreso=None):
+        """Guardar archivo físico en el servidor remoto (bytes u objeto tipo archivo, por bloques)"""
         try:
             if not self.cargador_remoto.conectar():
                 return False
@@ -365,16 +348,21 @@ class SistemaInscritos:
             if not self.cargador_remoto.crear_directorio_remoto(directorio):
                 return False
             
-            # Guardar archivo
-            with self.cargador_remoto.sftp.file(ruta_remota, 'wb') as archivo_remoto:
-                archivo_remoto.write(contenido_bytes)
+            # Guardar archivo (los documentos de uploads/ quedan registrados en su manifiesto)
+            if directorio.rstrip('/') == self.carpeta_documentos.rstrip('/'):
+                obtener_manifiesto_uploads(self.carpeta_documentos).subir(
+                    self.cargador_remoto.sftp, os.path.basename(ruta_remota), contenido, progreso=progreso
+                )
+            else:
+                subir_por_bloques(self.cargador_remoto.sftp, contenido, ruta_remota, progreso=progreso)
             
-            self.cargador_remoto.desconectar()
             return True
             
         except Exception as e:
             st.error(f"❌ Error guardando archivo remoto: {e}")
             return False
+        finally:
+            self.cargador_remoto.desconectar()
     
     def generar_matricula_inscrito(self):
         """Generar matrícula única para inscrito"""
@@ -443,8 +431,12 @@ class SistemaInscritos:
             else:
                 self.df_usuarios = pd.concat([self.df_usuarios, nuevo_user_df], ignore_index=True)
             
-            # Guardar datos en servidor remoto
-            if self.guardar_datos():
+            # Guardar en servidor remoto solo las dos filas nuevas
+            if self.anexar_registro_remoto(nuevo_inscrito, nuevo_usuario):
+                registrar_evento('Sistema', 'PREINSCRIPCION',
+                                 f"Aspirante {datos_inscrito['nombre_completo']} pre-inscrito. "
+                                 f"Matrícula: {matricula}, Folio: {nuevo_inscrito['folio']}")
+                
                 # ENVIAR CORREO DE CONFIRMACIÓN
                 correo_enviado = self.sistema_correos.enviar_correo_confirmacion(
                     destinatario=datos_inscrito['email'],
@@ -455,7 +447,7 @@ class SistemaInscritos:
                 )
                 
                 if correo_enviado:
-                    st.success("📧 ¡Correo de confirmación enviado exitosamente!")
+                    st.success("📧 ¡Correo de confirmación en camino!")
                 else:
                     st.warning("⚠️ Registro completado, pero no se pudo enviar el correo de confirmación.")
                 
@@ -467,24 +459,55 @@ class SistemaInscritos:
             st.error(f"❌ Error al registrar inscrito: {e}")
             return None, None
     
+    def nombre_documento(self, matricula, nombre_completo, tipo_documento, archivo):
+        """Nombre estandarizado en uploads/ - USANDO LA MISMA MATRÍCULA"""
+        timestamp = datetime.now().strftime('%y%m%d%H%M%S')
+        nombre_limpio = ''.join(c for c in nombre_completo if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        nombre_limpio = nombre_limpio.replace(' ', '_')[:30]
+        tipo_limpio = tipo_documento.replace(' ', '_').upper()
+        
+        extension = archivo.name.split('.')[-1] if '.' in archivo.name else 'pdf'
+        return f"{matricula}_{nombre_limpio}_{timestamp}_{tipo_limpio}.{extension}"
+    
+    def guardar_documentos(self, matricula, nombre_completo, documentos):
+        """Subir a la vez todos los documentos de la solicitud sobre una sola conexión
+        
+        `documentos` es una lista de (tipo_documento, archivo). Devuelve
+        (guardados, fallos): listas de (tipo_documento, nombre_archivo) y de
+        (tipo_documento, error).
+        """
+        nombres = [(tipo, self.nombre_documento(matricula, nombre_completo, tipo, archivo), archivo)
+                   for tipo, archivo in documentos]
+        try:
+            if not self.cargador_remoto.conectar():
+                return [], [(tipo, "sin conexión al servidor") for tipo, _, _ in nombres]
+            
+            if not self.cargador_remoto.crear_directorio_remoto(self.carpeta_documentos):
+                return [], [(tipo, "no se pudo crear uploads/") for tipo, _, _ in nombres]
+            
+            errores = obtener_manifiesto_uploads(self.carpeta_documentos).subir_varios(
+                self.cargador_remoto.sftp, [(nombre, archivo) for _, nombre, archivo in nombres]
+            )
+            guardados = [(tipo, nombre) for tipo, nombre, _ in nombres if nombre not in errores]
+            fallos = [(tipo, errores[nombre]) for tipo, nombre, _ in nombres if nombre in errores]
+            return guardados, fallos
+            
+        except Exception as e:
+            return [], [(tipo, e) for tipo, _, _ in nombres]
+        finally:
+            self.cargador_remoto.desconectar()
+    
     def guardar_documento(self, matricula, nombre_completo, tipo_documento, archivo):
         """Guardar documento del inscrito en uploads/ - CORREGIDO: usa la MISMA matrícula"""
         try:
-            # Generar nombre de archivo estandarizado
-            timestamp = datetime.now().strftime('%y%m%d%H%M%S')
-            nombre_limpio = ''.join(c for c in nombre_completo if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            nombre_limpio = nombre_limpio.replace(' ', '_')[:30]
-            tipo_limpio = tipo_documento.replace(' ', '_').upper()
-            
-            # Nombre del archivo PDF - USANDO LA MISMA MATRÍCULA
-            extension = archivo.name.split('.')[-1] if '.' in archivo.name else 'pdf'
-            nombre_archivo = f"{matricula}_{nombre_limpio}_{timestamp}_{tipo_limpio}.{extension}"
+            nombre_archivo = self.nombre_documento(matricula, nombre_completo, tipo_documento, archivo)
             
             # Ruta completa en servidor remoto (en uploads/)
             ruta_completa = os.path.join(self.carpeta_documentos, nombre_archivo)
             
             # Guardar archivo en servidor remoto
-            if not self.guardar_archivo_remoto(archivo.getvalue(), ruta_completa):
+            # Se envía el archivo por bloques, sin copiarlo entero con getvalue()
+            if not self.guardar_archivo_remoto(archivo, ruta_completa):
                 return None
             
             return nombre_archivo  # Devolver el nombre del archivo guardado
@@ -493,7 +516,7 @@ class SistemaInscritos:
             st.error(f"❌ Error al guardar documento: {e}")
             return None
 
-# Instancia del sistema de inscritos
+# Instancia del sistema de inscritos (no toca el servidor hasta que se usan sus tablas)
 sistema_inscritos = SistemaInscritos()
 
 # =============================================================================
@@ -798,20 +821,18 @@ def mostrar_formulario_inscripcion():
                         (foto, "FOTOGRAFIA") if foto else None
                     ]
                     
-                    for doc_info in documentos_info:
-                        if doc_info and doc_info[0] is not None:
-                            try:
-                                nombre_archivo = sistema_inscritos.guardar_documento(
-                                    matricula_unica, nombre_completo, doc_info[1], doc_info[0]
-                                )
-                                if nombre_archivo:
-                                    documentos_guardados += 1
-                                    nombres_documentos.append(nombre_archivo)
-                                    st.success(f"✅ {doc_info[1]} guardado correctamente")
-                                else:
-                                    st.warning(f"⚠️ No se pudo guardar: {doc_info[1]}")
-                            except Exception as e:
-                                st.warning(f"⚠️ Error con {doc_info[1]}: {e}")
+                    # Los documentos se suben a la vez sobre una sola conexión
+                    guardados, fallos = sistema_inscritos.guardar_documentos(
+                        matricula_unica, nombre_completo,
+                        [(doc_info[1], doc_info[0]) for doc_info in documentos_info
+                         if doc_info and doc_info[0] is not None]
+                    )
+                    for tipo_documento, nombre_archivo in guardados:
+                        documentos_guardados += 1
+                        nombres_documentos.append(nombre_archivo)
+                        st.success(f"✅ {tipo_documento} guardado correctamente")
+                    for tipo_documento, error in fallos:
+                        st.warning(f"⚠️ Error con {tipo_documento}: {error}")
                     
                     # TERCERO: Registrar el inscrito con la MISMA matrícula y nombres de documentos
                     if documentos_guardados >= 3:  # Al menos los 3 documentos obligatorios
@@ -4,17 +4,24 @@ import numpy as np
 import os
 import json
 from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import paramiko
-from io import StringIO, BytesIO
+from nucleo.escritura_atomica import sellar_version, version_de
+from nucleo.transaccion import recuperar_al_iniciar
+from nucleo.indices import buscar_filas, buscar_posiciones
+from nucleo.datos_compartidos import obtener_datos_compartidos
+from nucleo.tablas_perezosas import materializar
+from nucleo.remoto import CargadorRemoto, EditorRemoto
+from nucleo.autenticacion import AutenticacionUsuarios
+from nucleo.manifiesto_uploads import obtener_manifiesto_uploads
+from nucleo.cache_bytes import cache_documentos
+from nucleo.transferencia import barra_progreso
+from nucleo.bandeja_correo import obtener_bandeja_correo
+from nucleo.pool_smtp import configuracion_smtp, obtener_pool_smtp
+from nucleo.plantillas_correo import Lista, registrar_plantilla
+from nucleo.monitor_salud import obtener_monitor_salud
+from nucleo.esquemas import asignar_valor
+from io import BytesIO
 import time
-import hashlib
 import base64
-import matplotlib.pyplot as plt
-import seaborn as sns
-from PIL import Image
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -30,130 +37,118 @@ st.set_page_config(
 # SISTEMA DE CARGA REMOTA VIA SSH - SOLO CARGA REMOTA
 # =============================================================================
 
-class CargadorRemoto:
-    def __init__(self):
-        self.ssh = None
-        self.sftp = None
-        
-    def conectar(self):
-        """Establecer conexión SSH con el servidor remoto"""
-        try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
-            return True
-        except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
-            return False
-    
-    def desconectar(self):
-        """Cerrar conexión SSH"""
-        try:
-            if self.sftp:
-                self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
-        except:
-            pass
-    
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto - SIN DATOS DE EJEMPLO"""
-        try:
-            if not self.conectar():
-                return pd.DataFrame()  # Devuelve DataFrame vacío si no puede conectar
-            
-            # Verificar si el archivo existe en el servidor remoto
-            try:
-                self.sftp.stat(ruta_remota)
-            except FileNotFoundError:
-                st.warning(f"📁 Archivo remoto no encontrado: {os.path.basename(ruta_remota)}")
-                return pd.DataFrame()  # DataFrame vacío si no existe
-            
-            # Leer archivo remoto
-            with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                # Intentar diferentes codificaciones
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
-                
-            st.success(f"✅ {os.path.basename(ruta_remota)} cargado desde servidor ({len(df)} registros)")
-            return df
-            
-        except Exception as e:
-            st.warning(f"⚠️ Error cargando {os.path.basename(ruta_remota)}: {str(e)}")
-            return pd.DataFrame()  # Siempre devuelve DataFrame vacío en caso de error
-        finally:
-            self.desconectar()
-    
-    def cargar_todos_los_datos(self):
-        """Cargar todos los archivos CSV del servidor remoto - SOLO CARGA REMOTA"""
-        
-        # RUTAS CORREGIDAS SEGÚN LA ESTRUCTURA DEL SERVIDOR
-        BASE_DIR_REMOTO = "/home/POLANCO6/ESCUELA"
-        
-        rutas_remotas = {
-            'inscritos': os.path.join(BASE_DIR_REMOTO, "datos", "inscritos.csv"),
-            'estudiantes': os.path.join(BASE_DIR_REMOTO, "datos", "estudiantes.csv"),
-            'egresados': os.path.join(BASE_DIR_REMOTO, "datos", "egresados.csv"),
-            'contratados': os.path.join(BASE_DIR_REMOTO, "datos", "contratados.csv"),
-            'actualizaciones_academicas': os.path.join(BASE_DIR_REMOTO, "datos", "actualizaciones_academicas.csv"),
-            'certificaciones': os.path.join(BASE_DIR_REMOTO, "datos", "certificaciones.csv"),
-            'programas_educativos': os.path.join(BASE_DIR_REMOTO, "datos", "programas_educativos.csv"),
-            'costos_programas': os.path.join(BASE_DIR_REMOTO, "datos", "costos_programas.csv"),
-            'usuarios': os.path.join(BASE_DIR_REMOTO, "config", "usuarios.csv"),
-            'roles_permisos': os.path.join(BASE_DIR_REMOTO, "config", "roles_permisos.csv"),
-            'bitacora': os.path.join(BASE_DIR_REMOTO, "datos", "bitacora.csv")
-        }
-        
-        datos_cargados = {}
-        
-        with st.spinner("🌐 Conectando al servidor remoto..."):
-            for nombre, ruta_remota in rutas_remotas.items():
-                # SOLO CARGAR DESDE REMOTO, NO USAR DATOS DE EJEMPLO
-                datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota)
-        
-        return datos_cargados
-
-# Instanciar el cargador remoto
+# Sesión SFTP de este script (tomada del pool del proceso)
 cargador_remoto = CargadorRemoto()
 
 # =============================================================================
-# CARGA DE TODOS LOS DATOS DESDE EL SERVIDOR REMOTO - SIN CACHE TEMPORAL
+# TABLAS DEL SERVIDOR REMOTO - SE CARGAN SOLO CUANDO UNA PANTALLA LAS USA
 # =============================================================================
 
-def cargar_datos_completos():
-    """Cargar todos los datos desde el servidor remoto - SIN CACHE"""
-    return cargador_remoto.cargar_todos_los_datos()
-
-# Cargar todos los datos SIN cache para forzar carga remota
-datos = cargar_datos_completos()
-
-# Asignar a variables globales
-df_inscritos = datos.get('inscritos', pd.DataFrame())
-df_estudiantes = datos.get('estudiantes', pd.DataFrame())
-df_egresados = datos.get('egresados', pd.DataFrame())
-df_contratados = datos.get('contratados', pd.DataFrame())
-df_actualizaciones = datos.get('actualizaciones_academicas', pd.DataFrame())
-df_certificaciones = datos.get('certificaciones', pd.DataFrame())
-df_programas = datos.get('programas_educativos', pd.DataFrame())
-df_costos = datos.get('costos_programas', pd.DataFrame())
-df_usuarios = datos.get('usuarios', pd.DataFrame())
-df_roles = datos.get('roles_permisos', pd.DataFrame())
-df_bitacora = datos.get('bitacora', pd.DataFrame())
+def avisar_fallo_tabla(nombre, ruta_remota, error):
+    """Aviso en pantalla cuando una tabla no se pudo cargar del servidor"""
+    archivo = os.path.basename(ruta_remota)
+    if isinstance(error, FileNotFoundError):
+        st.warning(f"📁 Archivo remoto no encontrado: {archivo}")
+    else:
+        st.warning(f"⚠️ Error cargando {archivo}: {error}")
+
+# Completar migraciones que quedaron a medio aplicar antes de leer las tablas
+try:
+    recuperar_al_iniciar()
+except Exception as e:
+    st.warning(f"⚠️ No se pudo revisar el registro de transacciones: {e}")
+
+# Cada tabla se pide al almacén del proceso la primera vez que se usa en el rerun
+# (un stat y descarga solo si cambió mtime/tamaño); las demás no tocan el servidor
+tablas = obtener_datos_compartidos().perezosas(al_fallar=avisar_fallo_tabla)
+
+# Variables globales (DataFrames compartidos de solo lectura: se editan sobre una copia)
+df_inscritos = tablas.tabla('inscritos')
+df_estudiantes = tablas.tabla('estudiantes')
+df_egresados = tablas.tabla('egresados')
+df_contratados = tablas.tabla('contratados')
+df_actualizaciones = tablas.tabla('actualizaciones_academicas')
+df_certificaciones = tablas.tabla('certificaciones')
+df_programas = tablas.tabla('programas_educativos')
+df_costos = tablas.tabla('costos_programas')
+df_usuarios = tablas.tabla('usuarios')
+df_roles = tablas.tabla('roles_permisos')
+df_bitacora = tablas.tabla('bitacora')
 
 # =============================================================================
 # SISTEMA DE ENVÍO DE EMAILS - VERSIÓN MEJORADA CON COPIA A NOTIFICATION_EMAIL
 # =============================================================================
 
+# Compilada una vez por proceso; cada envío solo rellena los huecos
+PLANTILLA_NOTIFICACION = registrar_plantilla(
+    "escuela_notificacion",
+    "✅ Confirmación de Proceso - Instituto Nacional de Cardiología",
+    """
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
+            <div style="text-align: center; background: linear-gradient(135deg, #003366 0%, #00509e 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0;">
+                <h2 style="margin: 0; font-size: 24px;">Instituto Nacional de Cardiología</h2>
+                <h3 style="margin: 10px 0 0 0; font-size: 18px; font-weight: normal;">Escuela de Enfermería</h3>
+            </div>
+
+            <div style="padding: 20px;">
+                <h3 style="color: #27ae60; margin-top: 0;">{titulo}</h3>
+
+                <p>Estimado(a) <strong>{nombre_completo}</strong>,</p>
+
+                <p>Le informamos que su proceso {mensaje_estado} en nuestro sistema académico.</p>
+
+                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
+                    <p style="font-weight: bold; margin-bottom: 10px;">📋 Detalles del proceso:</p>
+                    <table style="width: 100%; border-collapse: collapse;">
+                        <tr>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Usuario:</strong></td>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;">{usuario}</td>
+                        </tr>
+                        <tr>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Matrícula:</strong></td>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;">{matricula}</td>
+                        </tr>
+                        <tr>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Tipo de proceso:</strong></td>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;">{tipo_proceso}</td>
+                        </tr>
+                        <tr>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Fecha y hora:</strong></td>
+                            <td style="padding: 5px; border-bottom: 1px solid #eee;">{fecha}</td>
+                        </tr>
+                    </table>
+                </div>
+
+                <div style="background-color: #e8f5e8; padding: 15px; border-radius: 5px; margin: 15px 0;">
+                    <p style="font-weight: bold; margin-bottom: 10px;">📄 Documentos procesados:</p>
+                    <p>Total de documentos: <strong>{total_documentos}</strong></p>
+                    <ul style="margin: 10px 0; padding-left: 20px;">
+                        {documentos}
+                    </ul>
+                </div>
+
+                <p>El estado actual de su solicitud es: <strong style="color: #27ae60;">{tipo_proceso}</strong></p>
+
+                <p>Si usted no realizó esta acción o tiene alguna duda, por favor contacte al administrador del sistema inmediatamente.</p>
+
+                <div style="margin-top: 20px; padding: 15px; background-color: #fff3cd; border-radius: 5px;">
+                    <p style="margin: 0; font-size: 12px; color: #856404;">
+                        <strong>⚠️ Información importante:</strong><br>
+                        • Este es un mensaje automático, por favor no responda a este email.<br>
+                        • Sistema Académico - Instituto Nacional de Cardiología<br>
+                        • Copia enviada a: {notification_email}
+                    </p>
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+)
+
+
 class SistemaEmail:
     def __init__(self):
         self.config = self.obtener_configuracion_email()
@@ -161,13 +156,9 @@ class SistemaEmail:
     def obtener_configuracion_email(self):
         """Obtiene la configuración de email desde secrets.toml"""
         try:
-            return {
-                'smtp_server': st.secrets.get("smtp_server", "smtp.gmail.com"),
-                'smtp_port': st.secrets.get("smtp_port", 587),
-                'email_user': st.secrets.get("email_user", ""),
-                'email_password': st.secrets.get("email_password", ""),
-                'notification_email': st.secrets.get("notification_email", "")
-            }
+            config = configuracion_smtp()
+            config['notification_email'] = st.secrets.get("notification_email", "")
+            return config
         except Exception as e:
             st.error(f"Error al cargar configuración de email: {e}")
             return {}
@@ -211,10 +202,9 @@ class SistemaEmail:
             if not email_user or not email_password:
                 return False, "Credenciales no configuradas"
                 
-            server = smtplib.SMTP(config['smtp_server'], config['smtp_port'])
-            server.starttls()
-            server.login(email_user, email_password)
-            server.quit()
+            # Sesión del pool: la prueba valida (NOOP) o abre la misma conexión que usa la bandeja
+            pool = obtener_pool_smtp()
+            pool.liberar(pool.adquirir())
             
             return True, "✅ Conexión SMTP exitosa"
             
@@ -232,8 +222,8 @@ class SistemaEmail:
                 st.warning("⚠️ Las columnas 'usuario' o 'email' no existen en usuarios.csv")
                 return None
             
-            # Buscar usuario en el DataFrame
-            usuario_data = df_usuarios[df_usuarios['usuario'].astype(str).str.strip() == str(usuario).strip()]
+            # Buscar usuario en el índice de usuarios.csv
+            usuario_data = buscar_filas('usuarios', df_usuarios, 'usuario', usuario)
             
             if usuario_data.empty:
                 st.warning(f"⚠️ Usuario '{usuario}' no encontrado en usuarios.csv")
@@ -272,18 +262,6 @@ class SistemaEmail:
                     st.error("❌ No se pudo determinar el email destino")
                     return False
             
-            # Configurar servidor SMTP
-            server = smtplib.SMTP(config['smtp_server'], config['smtp_port'])
-            server.starttls()
-            server.login(config['email_user'], config['email_password'])
-            
-            # Crear mensaje
-            msg = MIMEMultipart()
-            msg['From'] = config['email_user']
-            msg['To'] = email_destino
-            msg['Cc'] = config['notification_email']  # AGREGAR COPIA AL EMAIL DE NOTIFICACIÓN
-            msg['Subject'] = f"✅ Confirmación de Proceso - Instituto Nacional de Cardiología"
-            
             # Determinar tipo de proceso
             if es_completado:
                 tipo_proceso = "COMPLETADO"
@@ -294,98 +272,33 @@ class SistemaEmail:
                 titulo = "💾 PROGRESO GUARDADO CORRECTAMENTE"
                 mensaje_estado = "se ha guardado correctamente"
             
-            # Cuerpo del email con formato HTML mejorado
-            cuerpo_html = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                    <div style="text-align: center; background: linear-gradient(135deg, #003366 0%, #00509e 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0;">
-                        <h2 style="margin: 0; font-size: 24px;">Instituto Nacional de Cardiología</h2>
-                        <h3 style="margin: 10px 0 0 0; font-size: 18px; font-weight: normal;">Escuela de Enfermería</h3>
-                    </div>
-                    
-                    <div style="padding: 20px;">
-                        <h3 style="color: #27ae60; margin-top: 0;">{titulo}</h3>
-                        
-                        <p>Estimado(a) <strong>{datos_inscripcion.get('nombre_completo', 'Usuario')}</strong>,</p>
-                        
-                        <p>Le informamos que su proceso {mensaje_estado} en nuestro sistema académico.</p>
-                        
-                        <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                            <p style="font-weight: bold; margin-bottom: 10px;">📋 Detalles del proceso:</p>
-                            <table style="width: 100%; border-collapse: collapse;">
-                                <tr>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Usuario:</strong></td>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;">{usuario_destino}</td>
-                                </tr>
-                                <tr>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Matrícula:</strong></td>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;">{datos_inscripcion.get('matricula', 'N/A')}</td>
-                                </tr>
-                                <tr>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Tipo de proceso:</strong></td>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;">{tipo_proceso}</td>
-                                </tr>
-                                <tr>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;"><strong>Fecha y hora:</strong></td>
-                                    <td style="padding: 5px; border-bottom: 1px solid #eee;">{datetime.now().strftime('%d/%m/%Y %H:%M')}</td>
-                                </tr>
-                            </table>
-                        </div>
-                        
-                        <div style="background-color: #e8f5e8; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                            <p style="font-weight: bold; margin-bottom: 10px;">📄 Documentos procesados:</p>
-                            <p>Total de documentos: <strong>{len(documentos_guardados)}</strong></p>
-                            <ul style="margin: 10px 0; padding-left: 20px;">
-                                {''.join([f'<li>{doc.get("nombre_original", "Documento")}</li>' for doc in documentos_guardados])}
-                            </ul>
-                        </div>
-                        
-                        <p>El estado actual de su solicitud es: <strong style="color: #27ae60;">{tipo_proceso}</strong></p>
-                        
-                        <p>Si usted no realizó esta acción o tiene alguna duda, por favor contacte al administrador del sistema inmediatamente.</p>
-                        
-                        <div style="margin-top: 20px; padding: 15px; background-color: #fff3cd; border-radius: 5px;">
-                            <p style="margin: 0; font-size: 12px; color: #856404;">
-                                <strong>⚠️ Información importante:</strong><br>
-                                • Este es un mensaje automático, por favor no responda a este email.<br>
-                                • Sistema Académico - Instituto Nacional de Cardiología<br>
-                                • Copia enviada a: {config['notification_email']}
-                            </p>
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(cuerpo_html, 'html'))
+            # Crear mensaje desde la plantilla precompilada (HTML + texto plano) - CON COPIA AL EMAIL DE NOTIFICACIÓN
+            msg = PLANTILLA_NOTIFICACION.mensaje(
+                config['email_user'], email_destino, copia=config['notification_email'],
+                titulo=titulo,
+                nombre_completo=datos_inscripcion.get('nombre_completo', 'Usuario'),
+                mensaje_estado=mensaje_estado,
+                usuario=usuario_destino,
+                matricula=datos_inscripcion.get('matricula', 'N/A'),
+                tipo_proceso=tipo_proceso,
+                fecha=datetime.now().strftime('%d/%m/%Y %H:%M'),
+                total_documentos=len(documentos_guardados),
+                documentos=Lista(doc.get("nombre_original", "Documento") for doc in documentos_guardados),
+                notification_email=config['notification_email']
+            )
             
-            # Enviar email con timeout - INCLUYENDO EL EMAIL DE NOTIFICACIÓN EN LOS DESTINATARIOS
+            # Encolar en la bandeja de salida - INCLUYENDO EL EMAIL DE NOTIFICACIÓN EN LOS DESTINATARIOS
+            # El envío SMTP (con reintentos) lo hace el hilo de la bandeja, sin bloquear la página
             destinatarios = [email_destino, config['notification_email']]
             
-            server.sendmail(config['email_user'], destinatarios, msg.as_string())
-            server.quit()
+            obtener_bandeja_correo().encolar(msg, destinatarios, remitente=config['email_user'])
             
-            st.success(f"✅ Email de confirmación enviado exitosamente a: {email_destino}")
-            st.success(f"✅ Copia enviada a: {config['notification_email']}")
+            st.success(f"✅ Email de confirmación en cola para: {email_destino}")
+            st.success(f"✅ Copia para: {config['notification_email']}")
             return True
             
-        except smtplib.SMTPAuthenticationError:
-            st.error("❌ Error de autenticación SMTP. Verifica:")
-            st.error("1. Tu email y contraseña de aplicación")
-            st.error("2. Que hayas habilitado la verificación en 2 pasos")
-            st.error("3. Que hayas creado una contraseña de aplicación")
-            return False
-            
-        except smtplib.SMTPConnectError:
-            st.error("❌ Error de conexión SMTP. Verifica:")
-            st.error("1. Tu conexión a internet")
-            st.error("2. Que el puerto 587 no esté bloqueado")
-            return False
-            
         except Exception as e:
-            st.error(f"❌ Error inesperado al enviar email: {e}")
+            st.error(f"❌ Error inesperado al encolar email: {e}")
             return False
 
     def enviar_email_confirmacion(self, usuario_destino, nombre_usuario, tipo_documento, nombre_archivo, tipo_accion="subida"):
@@ -414,15 +327,9 @@ sistema_email = SistemaEmail()
 # SISTEMA DE AUTENTICACIÓN Y SEGURIDAD - VERSIÓN MEJORADA
 # =============================================================================
 
-class SistemaAutenticacion:
+class SistemaAutenticacion(AutenticacionUsuarios):
     def __init__(self):
-        self.usuarios = df_usuarios
-        self.sesion_activa = False
-        self.usuario_actual = None
-        
-    def hash_password(self, password):
-        """Hash simple para contraseñas"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        super().__init__(df_usuarios)
     
     def verificar_login(self, usuario, password):
         """Verificar credenciales de usuario - VERSIÓN CORREGIDA CON BÚSQUEDA FLEXIBLE"""
@@ -438,10 +345,8 @@ class SistemaAutenticacion:
             # ✅ CORRECCIÓN: Búsqueda flexible que ignora mayúsculas/minúsculas y espacios
             usuario_input = str(usuario).strip().lower()
             
-            # Buscar usuario (comparación flexible)
-            usuario_df = self.usuarios[
-                self.usuarios['usuario'].astype(str).str.strip().str.lower() == usuario_input
-            ]
+            # Buscar usuario en el índice (comparación flexible)
+            usuario_df = self.buscar_usuario(usuario_input)
             
             if usuario_df.empty:
                 # ✅ INTENTAR BÚSQUEDA PARCIAL si no se encuentra exacto
@@ -457,26 +362,13 @@ class SistemaAutenticacion:
                 else:
                     st.warning(f"⚠️ Usuario '{usuario}' no encontrado exactamente, pero se encontró: {usuario_df.iloc[0]['usuario']}")
                     # Usar el usuario encontrado
-                    usuario_encontrado = usuario_df.iloc[0]['usuario']
-                    usuario_df = self.usuarios[
-                        self.usuarios['usuario'].astype(str).str.strip() == str(usuario_encontrado).strip()
-                    ]
-            
-            contraseña_almacenada = usuario_df.iloc[0].get('password', '')
-            
-            if contraseña_almacenada is not None:
-                contraseña_almacenada = str(contraseña_almacenada).strip()
+                    usuario_df = usuario_df.iloc[:1]
             
             # ✅ COMPARACIÓN CORREGIDA - Verificar contraseña directa o hash
-            password_input = str(password).strip()
-            
-            if contraseña_almacenada == password_input or contraseña_almacenada == self.hash_password(password_input):
+            if self.password_valida(usuario_df.iloc[0], password, aceptar_hash=True):
                 usuario_real = usuario_df.iloc[0]['usuario']
                 st.success(f"✅ ¡Bienvenido(a), {usuario_real}!")
-                st.session_state.login_exitoso = True
-                st.session_state.usuario_actual = usuario_df.iloc[0].to_dict()
-                self.sesion_activa = True
-                self.usuario_actual = usuario_df.iloc[0].to_dict()
+                self.abrir_sesion(usuario_df.iloc[0])
                 self.registrar_bitacora('LOGIN', f'Usuario {usuario_real} inició sesión')
                 return True
             else:
@@ -491,27 +383,12 @@ class SistemaAutenticacion:
                 st.info(f"Primeros usuarios disponibles: {list(self.usuarios['usuario'].astype(str).head(10))}")
             return False
             
-    def registrar_bitacora(self, accion, detalles):
-        """Registrar actividad en bitácora"""
-        nueva_entrada = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'usuario': self.usuario_actual['usuario'] if self.usuario_actual else 'Sistema',
-            'accion': accion,
-            'detalles': detalles,
-            'ip': 'localhost'
-        }
-        
-        global df_bitacora
-        if df_bitacora.empty:
-            df_bitacora = pd.DataFrame([nueva_entrada])
-        else:
-            df_bitacora = pd.concat([df_bitacora, pd.DataFrame([nueva_entrada])], ignore_index=True)
-    
     def cerrar_sesion(self):
         if self.sesion_activa:
             self.registrar_bitacora('LOGOUT', f'Usuario {self.usuario_actual["usuario"]} cerró sesión')
         self.sesion_activa = False
         self.usuario_actual = None
+        invalidar_perfil_usuario()
 
 # Instancia global del sistema de autenticación
 auth = SistemaAutenticacion()
@@ -530,36 +407,50 @@ class SistemaAcademico:
         self.certificaciones = df_certificaciones
         self.costos = df_costos
 
+    def _datasets_perfil(self, rol_actual):
+        """Tablas donde se busca el perfil: la del rol y, solo si está vacía, las cuatro"""
+        por_rol = {
+            'inscrito': ('inscritos', self.inscritos),
+            'estudiante': ('estudiantes', self.estudiantes),
+            'egresado': ('egresados', self.egresados),
+            'contratado': ('contratados', self.contratados)
+        }
+        if rol_actual in por_rol and not por_rol[rol_actual][1].empty:
+            return [por_rol[rol_actual]]
+        return list(por_rol.values())
+
+    def _clave_perfil(self, usuario_actual, rol_actual):
+        """Usuario + versión de cada tabla en la que se busca su perfil"""
+        versiones = []
+        for _, dataset in self._datasets_perfil(rol_actual):
+            dataset = materializar(dataset)
+            version = version_de(dataset)
+            versiones.append(version if version is not None else (id(dataset), len(dataset)))
+        return (usuario_actual, rol_actual, tuple(versiones))
+
     def obtener_datos_usuario_actual(self):
-        """Obtener datos del usuario actual - VERSIÓN MEJORADA"""
+        """Obtener datos del usuario actual - resuelto una vez por sesión y versión de las tablas"""
         if not st.session_state.login_exitoso:
             return pd.DataFrame()
             
         usuario_actual = st.session_state.usuario_actual.get('usuario', '')
         rol_actual = st.session_state.usuario_actual.get('rol', '').lower()
         
-        st.info(f"🔍 Buscando datos para usuario: {usuario_actual} (Rol: {rol_actual})")
-        
-        # Buscar en todos los datasets posibles
-        datasets = []
+        clave = self._clave_perfil(usuario_actual, rol_actual)
+        perfil = st.session_state.get('perfil_usuario')
+        if perfil is not None and perfil['clave'] == clave:
+            return perfil['datos'].copy()
         
-        if rol_actual == 'inscrito' and not self.inscritos.empty:
-            datasets.append(('inscritos', self.inscritos))
-        elif rol_actual == 'estudiante' and not self.estudiantes.empty:
-            datasets.append(('estudiantes', self.estudiantes))
-        elif rol_actual == 'egresado' and not self.egresados.empty:
-            datasets.append(('egresados', self.egresados))
-        elif rol_actual == 'contratado' and not self.contratados.empty:
-            datasets.append(('contratados', self.contratados))
+        datos = self._buscar_datos_usuario(usuario_actual, rol_actual)
+        st.session_state.perfil_usuario = {'clave': clave, 'datos': datos}
+        return datos.copy()
+
+    def _buscar_datos_usuario(self, usuario_actual, rol_actual):
+        """Búsqueda completa del perfil en los datasets (con mensajes de diagnóstico)"""
+        st.info(f"🔍 Buscando datos para usuario: {usuario_actual} (Rol: {rol_actual})")
         
-        # Si no hay datasets específicos para el rol, buscar en todos
-        if not datasets:
-            datasets = [
-                ('inscritos', self.inscritos),
-                ('estudiantes', self.estudiantes), 
-                ('egresados', self.egresados),
-                ('contratados', self.contratados)
-            ]
+        # Buscar en la tabla del rol (o en todas si no hay datos específicos para el rol)
+        datasets = self._datasets_perfil(rol_actual)
         
         for nombre_dataset, dataset in datasets:
             if dataset.empty:
@@ -570,8 +461,8 @@ class SistemaAcademico:
             
             for campo in campos_busqueda:
                 if campo in dataset.columns:
-                    # Buscar coincidencia exacta
-                    resultado = dataset[dataset[campo].astype(str).str.strip() == str(usuario_actual).strip()]
+                    # Buscar coincidencia exacta en el índice de la tabla
+                    resultado = buscar_filas(nombre_dataset, dataset, campo, usuario_actual)
                     
                     if not resultado.empty:
                         st.success(f"✅ Datos encontrados en {nombre_dataset} (campo: {campo})")
@@ -622,6 +513,10 @@ class SistemaAcademico:
         
         return pd.DataFrame()
 
+def invalidar_perfil_usuario():
+    """Olvidar el perfil resuelto en esta sesión (tras guardar cambios o cerrar sesión)"""
+    st.session_state.pop('perfil_usuario', None)
+
 # Instancia del sistema académico
 academico = SistemaAcademico()
 
@@ -629,49 +524,13 @@ academico = SistemaAcademico()
 # SISTEMA DE EDICIÓN Y GUARDADO REMOTO
 # =============================================================================
 
-class EditorRemoto:
-    def __init__(self):
-        self.cargador = cargador_remoto
-    
-    def obtener_ruta_archivo(self, tipo_datos):
-        """Obtener ruta remota del archivo según el tipo de datos"""
-        rutas = {
-            'inscritos': "/home/POLANCO6/ESCUELA/datos/inscritos.csv",
-            'estudiantes': "/home/POLANCO6/ESCUELA/datos/estudiantes.csv",
-            'egresados': "/home/POLANCO6/ESCUELA/datos/egresados.csv",
-            'contratados': "/home/POLANCO6/ESCUELA/datos/contratados.csv",
-            'actualizaciones_academicas': "/home/POLANCO6/ESCUELA/datos/actualizaciones_academicas.csv",
-            'certificaciones': "/home/POLANCO6/ESCUELA/datos/certificaciones.csv",
-            'programas_educativos': "/home/POLANCO6/ESCUELA/datos/programas_educativos.csv",
-            'costos_programas': "/home/POLANCO6/ESCUELA/datos/costos_programas.csv",
-            'usuarios': "/home/POLANCO6/ESCUELA/config/usuarios.csv",
-            'roles_permisos': "/home/POLANCO6/ESCUELA/config/roles_permisos.csv",
-            'bitacora': "/home/POLANCO6/ESCUELA/datos/bitacora.csv"
-        }
-        return rutas.get(tipo_datos, "")
-    
-    def guardar_dataframe_remoto(self, df, ruta_remota):
-        """Guardar DataFrame en el servidor remoto"""
-        try:
-            if self.cargador.conectar():
-                # Guardar DataFrame en un buffer en memoria
-                buffer = StringIO()
-                df.to_csv(buffer, index=False, encoding='utf-8')
-                buffer.seek(0)
-                
-                # Subir al servidor remoto
-                with self.cargador.sftp.file(ruta_remota, 'w') as archivo_remoto:
-                    archivo_remoto.write(buffer.getvalue())
-                
-                self.cargador.desconectar()
-                return True
-                
-        except Exception as e:
-            st.error(f"❌ Error guardando archivo remoto: {e}")
-            return False
+class EditorEscuela(EditorRemoto):
+    def despues_de_escribir(self, ruta_remota):
+        """El perfil en cache de la sesión puede venir de la tabla escrita"""
+        invalidar_perfil_usuario()
 
 # Instancia del editor remoto
-editor = EditorRemoto()
+editor = EditorEscuela(cargador_remoto)
 
 # =============================================================================
 # SISTEMA DOCUMENTAL - MEJORADO
@@ -686,7 +545,7 @@ class SistemaDocumental:
         self.directorio_uploads = "/home/POLANCO6/ESCUELA/uploads"
 
     def obtener_documentos_usuario_actual(self):
-        """Obtener documentos del usuario actual desde el sistema de archivos"""
+        """Documentos del usuario actual: lista de dicts con nombre, ruta, tipo, tamaño y fecha"""
         if not st.session_state.login_exitoso:
             return []
             
@@ -716,22 +575,23 @@ class SistemaDocumental:
             # Buscar archivos del usuario en el directorio uploads
             if cargador_remoto.conectar():
                 try:
-                    # Listar archivos en el directorio uploads
-                    archivos = cargador_remoto.sftp.listdir(self.directorio_uploads)
-                    
-                    # Filtrar archivos que pertenezcan a esta matrícula
-                    for archivo in archivos:
-                        if archivo.startswith(f"{matricula}_") or matricula in archivo:
-                            documentos.append({
-                                'nombre': archivo,
-                                'ruta': os.path.join(self.directorio_uploads, archivo),
-                                'tipo': self.obtener_tipo_documento(archivo),
-                                'tamaño': self.obtener_tamaño_archivo(archivo)
-                            })
+                    # Archivos de esta matrícula según el manifiesto de uploads
+                    manifiesto = obtener_manifiesto_uploads(self.directorio_uploads)
+                    # Nombre, tamaño y fecha salen del mismo pase: sin un stat por documento
+                    for entrada in manifiesto.documentos(cargador_remoto.sftp, matricula):
+                        documentos.append({
+                            'nombre': entrada['nombre'],
+                            'ruta': entrada['ruta'],
+                            'tipo': self.obtener_tipo_documento(entrada['nombre']),
+                            'tipo_documento': entrada['tipo'],
+                            'tamaño': self.formatear_tamaño(entrada['tamano']),
+                            'tamaño_bytes': entrada['tamano'],
+                            'fecha': datetime.fromtimestamp(entrada['mtime']).strftime('%Y-%m-%d %H:%M') if entrada['mtime'] else 'Desconocida'
+                        })
                 except FileNotFoundError:
                     st.warning(f"El directorio de uploads no existe: {self.directorio_uploads}")
-                
-                cargador_remoto.desconectar()
+                finally:
+                    cargador_remoto.desconectar()
                 
         except Exception as e:
             st.warning(f"⚠️ No se pudieron cargar documentos: {e}")
@@ -749,61 +609,69 @@ class SistemaDocumental:
         else:
             return "Archivo"
 
-    def obtener_tamaño_archivo(self, nombre_archivo):
-        """Obtener tamaño del archivo"""
+    def formatear_tamaño(self, tamaño_bytes):
+        """Convertir bytes a KB o MB"""
+        if tamaño_bytes is None:
+            return "Desconocido"
+        if tamaño_bytes > 1024 * 1024:
+            return f"{tamaño_bytes / (1024 * 1024):.1f} MB"
+        return f"{tamaño_bytes / 1024:.1f} KB"
+
+    def obtener_contenido_documento(self, nombre_archivo):
+        """Bytes del documento, desde la cache LRU si no cambió en el servidor"""
+        ruta_remota = os.path.join(self.directorio_uploads, nombre_archivo)
+        if not cargador_remoto.conectar():
+            return None
         try:
-            if cargador_remoto.conectar():
-                ruta_completa = os.path.join(self.directorio_uploads, nombre_archivo)
-                stats = cargador_remoto.sftp.stat(ruta_completa)
-                cargador_remoto.desconectar()
-                
-                # Convertir bytes a KB o MB
-                tamaño_bytes = stats.st_size
-                if tamaño_bytes > 1024 * 1024:
-                    return f"{tamaño_bytes / (1024 * 1024):.1f} MB"
-                else:
-                    return f"{tamaño_bytes / 1024:.1f} KB"
-                    
-        except:
-            pass
-        return "Desconocido"
+            return cache_documentos.obtener(cargador_remoto.sftp, ruta_remota,
+                                            progreso=barra_progreso(f"⬇️ Descargando {nombre_archivo}..."))
+        finally:
+            cargador_remoto.desconectar()
 
-    def descargar_documento(self, nombre_archivo):
+    def descargar_documento(self, nombre_archivo, clave=None):
         """Descargar documento desde el servidor remoto"""
         try:
-            if cargador_remoto.conectar():
-                ruta_remota = os.path.join(self.directorio_uploads, nombre_archivo)
-                
-                # Leer archivo del servidor
-                with cargador_remoto.sftp.file(ruta_remota, 'rb') as archivo_remoto:
-                    contenido = archivo_remoto.read()
-                
-                cargador_remoto.desconectar()
-                
-                # Determinar tipo MIME
-                if nombre_archivo.lower().endswith('.pdf'):
-                    mime_type = "application/pdf"
-                elif nombre_archivo.lower().endswith(('.jpg', '.jpeg')):
-                    mime_type = "image/jpeg"
-                elif nombre_archivo.lower().endswith('.png'):
-                    mime_type = "image/png"
-                else:
-                    mime_type = "application/octet-stream"
-                
-                # Crear botón de descarga
-                st.download_button(
-                    label=f"📥 Descargar {nombre_archivo}",
-                    data=contenido,
-                    file_name=nombre_archivo,
-                    mime=mime_type,
-                    key=f"doc_{nombre_archivo}"
-                )
-                return True
+            contenido = self.obtener_contenido_documento(nombre_archivo)
+            if contenido is None:
+                return False
+            
+            # Determinar tipo MIME
+            if nombre_archivo.lower().endswith('.pdf'):
+                mime_type = "application/pdf"
+            elif nombre_archivo.lower().endswith(('.jpg', '.jpeg')):
+                mime_type = "image/jpeg"
+            elif nombre_archivo.lower().endswith('.png'):
+                mime_type = "image/png"
+            else:
+                mime_type = "application/octet-stream"
+            
+            # Crear botón de descarga
+            st.download_button(
+                label=f"📥 Descargar {nombre_archivo}",
+                data=contenido,
+                file_name=nombre_archivo,
+                mime=mime_type,
+                key=f"doc_{clave or nombre_archivo}"
+            )
+            return True
                 
         except Exception as e:
             st.error(f"❌ Error al descargar {nombre_archivo}: {e}")
             return False
 
+    def boton_descarga_diferida(self, nombre_archivo, clave=None):
+        """Bajar el documento solo cuando el usuario lo pide; después queda el botón de descarga"""
+        clave = clave or nombre_archivo
+        if 'descargas_solicitadas' not in st.session_state:
+            st.session_state.descargas_solicitadas = set()
+        
+        if clave not in st.session_state.descargas_solicitadas:
+            if not st.button("📄 Preparar descarga", key=f"preparar_{clave}"):
+                return False
+            st.session_state.descargas_solicitadas.add(clave)
+        
+        return self.descargar_documento(nombre_archivo, clave)
+
     def mostrar_documentos_usuario(self):
         """Mostrar documentos del usuario actual"""
         documentos_usuario = self.obtener_documentos_usuario_actual()
@@ -820,33 +688,37 @@ class SistemaDocumental:
                 
                 with col1:
                     st.write(f"**Tipo:** {documento['tipo']}")
+                    if documento.get('tipo_documento'):
+                        st.write(f"**Documento:** {documento['tipo_documento']}")
                     st.write(f"**Tamaño:** {documento['tamaño']}")
+                    st.write(f"**Fecha:** {documento['fecha']}")
                     st.write(f"**Ubicación:** {self.directorio_uploads}")
                 
                 with col2:
-                    self.descargar_documento(documento['nombre'])
+                    self.boton_descarga_diferida(documento['nombre'])
 
     def subir_documento(self, archivo, matricula, nombre_completo, tipo_documento):
         """Subir documento al servidor remoto y actualizar base de datos"""
         try:
             if cargador_remoto.conectar():
-                # Generar nombre del archivo según el formato especificado
-                timestamp = datetime.now().strftime("%y-%m-%d.%H.%M")
-                nombre_archivo = f"{matricula}.{nombre_completo}.{tipo_documento}.{timestamp}.pdf"
-                
-                # Limpiar nombre del archivo (remover caracteres especiales)
-                nombre_archivo = "".join(c for c in nombre_archivo if c.isalnum() or c in ('.', '-', '_')).replace(' ', '_')
-                
-                ruta_remota = os.path.join(self.directorio_uploads, nombre_archivo)
-                
-                # Subir archivo al servidor
-                with cargador_remoto.sftp.file(ruta_remota, 'wb') as archivo_remoto:
-                    archivo_remoto.write(archivo.getvalue())
-                
-                # ACTUALIZAR CAMPO documentos_subidos EN LA BASE DE DATOS CORRESPONDIENTE
-                self.actualizar_documentos_subidos(matricula, nombre_archivo, tipo_documento)
-                
-                cargador_remoto.desconectar()
+                try:
+                    # Generar nombre del archivo según el formato especificado
+                    timestamp = datetime.now().strftime("%y-%m-%d.%H.%M")
+                    nombre_archivo = f"{matricula}.{nombre_completo}.{tipo_documento}.{timestamp}.pdf"
+                    
+                    # Limpiar nombre del archivo (remover caracteres especiales)
+                    nombre_archivo = "".join(c for c in nombre_archivo if c.isalnum() or c in ('.', '-', '_')).replace(' ', '_')
+                    
+                    # Subir archivo al servidor y registrarlo en el manifiesto de uploads
+                    obtener_manifiesto_uploads(self.directorio_uploads).subir(
+                        cargador_remoto.sftp, nombre_archivo, archivo,
+                        progreso=barra_progreso(f"⬆️ Subiendo {tipo_documento}...")
+                    )
+                    
+                    # ACTUALIZAR CAMPO documentos_subidos EN LA BASE DE DATOS CORRESPONDIENTE
+                    self.actualizar_documentos_subidos(matricula, nombre_archivo, tipo_documento)
+                finally:
+                    cargador_remoto.desconectar()
                 
                 # ENVIAR EMAIL DE CONFIRMACIÓN (con copia a notification_email)
                 usuario_actual = st.session_state.usuario_actual.get('usuario', '')
@@ -878,15 +750,19 @@ class SistemaDocumental:
             rol_actual = st.session_state.usuario_actual.get('rol', '').lower()
             
             if rol_actual == 'inscrito' and not self.inscritos.empty:
+                nombre_tabla = 'inscritos'
                 df_actualizar = self.inscritos
                 ruta_archivo = editor.obtener_ruta_archivo('inscritos')
             elif rol_actual == 'estudiante' and not self.estudiantes.empty:
+                nombre_tabla = 'estudiantes'
                 df_actualizar = self.estudiantes
                 ruta_archivo = editor.obtener_ruta_archivo('estudiantes')
             elif rol_actual == 'egresado' and not self.egresados.empty:
+                nombre_tabla = 'egresados'
                 df_actualizar = self.egresados
                 ruta_archivo = editor.obtener_ruta_archivo('egresados')
             elif rol_actual == 'contratado' and not self.contratados.empty:
+                nombre_tabla = 'contratados'
                 df_actualizar = self.contratados
                 ruta_archivo = editor.obtener_ruta_archivo('contratados')
             else:
@@ -894,19 +770,23 @@ class SistemaDocumental:
             
             # Buscar el registro del usuario - buscar por diferentes campos
             indice = None
+            campo_clave = None
             campos_busqueda = ['matricula', 'usuario', 'id']
             
             for campo in campos_busqueda:
-                if campo in df_actualizar.columns:
-                    coincidencias = df_actualizar[df_actualizar[campo].astype(str) == str(matricula)]
-                    if not coincidencias.empty:
-                        indice = coincidencias.index[0]
-                        break
+                posiciones = buscar_posiciones(nombre_tabla, df_actualizar, campo, matricula)
+                if posiciones:
+                    indice = df_actualizar.index[posiciones[0]]
+                    campo_clave = campo
+                    break
             
             if indice is None:
                 st.warning(f"⚠️ No se encontró registro para matrícula/usuario {matricula}")
                 return False
             
+            # La tabla es la compartida del proceso: la fila se edita sobre una copia
+            df_actualizar = df_actualizar.copy()
+            
             # Crear o actualizar el campo documentos_subidos
             if 'documentos_subidos' not in df_actualizar.columns:
                 df_actualizar['documentos_subidos'] = ''
@@ -921,8 +801,9 @@ class SistemaDocumental:
             # Actualizar el campo
             df_actualizar.at[indice, 'documentos_subidos'] = documentos_actuales
             
-            # Guardar en el servidor remoto
-            if editor.guardar_dataframe_remoto(df_actualizar, ruta_archivo):
+            # Guardar en el servidor remoto solo el campo modificado de esta fila
+            if editor.parchar_fila_remoto(df_actualizar, ruta_archivo, campo_clave, matricula,
+                                          {'documentos_subidos': documentos_actuales}):
                 st.success("📝 Campo 'documentos_subidos' actualizado en la base de datos")
                 return True
             else:
@@ -1080,12 +961,14 @@ def mostrar_interfaz_inscrito():
             
             if cambios:
                 try:
-                    # Actualizar el DataFrame local
+                    # Actualizar una copia local (df_inscritos es la tabla compartida del proceso)
+                    df_editado = df_inscritos.copy()
                     for campo, valor in actualizaciones.items():
-                        df_inscritos.loc[usuario_actual.name, campo] = valor
+                        asignar_valor(df_editado, usuario_actual.name, campo, valor)
                     
-                    # Guardar en el servidor remoto
-                    if editor.guardar_dataframe_remoto(df_inscritos, editor.obtener_ruta_archivo('inscritos')):
+                    # Guardar en el servidor remoto solo los campos modificados
+                    if editor.parchar_fila_remoto(df_editado, editor.obtener_ruta_archivo('inscritos'),
+                                                  'matricula', usuario_actual.get('matricula', ''), actualizaciones):
                         st.success("✅ Cambios guardados exitosamente")
                         st.rerun()
                     else:
@@ -1250,12 +1133,14 @@ def mostrar_interfaz_estudiante():
             
             if cambios:
                 try:
-                    # Actualizar el DataFrame local
+                    # Actualizar una copia local (df_estudiantes es la tabla compartida del proceso)
+                    df_editado = df_estudiantes.copy()
                     for campo, valor in actualizaciones.items():
-                        df_estudiantes.loc[usuario_actual.name, campo] = valor
+                        asignar_valor(df_editado, usuario_actual.name, campo, valor)
                     
-                    # Guardar en el servidor remoto
-                    if editor.guardar_dataframe_remoto(df_estudiantes, editor.obtener_ruta_archivo('estudiantes')):
+                    # Guardar en el servidor remoto solo los campos modificados
+                    if editor.parchar_fila_remoto(df_editado, editor.obtener_ruta_archivo('estudiantes'),
+                                                  'matricula', usuario_actual.get('matricula', ''), actualizaciones):
                         st.success("✅ Cambios guardados exitosamente")
                         st.rerun()
                     else:
@@ -1406,12 +1291,14 @@ def mostrar_interfaz_egresado():
             
             if cambios:
                 try:
-                    # Actualizar el DataFrame local
+                    # Actualizar una copia local (df_egresados es la tabla compartida del proceso)
+                    df_editado = df_egresados.copy()
                     for campo, valor in actualizaciones.items():
-                        df_egresados.loc[usuario_actual.name, campo] = valor
+                        asignar_valor(df_editado, usuario_actual.name, campo, valor)
                     
-                    # Guardar en el servidor remoto
-                    if editor.guardar_dataframe_remoto(df_egresados, editor.obtener_ruta_archivo('egresados')):
+                    # Guardar en el servidor remoto solo los campos modificados
+                    if editor.parchar_fila_remoto(df_editado, editor.obtener_ruta_archivo('egresados'),
+                                                  'matricula', usuario_actual.get('matricula', ''), actualizaciones):
                         st.success("✅ Cambios guardados exitosamente")
                         st.rerun()
                     else:
@@ -1586,12 +1473,14 @@ def mostrar_interfaz_contratado():
 
             if cambios:
                 try:
-                    # Actualizar el DataFrame local
+                    # Actualizar una copia local (df_contratados es la tabla compartida del proceso)
+                    df_editado = df_contratados.copy()
                     for campo, valor in actualizaciones.items():
-                        df_contratados.loc[usuario_actual.name, campo] = valor
+                        asignar_valor(df_editado, usuario_actual.name, campo, valor)
 
-                    # Guardar en el servidor remoto
-                    if editor.guardar_dataframe_remoto(df_contratados, editor.obtener_ruta_archivo('contratados')):
+                    # Guardar en el servidor remoto solo los campos modificados
+                    if editor.parchar_fila_remoto(df_editado, editor.obtener_ruta_archivo('contratados'),
+                                                  'matricula', usuario_actual.get('matricula', ''), actualizaciones):
                         st.success("✅ Cambios guardados exitosamente")
                         st.rerun()
                     else:
@@ -1686,6 +1575,7 @@ def mostrar_dashboard_administrador():
     st.subheader("📊 Dashboard General")
     
     # Métricas generales
+    tablas.precargar(['inscritos', 'estudiantes', 'egresados', 'contratados'])
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
@@ -1709,13 +1599,21 @@ def mostrar_dashboard_administrador():
     
     col1, col2 = st.columns(2)
     
+    # Resultados del monitor en segundo plano: renderizar no abre conexiones
+    monitor = obtener_monitor_salud()
+    
     with col1:
-        st.info("**Conexión SSH:** ✅ Activa" if cargador_remoto.conectar() else "**Conexión SSH:** ❌ Inactiva")
-        cargador_remoto.desconectar()
+        for nombre, etiqueta in (('SSH', 'Conexión SSH'), ('SMTP', 'Sistema de Email')):
+            resultado = monitor.ultimo(nombre)
+            if resultado is None:
+                st.info(f"**{etiqueta}:** ⏳ Primera verificación en curso")
+            else:
+                st.info(f"**{etiqueta}:** {resultado.mensaje} "
+                        f"({resultado.latencia_ms:.0f} ms, {resultado.fecha.strftime('%H:%M:%S')})")
         
-        # Verificar configuración de email
-        estado_email, mensaje_email = sistema_email.test_conexion_smtp()
-        st.info(f"**Sistema de Email:** {mensaje_email}")
+        if st.button("🔄 Verificar ahora"):
+            monitor.solicitar_sondeo()
+            st.caption("La verificación corre en segundo plano; recarga en unos segundos.")
     
     with col2:
         # Verificar archivos críticos
@@ -1729,6 +1627,20 @@ def mostrar_dashboard_administrador():
         for archivo, estado in archivos_criticos.items():
             estado_texto = "✅" if estado else "❌"
             st.write(f"{estado_texto} {archivo}")
+    
+    # Tendencia de latencias de las sondas
+    latencias = monitor.latencias()
+    series = {
+        nombre: pd.Series([latencia for _, latencia, _ in puntos], index=[fecha for fecha, _, _ in puntos])
+        for nombre, puntos in latencias.items() if puntos
+    }
+    if series:
+        st.write("**⏱️ Latencia de las verificaciones (ms):**")
+        st.line_chart(pd.DataFrame(series))
+        fallos = {nombre: sum(1 for _, _, ok in puntos if not ok) for nombre, puntos in latencias.items()}
+        if any(fallos.values()):
+            st.warning("⚠️ Verificaciones fallidas recientes: " +
+                       ", ".join(f"{nombre}: {total}" for nombre, total in fallos.items() if total))
 
 def mostrar_gestion_usuarios():
     """Gestión de usuarios para administradores"""
@@ -1742,7 +1654,7 @@ def mostrar_gestion_usuarios():
         return
 
     # Mostrar tabla de usuarios
-    st.dataframe(df_usuarios, use_container_width=True)
+    st.dataframe(materializar(df_usuarios), use_container_width=True)
 
     # Opciones de gestión
     col1, col2 = st.columns(2)
@@ -1772,8 +1684,9 @@ def mostrar_gestion_usuarios():
                     # Crear una copia para evitar problemas de referencia
                     df_temp = df_usuarios.copy()
                     df_temp = pd.concat([df_temp, pd.DataFrame([nuevo_registro])], ignore_index=True)
+                    sellar_version(df_temp, version_de(df_usuarios))  # concat no conserva attrs
 
-                    if editor.guardar_dataframe_remoto(df_temp, editor.obtener_ruta_archivo('usuarios')):
+                    if editor.anexar_filas_remoto(df_temp, editor.obtener_ruta_archivo('usuarios'), [nuevo_registro]):
                         # Actualizar la variable global
                         df_usuarios = df_temp
                         st.success("✅ Usuario agregado exitosamente")
@@ -1790,7 +1703,9 @@ def mostrar_gestion_usuarios():
                 # Crear una copia para evitar problemas de referencia
                 df_temp = df_usuarios[df_usuarios['usuario'] != usuario_eliminar].copy()
 
-                if editor.guardar_dataframe_remoto(df_temp, editor.obtener_ruta_archivo('usuarios')):
+                # Solo la baja viaja al servidor (delta); la tabla completa solo si no hay delta posible
+                if editor.eliminar_filas_remoto(df_temp, editor.obtener_ruta_archivo('usuarios'),
+                                                'usuario', usuario_eliminar):
                     # Actualizar la variable global
                     df_usuarios = df_temp
                     st.success("✅ Usuario eliminado exitosamente")
@@ -1827,15 +1742,14 @@ def mostrar_gestion_documentos():
         for _, usuario in datos.iterrows():
             if pd.notna(usuario.get('documentos_subidos')) and usuario['documentos_subidos'] != '':
                 with st.expander(f"📂 {usuario.get('nombre', 'Usuario')} - {usuario.get('matricula', 'N/A')}"):
-                    documentos = usuario['documentos_subidos'].split(';')
-                    for doc in documentos:
+                    lista_documentos = usuario['documentos_subidos'].split(';')
+                    for doc in lista_documentos:
                         if ':' in doc:
                             tipo, archivo = doc.split(':', 1)
                             st.write(f"**{tipo}:** {archivo}")
                             
-                            # Botón para descargar
-                            if documentos.descargar_documento(archivo):
-                                st.success(f"✅ {archivo} descargado")
+                            # Los bytes se piden al servidor solo si el administrador lo solicita
+                            documentos.boton_descarga_diferida(archivo, clave=f"admin_{usuario.get('matricula', '')}_{archivo}")
     else:
         st.info(f"📝 No hay documentos subidos para {tipo_usuario.lower()}")
 
@@ -1900,7 +1814,7 @@ def mostrar_roles_permisos():
         st.info("📝 No hay configuración de roles disponible")
         return
     
-    st.dataframe(df_roles, use_container_width=True)
+    st.dataframe(materializar(df_roles), use_container_width=True)
     
     # Mostrar permisos por rol
     st.subheader("📋 Permisos por Rol")
@@ -1912,12 +1826,16 @@ def mostrar_roles_permisos():
 
 def mostrar_reportes_estadisticas():
     """Reportes y estadísticas para administradores"""
+    # matplotlib se importa al abrir esta página, no en el arranque de la app
+    import matplotlib.pyplot as plt
+    
     st.subheader("📈 Reportes y Estadísticas")
     
     # Estadísticas de usuarios por rol
     if not df_usuarios.empty and 'rol' in df_usuarios.columns:
         st.write("### 👥 Distribución de Usuarios por Rol")
         distribucion_roles = df_usuarios['rol'].value_counts()
+        distribucion_roles = distribucion_roles[distribucion_roles > 0]  # categorías sin usuarios
         
         col1, col2 = st.columns([2, 1])
         
@@ -1928,6 +1846,7 @@ def mostrar_reportes_estadisticas():
             ax.set_ylabel('Cantidad')
             plt.xticks(rotation=45)
             st.pyplot(fig)
+            plt.close(fig)  # pyplot conserva cada figura abierta entre reruns
         
         with col2:
             st.write("**Resumen:**")
@@ -2037,6 +1956,24 @@ def mostrar_diagnostico_email():
                 else:
                     st.error(mensaje)
     
+    st.write("**📬 Bandeja de Salida:**")
+    try:
+        estado_bandeja = obtener_bandeja_correo().estadisticas()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Pendientes", estado_bandeja['pendientes'])
+        col2.metric("Enviados", estado_bandeja['enviados'])
+        col3.metric("Fallidos", estado_bandeja['fallidos'])
+        estado_pool = obtener_pool_smtp().estadisticas()
+        st.caption(f"🔌 Conexiones SMTP abiertas: {estado_pool['conexiones_creadas']} · "
+                   f"mensajes enviados en este proceso: {estado_pool['mensajes_enviados']}")
+        if estado_bandeja['ultimo_error']:
+            st.warning(f"⚠️ Último error de envío: {estado_bandeja['ultimo_error']}")
+        if estado_bandeja['fallidos'] and st.button("🔁 Reintentar fallidos"):
+            reintentados = obtener_bandeja_correo().reintentar_fallidos()
+            st.success(f"✅ {reintentados} mensaje(s) devueltos a la cola")
+    except Exception as e:
+        st.error(f"❌ Error leyendo la bandeja de salida: {e}")
+    
     st.write("**Configuración Requerida en secrets.toml:**")
     st.code("""
 # Credenciales de email para Gmail
@@ -2087,7 +2024,8 @@ def mostrar_login():
     st.title("🔐 Sistema Académico - Instituto Nacional de Cardiología")
     st.markdown("---")
 
-    # Estado de la carga remota
+    # Estado de la carga remota (las cinco tablas del resumen en una sola carga paralela)
+    tablas.precargar(['inscritos', 'estudiantes', 'egresados', 'contratados', 'programas_educativos'])
     with st.expander("🌐 Estado de la Carga Remota", expanded=True):
         col1, col2, col3, col4, col5 = st.columns(5)
         with col1:
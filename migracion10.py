@@ -7,8 +7,15 @@ from datetime import datetime, timedelta
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import paramiko
-from io import StringIO, BytesIO
+from nucleo.escritura_atomica import ConflictoEscritura, version_de
+from nucleo.transaccion import commit_tablas, recuperar_al_iniciar
+from nucleo.indices import buscar_posiciones
+from nucleo.delta_log import aplicar_operaciones, operacion_parchar
+from nucleo.manifiesto_uploads import obtener_manifiesto_uploads
+from nucleo.datos_compartidos import obtener_datos_compartidos
+from nucleo.remoto import CargadorRemoto, EditorRemoto
+from nucleo.autenticacion import AutenticacionUsuarios
+from io import BytesIO
 import time
 import hashlib
 import base64
@@ -27,103 +34,33 @@ st.set_page_config(
 # SISTEMA DE CARGA REMOTA VIA SSH
 # =============================================================================
 
-class CargadorRemoto:
-    def __init__(self):
-        self.ssh = None
-        self.sftp = None
-        
-    def conectar(self):
-        """Establecer conexión SSH con el servidor remoto"""
-        try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Cargar credenciales desde secrets de Streamlit
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
-            return True
-        except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
-            return False
-    
-    def desconectar(self):
-        """Cerrar conexión SSH"""
-        try:
-            if self.sftp:
-                self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
-        except:
-            pass
-    
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto"""
-        try:
-            if not self.conectar():
-                return pd.DataFrame()
-            
-            # Verificar si el archivo existe en el servidor remoto
-            try:
-                self.sftp.stat(ruta_remota)
-            except FileNotFoundError:
-                st.warning(f"📁 Archivo remoto no encontrado: {os.path.basename(ruta_remota)}")
-                return pd.DataFrame()
-            
-            # Leer archivo remoto
-            with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
-                
-            return df
-            
-        except Exception as e:
-            st.warning(f"⚠️ Error cargando {os.path.basename(ruta_remota)}: {str(e)}")
-            return pd.DataFrame()
-        finally:
-            self.desconectar()
-    
-    def cargar_todos_los_datos(self):
-        """Cargar todos los archivos CSV del servidor remoto"""
-        
-        BASE_DIR_REMOTO = "/home/POLANCO6/ESCUELA"
-        
-        rutas_remotas = {
-            'inscritos': os.path.join(BASE_DIR_REMOTO, "datos", "inscritos.csv"),
-            'estudiantes': os.path.join(BASE_DIR_REMOTO, "datos", "estudiantes.csv"),
-            'egresados': os.path.join(BASE_DIR_REMOTO, "datos", "egresados.csv"),
-            'contratados': os.path.join(BASE_DIR_REMOTO, "datos", "contratados.csv"),
-            'usuarios': os.path.join(BASE_DIR_REMOTO, "config", "usuarios.csv"),
-            'bitacora': os.path.join(BASE_DIR_REMOTO, "datos", "bitacora.csv")
-        }
-        
-        datos_cargados = {}
-        
-        for nombre, ruta_remota in rutas_remotas.items():
-            datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota)
-        
-        return datos_cargados
-
-# Instanciar el cargador remoto
+# Sesión SFTP de este script (tomada del pool del proceso)
 cargador_remoto = CargadorRemoto()
 
 # =============================================================================
 # CARGA DE TODOS LOS DATOS DESDE EL SERVIDOR REMOTO
 # =============================================================================
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos
+# La bitácora no se carga: sus eventos se anexan con nucleo.bitacora sin leerla
+TABLAS_MIGRACION = ['inscritos', 'estudiantes', 'egresados', 'contratados', 'usuarios']
+
 def cargar_datos_completos():
-    """Cargar todos los datos desde el servidor remoto"""
+    """Cargar todos los datos desde el servidor remoto
+    
+    Sale del almacén compartido del proceso: cada rerun solo comprueba el
+    servidor y todas las sesiones leen los mismos DataFrames.
+    """
+    datos_compartidos = obtener_datos_compartidos()
+    
     with st.spinner("🌐 Conectando al servidor remoto..."):
-        datos = cargador_remoto.cargar_todos_los_datos()
+        datos, fallos = datos_compartidos.cargar(TABLAS_MIGRACION)
+        
+        for nombre, error in fallos.items():
+            archivo = os.path.basename(datos_compartidos.ruta(nombre))
+            if isinstance(error, FileNotFoundError):
+                st.warning(f"📁 Archivo remoto no encontrado: {archivo}")
+            else:
+                st.warning(f"⚠️ Error cargando {archivo}: {error}")
         
         # Mostrar estado de carga
         if datos:
@@ -134,92 +71,49 @@ def cargar_datos_completos():
         else:
             st.error("❌ Error cargando datos del servidor remoto")
             
-        return datos
+        return datos, fallos
+
+# Completar migraciones que quedaron a medio aplicar antes de leer las tablas
+try:
+    if recuperar_al_iniciar():
+        obtener_datos_compartidos().invalidar()
+        st.info("🔁 Se completó una migración que había quedado interrumpida")
+except Exception as e:
+    st.warning(f"⚠️ No se pudo revisar el registro de transacciones: {e}")
 
 # Cargar todos los datos al inicio
-datos = cargar_datos_completos()
+datos, fallos_carga = cargar_datos_completos()
 
-# Asignar a variables globales
+# Asignar a variables globales (DataFrames compartidos: se editan sobre una copia)
 df_inscritos = datos.get('inscritos', pd.DataFrame())
 df_estudiantes = datos.get('estudiantes', pd.DataFrame())
 df_egresados = datos.get('egresados', pd.DataFrame())
 df_contratados = datos.get('contratados', pd.DataFrame())
 df_usuarios = datos.get('usuarios', pd.DataFrame())
-df_bitacora = datos.get('bitacora', pd.DataFrame())
+
+# Versión remota de cada tabla tal como se cargó: los guardados la exigen
+versiones_cargadas = {nombre: version_de(df) for nombre, df in datos.items()}
 
 # =============================================================================
 # SISTEMA DE EDICIÓN Y GUARDADO REMOTO - MEJORADO
 # =============================================================================
 
-class EditorRemoto:
-    def __init__(self):
-        self.cargador = cargador_remoto
-    
-    def obtener_ruta_archivo(self, tipo_datos):
-        """Obtener ruta remota del archivo según el tipo de datos"""
-        rutas = {
-            'inscritos': "/home/POLANCO6/ESCUELA/datos/inscritos.csv",
-            'estudiantes': "/home/POLANCO6/ESCUELA/datos/estudiantes.csv",
-            'egresados': "/home/POLANCO6/ESCUELA/datos/egresados.csv",
-            'contratados': "/home/POLANCO6/ESCUELA/datos/contratados.csv",
-            'usuarios': "/home/POLANCO6/ESCUELA/config/usuarios.csv",
-            'bitacora': "/home/POLANCO6/ESCUELA/datos/bitacora.csv"
-        }
-        return rutas.get(tipo_datos, "")
-    
-    def guardar_dataframe_remoto(self, df, ruta_remota):
-        """Guardar DataFrame en el servidor remoto - MEJORADO"""
-        try:
-            if self.cargador.conectar():
-                # Crear directorio si no existe
-                directorio = os.path.dirname(ruta_remota)
-                try:
-                    self.cargador.sftp.stat(directorio)
-                except FileNotFoundError:
-                    # Crear directorio recursivamente
-                    partes = directorio.split('/')
-                    path_actual = ''
-                    for parte in partes:
-                        if parte:
-                            path_actual += '/' + parte
-                            try:
-                                self.cargador.sftp.stat(path_actual)
-                            except FileNotFoundError:
-                                self.cargador.sftp.mkdir(path_actual)
-                
-                # Guardar DataFrame en un buffer en memoria
-                buffer = StringIO()
-                df.to_csv(buffer, index=False, encoding='utf-8')
-                buffer.seek(0)
-                contenido = buffer.getvalue()
-                
-                # Subir al servidor remoto
-                with self.cargador.sftp.file(ruta_remota, 'w') as archivo_remoto:
-                    archivo_remoto.write(contenido)
-                
-                self.cargador.desconectar()
-                st.success(f"✅ Archivo guardado exitosamente: {os.path.basename(ruta_remota)}")
-                return True
-            else:
-                st.error(f"❌ No se pudo conectar para guardar {os.path.basename(ruta_remota)}")
-                return False
-                
-        except Exception as e:
-            st.error(f"❌ Error guardando archivo remoto {os.path.basename(ruta_remota)}: {e}")
-            return False
+class EditorMigracion(EditorRemoto):
+    def avisar_conflicto(self, ruta_remota):
+        st.error(f"⚠️ {os.path.basename(ruta_remota)} fue modificado por otra sesión desde que se cargó; "
+                 "no se sobrescribió. Recarga los datos y repite la migración.")
+        self.datos.invalidar()
 
 # Instancia del editor remoto
-editor = EditorRemoto()
+editor = EditorMigracion(cargador_remoto)
 
 # =============================================================================
 # SISTEMA DE AUTENTICACIÓN
 # =============================================================================
 
-class SistemaAutenticacion:
+class SistemaAutenticacion(AutenticacionUsuarios):
     def __init__(self):
-        self.usuarios = df_usuarios
-        self.sesion_activa = False
-        self.usuario_actual = None
+        super().__init__(df_usuarios)
         
     def verificar_credenciales_desde_archivo(self, usuario_input, password_input):
         """Verificar credenciales desde el archivo remoto usuarios.csv"""
@@ -233,9 +127,7 @@ class SistemaAutenticacion:
             
             # Estrategia 1: Buscar por columna 'usuario'
             if 'usuario' in self.usuarios.columns:
-                usuario_df = self.usuarios[
-                    self.usuarios['usuario'].astype(str).str.strip().str.lower() == usuario_input.lower().strip()
-                ]
+                usuario_df = self.buscar_usuario(usuario_input)
                 
                 if not usuario_df.empty:
                     usuario_encontrado = usuario_df.iloc[0]
@@ -246,10 +138,7 @@ class SistemaAutenticacion:
             
             # Verificar contraseña
             if 'password' in usuario_encontrado:
-                contraseña_almacenada = str(usuario_encontrado['password']).strip()
-                password_input_clean = str(password_input).strip()
-                
-                if contraseña_almacenada == password_input_clean:
+                if self.password_valida(usuario_encontrado, password_input):
                     return True, usuario_encontrado
                 else:
                     st.error("❌ Contraseña incorrecta")
@@ -271,7 +160,7 @@ class SistemaAutenticacion:
             
             with st.spinner("🔐 Verificando credenciales en servidor remoto..."):
                 # Recargar usuarios para asegurar datos actualizados
-                ruta_usuarios = "/home/POLANCO6/ESCUELA/config/usuarios.csv"
+                ruta_usuarios = editor.obtener_ruta_archivo('usuarios')
                 df_usuarios_actualizado = cargador_remoto.cargar_csv_remoto(ruta_usuarios)
                 
                 if df_usuarios_actualizado.empty:
@@ -295,10 +184,7 @@ class SistemaAutenticacion:
                     nombre_real = usuario_data.get('nombre', 'Usuario')
                     
                     st.success(f"✅ ¡Bienvenido(a), {nombre_real}!")
-                    st.session_state.login_exitoso = True
-                    st.session_state.usuario_actual = usuario_data.to_dict()
-                    self.sesion_activa = True
-                    self.usuario_actual = usuario_data.to_dict()
+                    self.abrir_sesion(usuario_data)
                     
                     # Registrar en bitácora
                     self.registrar_bitacora('LOGIN', f'Administrador {usuario_real} inició sesión en el migrador')
@@ -310,26 +196,6 @@ class SistemaAutenticacion:
             st.error(f"❌ Error en el proceso de login: {e}")
             return False
             
-    def registrar_bitacora(self, accion, detalles):
-        """Registrar actividad en bitácora"""
-        try:
-            nueva_entrada = {
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'usuario': self.usuario_actual.get('usuario', 'Sistema') if self.usuario_actual else 'Sistema',
-                'accion': accion,
-                'detalles': detalles,
-                'ip': 'localhost'
-            }
-            
-            global df_bitacora
-            if df_bitacora.empty:
-                df_bitacora = pd.DataFrame([nueva_entrada])
-            else:
-                df_bitacora = pd.concat([df_bitacora, pd.DataFrame([nueva_entrada])], ignore_index=True)
-                
-        except Exception as e:
-            st.error(f"❌ Error registrando en bitácora: {e}")
-    
     def cerrar_sesion(self):
         """Cerrar sesión del usuario"""
         try:
@@ -395,9 +261,7 @@ class SistemaMigracion:
             st.info(f"🔍 Buscando usuario por matrícula: '{matricula_inscrito}'")
             
             # Buscar exactamente por matrícula en la columna 'usuario'
-            usuario_idx = self.usuarios[
-                self.usuarios['usuario'].astype(str).str.strip() == matricula_inscrito
-            ].index
+            usuario_idx = self.usuarios.index[buscar_posiciones('usuarios', self.usuarios, 'usuario', matricula_inscrito)]
             
             if not usuario_idx.empty:
                 usuario_encontrado = self.usuarios.iloc[usuario_idx[0]]['usuario']
@@ -428,11 +292,12 @@ class SistemaMigracion:
             st.info(f"   - Nuevo rol: {nuevo_rol}")
             st.info(f"   - Nueva matrícula: {nueva_matricula}")
             
-            # Actualizar rol
-            self.usuarios.loc[usuario_idx, 'rol'] = nuevo_rol
-            
-            # Actualizar usuario (matrícula)
-            self.usuarios.loc[usuario_idx, 'usuario'] = nueva_matricula
+            # Actualizar rol y usuario (matrícula) con la misma operación que escribe el delta:
+            # devuelve una tabla nueva y la compartida del proceso (y su índice) no se toca
+            global df_usuarios
+            df_usuarios = self.usuarios = aplicar_operaciones(self.usuarios, [
+                operacion_parchar('usuario', usuario_actual, {'rol': nuevo_rol, 'usuario': nueva_matricula})
+            ])
             
             st.success(f"✅ Usuario actualizado exitosamente: {usuario_actual} -> {nueva_matricula} ({nuevo_rol})")
             return True
@@ -452,88 +317,51 @@ class SistemaMigracion:
             directorio_uploads = "/home/POLANCO6/ESCUELA/uploads"
             
             try:
-                archivos = cargador_remoto.sftp.listdir(directorio_uploads)
+                # Solo los archivos de esta matrícula, según el manifiesto de uploads
+                manifiesto = obtener_manifiesto_uploads(directorio_uploads)
+                sftp = cargador_remoto.sftp
+                archivos_pdf = [entrada['nombre'] for entrada in manifiesto.documentos(sftp, matricula_vieja)
+                                if entrada['extension'] == 'pdf']
                 st.info(f"📁 Buscando archivos de {matricula_vieja} en {directorio_uploads}")
-                st.info(f"📋 Total de archivos en directorio: {len(archivos)}")
-                
-                for archivo in archivos:
-                    # CORRECCIÓN CRÍTICA: Buscar archivos que contengan EXACTAMENTE la matrícula vieja
-                    # y sean archivos PDF. Usamos una verificación más estricta para evitar 
-                    # que MAT-EGR coincida con MAT-INS accidentalmente
-                    if archivo.lower().endswith('.pdf') and matricula_vieja in archivo:
-                        # VERIFICACIÓN ADICIONAL: Asegurarnos de que es el archivo correcto
-                        # Buscando el patrón donde la matrícula es parte del nombre pero no necesariamente al inicio
-                        # pero evitando falsos positivos
-                        partes_nombre = archivo.split('_')
+                st.info(f"📋 Archivos PDF registrados para {matricula_vieja}: {len(archivos_pdf)}")
+                
+                for archivo in archivos_pdf:
+                    # El manifiesto agrupa por el prefijo exacto del nombre, así que
+                    # MAT-EGR nunca coincide con MAT-INS por accidente
+                    nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva, 1)
+                    ruta_nueva = os.path.join(directorio_uploads, nuevo_nombre)
+                    
+                    st.info(f"🔄 Confirmando renombrado: {archivo} -> {nuevo_nombre}")
+                    
+                    try:
+                        # Verificar que el archivo destino no existe (para evitar sobreescribir)
+                        try:
+                            sftp.stat(ruta_nueva)
+                            st.error(f"❌ El archivo destino ya existe: {ruta_nueva}")
+                            continue
+                        except FileNotFoundError:
+                            # El archivo destino no existe, proceder con el renombrado
+                            pass
                         
-                        # Si la matrícula está al inicio (caso ideal)
-                        if archivo.startswith(matricula_vieja + '_'):
-                            nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva)
-                            es_valido = True
-                        # Si la matrícula está en medio del nombre (caso menos común)
-                        elif matricula_vieja + '_' in archivo:
-                            nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva)
-                            es_valido = True
-                        else:
-                            # Si no coincide claramente, saltar este archivo
-                            es_valido = False
-                            st.warning(f"⚠️ Saltando archivo '{archivo}' - patrón de matrícula no claro")
+                        # Renombrar archivo y su entrada en el manifiesto
+                        manifiesto.renombrar(sftp, archivo, nuevo_nombre)
+                        archivos_renombrados += 1
+                        st.success(f"✅ Renombrado exitosamente: {archivo} -> {nuevo_nombre}")
                         
-                        if es_valido:
-                            ruta_vieja = os.path.join(directorio_uploads, archivo)
-                            ruta_nueva = os.path.join(directorio_uploads, nuevo_nombre)
-                            
-                            st.info(f"🔄 Confirmando renombrado: {archivo} -> {nuevo_nombre}")
-                            
-                            try:
-                                # Verificar que el archivo origen existe
-                                cargador_remoto.sftp.stat(ruta_vieja)
-                                
-                                # Verificar que el archivo destino no existe (para evitar sobreescribir)
-                                try:
-                                    cargador_remoto.sftp.stat(ruta_nueva)
-                                    st.error(f"❌ El archivo destino ya existe: {ruta_nueva}")
-                                    continue
-                                except FileNotFoundError:
-                                    # El archivo destino no existe, proceder con el renombrado
-                                    pass
-                                
-                                # Renombrar archivo
-                                cargador_remoto.sftp.rename(ruta_vieja, ruta_nueva)
-                                archivos_renombrados += 1
-                                st.success(f"✅ Renombrado exitosamente: {archivo} -> {nuevo_nombre}")
-                                
-                            except FileNotFoundError:
-                                st.error(f"❌ Archivo origen no encontrado: {ruta_vieja}")
-                            except Exception as rename_error:
-                                st.error(f"❌ Error renombrando {archivo}: {rename_error}")
+                    except FileNotFoundError:
+                        st.error(f"❌ Archivo origen no encontrado: {os.path.join(directorio_uploads, archivo)}")
+                    except Exception as rename_error:
+                        st.error(f"❌ Error renombrando {archivo}: {rename_error}")
                 
                 if archivos_renombrados == 0:
                     st.warning(f"⚠️ No se encontraron archivos PDF para renombrar con la matrícula: {matricula_vieja}")
                     
-                    # DEBUG: Mostrar archivos que podrían coincidir
-                    archivos_pdf = [a for a in archivos if a.lower().endswith('.pdf')]
-                    st.info(f"🔍 Archivos PDF en el directorio: {len(archivos_pdf)}")
-                    
-                    archivos_coincidentes = [a for a in archivos_pdf if matricula_vieja in a]
-                    st.info(f"🔍 Archivos PDF que contienen '{matricula_vieja}': {len(archivos_coincidentes)}")
-                    for archivo in archivos_coincidentes:
-                        st.info(f"   - {archivo}")
-                    
-                    # También mostrar archivos con diferentes prefijos para debug
-                    st.info("🔍 Archivos con diferentes prefijos para referencia:")
-                    prefijos = ['MAT-INS', 'MAT-EST', 'MAT-EGR', 'MAT-CON']
-                    for prefijo in prefijos:
-                        archivos_prefijo = [a for a in archivos_pdf if a.startswith(prefijo)]
-                        if archivos_prefijo:
-                            st.info(f"   {prefijo}: {len(archivos_prefijo)} archivos")
-                    
             except FileNotFoundError:
                 st.warning(f"📁 Directorio de uploads no encontrado: {directorio_uploads}")
             except Exception as list_error:
                 st.error(f"❌ Error listando archivos: {list_error}")
-            
-            cargador_remoto.desconectar()
+            finally:
+                cargador_remoto.desconectar()
             
             if archivos_renombrados > 0:
                 st.success(f"🎉 Se renombraron {archivos_renombrados} archivos PDF correctamente")
@@ -558,15 +386,11 @@ class SistemaMigracion:
             directorio_uploads = "/home/POLANCO6/ESCUELA/uploads"
             
             try:
-                archivos = cargador_remoto.sftp.listdir(directorio_uploads)
-                
-                # CORRECCIÓN: Buscar archivos que contengan exactamente la matrícula
-                for archivo in archivos:
-                    # Buscar archivos que contengan la matrícula y sean PDF
-                    # Verificación más estricta para evitar falsos positivos
-                    if (archivo.lower().endswith('.pdf') and 
-                        (archivo.startswith(matricula + '_') or f"_{matricula}_" in archivo or matricula in archivo)):
-                        nombres_archivos.append(archivo)
+                # Archivos PDF de la matrícula según el manifiesto de uploads
+                manifiesto = obtener_manifiesto_uploads(directorio_uploads)
+                for entrada in manifiesto.documentos(cargador_remoto.sftp, matricula):
+                    if entrada['extension'] == 'pdf':
+                        nombres_archivos.append(entrada['nombre'])
                 
                 st.info(f"🔍 Encontrados {len(nombres_archivos)} archivos PDF para {matricula}")
                 
@@ -579,8 +403,8 @@ class SistemaMigracion:
                 st.warning(f"📁 Directorio de uploads no encontrado: {directorio_uploads}")
             except Exception as list_error:
                 st.error(f"❌ Error listando archivos: {list_error}")
-            
-            cargador_remoto.desconectar()
+            finally:
+                cargador_remoto.desconectar()
             
             # CORRECCIÓN: Unir todos los nombres de archivos con comas
             if nombres_archivos:
@@ -680,6 +504,8 @@ class SistemaMigracion:
             else:
                 # Si ya hay estudiantes, concatenar
                 # Asegurarse de que todas las columnas existan en ambos DataFrames
+                # (sobre una copia: df_estudiantes es la tabla compartida del proceso)
+                df_estudiantes = df_estudiantes.copy()
                 for columna in nuevo_estudiante_df.columns:
                     if columna not in df_estudiantes.columns:
                         df_estudiantes[columna] = None
@@ -764,6 +590,8 @@ class SistemaMigracion:
             else:
                 # Si ya hay egresados, concatenar
                 # Asegurarse de que todas las columnas existan en ambos DataFrames
+                # (sobre una copia: df_egresados es la tabla compartida del proceso)
+                df_egresados = df_egresados.copy()
                 for columna in nuevo_egresado_df.columns:
                     if columna not in df_egresados.columns:
                         df_egresados[columna] = None
@@ -849,6 +677,8 @@ class SistemaMigracion:
             else:
                 # Si ya hay contratados, concatenar
                 # Asegurarse de que todas las columnas existan en ambos DataFrames
+                # (sobre una copia: df_contratados es la tabla compartida del proceso)
+                df_contratados = df_contratados.copy()
                 for columna in nuevo_contratado_df.columns:
                     if columna not in df_contratados.columns:
                         df_contratados[columna] = None
@@ -1356,7 +1186,7 @@ class SistemaMigracion:
                     del st.session_state.datos_formulario
                 
                 # Recargar datos
-                cargar_datos_completos.clear()
+                obtener_datos_compartidos().invalidar()
                 st.rerun()
                 return True
             else:
@@ -1428,7 +1258,7 @@ class SistemaMigracion:
                     del st.session_state.datos_formulario_egresado
                 
                 # Recargar datos
-                cargar_datos_completos.clear()
+                obtener_datos_compartidos().invalidar()
                 st.rerun()
                 return True
             else:
@@ -1500,7 +1330,7 @@ class SistemaMigracion:
                     del st.session_state.datos_formulario_contratado
                 
                 # Recargar datos
-                cargar_datos_completos.clear()
+                obtener_datos_compartidos().invalidar()
                 st.rerun()
                 return True
             else:
@@ -1514,68 +1344,81 @@ class SistemaMigracion:
             return False
 
     def guardar_cambios(self):
-        """Guardar todos los cambios en el servidor remoto - MEJORADO"""
+        """Guardar todos los cambios en el servidor remoto como una sola transacción
+        
+        Solo se escriben las tablas que la migración modificó (las demás siguen
+        siendo el DataFrame compartido que se cargó). Se preparan junto a su
+        destino, se registra un manifiesto y se renombran sobre una sola conexión
+        del pool: o quedan todas guardadas o ninguna (si el proceso se interrumpe,
+        se completa al reiniciar). La bitácora no se reescribe aquí: sus eventos
+        se anexan por separado.
+        """
         try:
             with st.spinner("💾 Guardando cambios en el servidor remoto..."):
-                cambios_realizados = 0
-                
                 # Actualizar referencias globales
-                global df_inscritos, df_estudiantes, df_egresados, df_contratados, df_usuarios, df_bitacora
+                global df_inscritos, df_estudiantes, df_egresados, df_contratados, df_usuarios
                 self.inscritos = df_inscritos
                 self.estudiantes = df_estudiantes
                 self.egresados = df_egresados
                 self.contratados = df_contratados
                 self.usuarios = df_usuarios
                 
-                # Guardar usuarios
-                if editor.guardar_dataframe_remoto(self.usuarios, editor.obtener_ruta_archivo('usuarios')):
-                    cambios_realizados += 1
-                    st.success("✅ usuarios.csv guardado")
-                else:
-                    st.error("❌ Error guardando usuarios.csv")
-                
-                # Guardar inscritos
-                if editor.guardar_dataframe_remoto(self.inscritos, editor.obtener_ruta_archivo('inscritos')):
-                    cambios_realizados += 1
-                    st.success("✅ inscritos.csv guardado")
-                else:
-                    st.error("❌ Error guardando inscritos.csv")
+                tablas = [
+                    ('usuarios', self.usuarios),
+                    ('inscritos', self.inscritos),
+                    ('estudiantes', self.estudiantes),
+                    ('egresados', self.egresados),
+                    ('contratados', self.contratados)
+                ]
+                # Las ediciones trabajan sobre copias: una tabla sin cambios es el mismo objeto cargado
+                tablas = [(nombre, df) for nombre, df in tablas if df is not datos.get(nombre)]
+                if not tablas:
+                    st.info("ℹ️ No hay cambios que guardar")
+                    return True
                 
-                # Guardar estudiantes
-                if editor.guardar_dataframe_remoto(self.estudiantes, editor.obtener_ruta_archivo('estudiantes')):
-                    cambios_realizados += 1
-                    st.success("✅ estudiantes.csv guardado")
-                else:
-                    st.error("❌ Error guardando estudiantes.csv")
+                # Una tabla que no se pudo leer no se reescribe: se perderían sus registros.
+                # Si simplemente no existía, se crea (el commit exige que siga sin existir)
+                no_cargadas = [nombre for nombre, _ in tablas
+                               if nombre in fallos_carga and not isinstance(fallos_carga[nombre], FileNotFoundError)]
+                if no_cargadas:
+                    st.error(f"❌ No se pudo cargar {', '.join(nombre + '.csv' for nombre in no_cargadas)} del servidor; "
+                             "no se guardó ninguna tabla para no sobrescribirla. Recarga los datos y repite la migración.")
+                    return False
                 
-                # Guardar egresados
-                if editor.guardar_dataframe_remoto(self.egresados, editor.obtener_ruta_archivo('egresados')):
-                    cambios_realizados += 1
-                    st.success("✅ egresados.csv guardado")
-                else:
-                    st.error("❌ Error guardando egresados.csv")
+                if not editor.cargador.conectar():
+                    st.error("❌ No se pudo conectar para guardar los cambios")
+                    return False
                 
-                # Guardar contratados
-                if editor.guardar_dataframe_remoto(self.contratados, editor.obtener_ruta_archivo('contratados')):
-                    cambios_realizados += 1
-                    st.success("✅ contratados.csv guardado")
-                else:
-                    st.error("❌ Error guardando contratados.csv")
+                try:
+                    sftp = editor.cargador.sftp
+                    preparadas = []
+                    for nombre, df in tablas:
+                        ruta_remota = editor.obtener_ruta_archivo(nombre)
+                        editor.crear_directorio_remoto(os.path.dirname(ruta_remota))
+                        preparadas.append((
+                            ruta_remota,
+                            df.to_csv(index=False, encoding='utf-8'),
+                            versiones_cargadas.get(nombre)
+                        ))
+                    
+                    commit_tablas(sftp, editor.base_remota, preparadas)
+                finally:
+                    editor.cargador.desconectar()
                 
-                # Guardar bitácora
-                if editor.guardar_dataframe_remoto(df_bitacora, editor.obtener_ruta_archivo('bitacora')):
-                    cambios_realizados += 1
-                    st.success("✅ bitacora.csv guardado")
+                for nombre, _ in tablas:
+                    editor.datos.invalidar(editor.obtener_ruta_archivo(nombre))
                 
-                if cambios_realizados >= 5:  # Al menos usuarios, inscritos, estudiantes, egresados y contratados
-                    st.success("✅ Todos los cambios guardados exitosamente en el servidor")
-                    return True
-                else:
-                    st.error("❌ No se pudieron guardar todos los cambios en el servidor")
-                    return False
+                st.success(f"✅ Todos los cambios guardados exitosamente en el servidor "
+                           f"({', '.join(nombre + '.csv' for nombre, _ in tablas)})")
+                return True
                 
+        except ConflictoEscritura as e:
+            st.error(f"⚠️ {os.path.basename(e.ruta)} fue modificado por otra sesión desde que se cargó; "
+                     "no se guardó ninguna tabla. Recarga los datos y repite la migración.")
+            obtener_datos_compartidos().invalidar()
+            return False
         except Exception as e:
-            st.error(f"❌ Error guardando cambios: {e}")
+            st.error(f"❌ Error guardando cambios (no se aplicó ninguna tabla): {e}")
             return False
 
 # Instancia del sistema de migración
@@ -1605,7 +1448,7 @@ def mostrar_login():
 
         if st.button("🔄 Recargar Datos Remotos"):
             # Limpiar cache y recargar
-            cargar_datos_completos.clear()
+            obtener_datos_compartidos().invalidar()
             st.rerun()
     
     col1, col2, col3 = st.columns([1,2,1])
@@ -1643,7 +1486,7 @@ def mostrar_interfaz_migrador():
     
     with col2:
         if st.button("🔄 Recargar Datos"):
-            cargar_datos_completos.clear()
+            obtener_datos_compartidos().invalidar()
             st.rerun()
     
     with col3:
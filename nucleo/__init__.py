@@ -0,0 +1,118 @@
+"""Componentes compartidos por escuela10.py, migracion10.py y aspirantes10.py
+
+Cada nombre exportado se importa de su submódulo la primera vez que se pide
+(`from nucleo import cache_csv`): importar el paquete, o uno solo de sus
+submódulos, no carga paramiko ni pyarrow por arrastre.
+"""
+
+import importlib
+
+# Nombre exportado -> submódulo que lo define
+_EXPORTADOS = {
+    # nucleo.pool_sftp
+    'PoolSFTP': 'nucleo.pool_sftp',
+    'SesionSFTP': 'nucleo.pool_sftp',
+    'obtener_pool_sftp': 'nucleo.pool_sftp',
+    # nucleo.esquemas
+    'ESQUEMAS': 'nucleo.esquemas',
+    'aplicar_esquema': 'nucleo.esquemas',
+    'asignar_valor': 'nucleo.esquemas',
+    'esquema_de': 'nucleo.esquemas',
+    'opciones_lectura': 'nucleo.esquemas',
+    # nucleo.lectura_csv
+    'leer_csv_sftp': 'nucleo.lectura_csv',
+    # nucleo.cache_csv
+    'CacheCSV': 'nucleo.cache_csv',
+    'cache_csv': 'nucleo.cache_csv',
+    # nucleo.carga_paralela
+    'cargar_tablas_en_paralelo': 'nucleo.carga_paralela',
+    # nucleo.espejo_local
+    'EspejoLocal': 'nucleo.espejo_local',
+    'invalidar_espejo': 'nucleo.espejo_local',
+    'obtener_espejo': 'nucleo.espejo_local',
+    # nucleo.escritura_atomica
+    'ConflictoEscritura': 'nucleo.escritura_atomica',
+    'escribir_atomico': 'nucleo.escritura_atomica',
+    'sellar_version': 'nucleo.escritura_atomica',
+    'version_de': 'nucleo.escritura_atomica',
+    # nucleo.columnar
+    'escribir_sidecar': 'nucleo.columnar',
+    'ruta_sidecar': 'nucleo.columnar',
+    'sidecar_disponible': 'nucleo.columnar',
+    # nucleo.delta_log
+    'anexar_operaciones': 'nucleo.delta_log',
+    'compactar': 'nucleo.delta_log',
+    'descartar_delta': 'nucleo.delta_log',
+    'guardar_tabla': 'nucleo.delta_log',
+    'operacion_anexar': 'nucleo.delta_log',
+    'operacion_eliminar': 'nucleo.delta_log',
+    'operacion_parchar': 'nucleo.delta_log',
+    'version_tabla': 'nucleo.delta_log',
+    # nucleo.transaccion
+    'commit_tablas': 'nucleo.transaccion',
+    'recuperar_al_iniciar': 'nucleo.transaccion',
+    'recuperar_transacciones': 'nucleo.transaccion',
+    # nucleo.indices
+    'IndiceTabla': 'nucleo.indices',
+    'buscar_filas': 'nucleo.indices',
+    'buscar_posiciones': 'nucleo.indices',
+    'invalidar_indice': 'nucleo.indices',
+    'obtener_indice': 'nucleo.indices',
+    # nucleo.manifiesto_uploads
+    'ManifiestoUploads': 'nucleo.manifiesto_uploads',
+    'matricula_de_archivo': 'nucleo.manifiesto_uploads',
+    'obtener_manifiesto_uploads': 'nucleo.manifiesto_uploads',
+    # nucleo.cache_bytes
+    'CacheBytes': 'nucleo.cache_bytes',
+    'cache_documentos': 'nucleo.cache_bytes',
+    # nucleo.transferencia
+    'barra_progreso': 'nucleo.transferencia',
+    'descargar_por_bloques': 'nucleo.transferencia',
+    'subir_por_bloques': 'nucleo.transferencia',
+    # nucleo.pool_smtp
+    'PoolSMTP': 'nucleo.pool_smtp',
+    'SesionSMTP': 'nucleo.pool_smtp',
+    'obtener_pool_smtp': 'nucleo.pool_smtp',
+    # nucleo.bandeja_correo
+    'BandejaCorreo': 'nucleo.bandeja_correo',
+    'obtener_bandeja_correo': 'nucleo.bandeja_correo',
+    # nucleo.plantillas_correo
+    'Lista': 'nucleo.plantillas_correo',
+    'PlantillaCorreo': 'nucleo.plantillas_correo',
+    'obtener_plantilla': 'nucleo.plantillas_correo',
+    'registrar_plantilla': 'nucleo.plantillas_correo',
+    # nucleo.monitor_salud
+    'MonitorSalud': 'nucleo.monitor_salud',
+    'obtener_monitor_salud': 'nucleo.monitor_salud',
+    # nucleo.bitacora
+    'EscritorBitacora': 'nucleo.bitacora',
+    'obtener_escritor_bitacora': 'nucleo.bitacora',
+    'registrar_evento': 'nucleo.bitacora',
+    # nucleo.tablas_perezosas
+    'TablaPerezosa': 'nucleo.tablas_perezosas',
+    'TablasPerezosas': 'nucleo.tablas_perezosas',
+    'materializar': 'nucleo.tablas_perezosas',
+    # nucleo.datos_compartidos
+    'DatosCompartidos': 'nucleo.datos_compartidos',
+    'obtener_datos_compartidos': 'nucleo.datos_compartidos',
+    # nucleo.remoto
+    'CargadorRemoto': 'nucleo.remoto',
+    'EditorRemoto': 'nucleo.remoto',
+    # nucleo.autenticacion
+    'AutenticacionUsuarios': 'nucleo.autenticacion',
+}
+
+__all__ = sorted(_EXPORTADOS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTADOS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(modulo), nombre)
+    globals()[nombre] = valor  # las siguientes consultas no pasan por aquí
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTADOS))
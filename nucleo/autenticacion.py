@@ -0,0 +1,56 @@
+import hashlib
+
+import streamlit as st
+
+from nucleo.indices import buscar_filas
+from nucleo.bitacora import registrar_evento
+
+# =============================================================================
+# AUTENTICACIÓN CONTRA config/usuarios.csv (COMÚN A LAS APPS CON LOGIN)
+# =============================================================================
+#
+# Cada app decide quién puede entrar y qué mensajes muestra; aquí queda lo que
+# hacían igual: buscar el usuario en el índice, comparar la contraseña, abrir
+# la sesión en st.session_state y anotar en la bitácora.
+
+class AutenticacionUsuarios:
+    def __init__(self, usuarios):
+        # DataFrame compartido del proceso: solo se lee
+        self.usuarios = usuarios
+        self.sesion_activa = False
+        self.usuario_actual = None
+
+    def hash_password(self, password):
+        """Hash simple para contraseñas"""
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def buscar_usuario(self, usuario):
+        """Filas de usuarios.csv cuyo 'usuario' coincide sin distinguir mayúsculas ni espacios"""
+        return buscar_filas('usuarios', self.usuarios, 'usuario', str(usuario).strip(), ignorar_mayusculas=True)
+
+    def password_valida(self, registro, password, aceptar_hash=False):
+        """Comparar la contraseña ingresada con la guardada (en claro o, si se acepta, su sha256)"""
+        almacenada = registro.get('password', '')
+        if almacenada is None:
+            return False
+        almacenada = str(almacenada).strip()
+        ingresada = str(password).strip()
+        return almacenada == ingresada or (aceptar_hash and almacenada == self.hash_password(ingresada))
+
+    def abrir_sesion(self, registro):
+        """Marcar la sesión como iniciada con los datos del usuario"""
+        datos_usuario = registro.to_dict()
+        st.session_state.login_exitoso = True
+        st.session_state.usuario_actual = datos_usuario
+        self.sesion_activa = True
+        self.usuario_actual = datos_usuario
+
+    def registrar_bitacora(self, accion, detalles):
+        """Registrar actividad en bitácora (se anexa al servidor en segundo plano)"""
+        try:
+            registrar_evento(
+                self.usuario_actual.get('usuario', 'Sistema') if self.usuario_actual else 'Sistema',
+                accion, detalles
+            )
+        except Exception as e:
+            st.error(f"❌ Error registrando en bitácora: {e}")
@@ -0,0 +1,254 @@
+import json
+import os
+import random
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+from nucleo.pool_smtp import obtener_pool_smtp
+
+# =============================================================================
+# BANDEJA DE SALIDA DE CORREO (SQLITE LOCAL + HILO DE ENVÍO EN SEGUNDO PLANO)
+# =============================================================================
+#
+# La interfaz solo encola el mensaje ya armado y sigue; un hilo por proceso
+# envía lo pendiente en lotes por el pool SMTP y reintenta con espera exponencial. La cola
+# vive en disco, así que los mensajes sobreviven a un reinicio. Opcional en
+# secrets.toml:
+#
+#     bandeja_correo_dir = "/var/tmp/escuela_bandeja"
+#     bandeja_max_intentos = 8
+#
+# Varios procesos pueden compartir el archivo: cada mensaje se reclama con un
+# UPDATE condicional antes de enviarlo.
+
+PENDIENTE = 'pendiente'
+ENVIANDO = 'enviando'
+ENVIADO = 'enviado'
+FALLIDO = 'fallido'
+
+# Un mensaje "enviando" más antiguo que esto quedó de un proceso que murió
+RECLAMO_CADUCADO = 600
+# Los enviados se conservan unos días para diagnóstico
+RETENCION_ENVIADOS = 7 * 24 * 3600
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS mensajes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    creado REAL NOT NULL,
+    remitente TEXT NOT NULL,
+    destinatarios TEXT NOT NULL,
+    asunto TEXT,
+    contenido TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento REAL NOT NULL,
+    reclamado REAL,
+    enviado REAL,
+    ultimo_error TEXT
+);
+CREATE INDEX IF NOT EXISTS mensajes_pendientes ON mensajes (estado, proximo_intento);
+"""
+
+
+def _es_permanente(error):
+    """Errores que no se arreglan reintentando el mismo mensaje"""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600 \
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+class BandejaCorreo:
+    def __init__(self, ruta_db, pool, max_intentos=8, espera_base=30,
+                 espera_max=3600, intervalo=5, lote=50):
+        self.ruta_db = ruta_db
+        self.pool = pool
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.intervalo = intervalo
+        self.lote = lote
+        self.ultimo_error = None
+        self.ultimo_envio = None
+        self.despertar = threading.Event()
+        self.detener = threading.Event()
+        self.hilo = None
+
+        os.makedirs(os.path.dirname(ruta_db) or '.', exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión SQLite de corta vida: confirma al salir sin error y siempre se cierra"""
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def encolar(self, mensaje, destinatarios=None, remitente=None):
+        """Guardar un email.message listo para enviar; devuelve su id en la bandeja"""
+        remitente = remitente or mensaje['From'] or self.pool.usuario
+        if destinatarios is None:
+            destinatarios = [d.strip() for campo in ('To', 'Cc', 'Bcc')
+                             for d in (mensaje.get(campo) or '').split(',') if d.strip()]
+        destinatarios = [d for d in destinatarios if d]
+        if not destinatarios:
+            raise ValueError("El mensaje no tiene destinatarios")
+
+        ahora = time.time()
+        with self._conectar() as conexion:
+            cursor = conexion.execute(
+                "INSERT INTO mensajes (creado, remitente, destinatarios, asunto, contenido, estado, proximo_intento)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ahora, remitente, json.dumps(destinatarios), str(mensaje['Subject'] or ''),
+                 mensaje.as_string(), PENDIENTE, ahora)
+            )
+            id_mensaje = cursor.lastrowid
+        self.despertar.set()
+        return id_mensaje
+
+    def _reclamar(self):
+        """Marcar como 'enviando' un lote de mensajes vencidos y devolverlos"""
+        ahora = time.time()
+        reclamados = []
+        with self._conectar() as conexion:
+            conexion.execute(
+                "UPDATE mensajes SET estado = ? WHERE estado = ? AND reclamado < ?",
+                (PENDIENTE, ENVIANDO, ahora - RECLAMO_CADUCADO)
+            )
+            filas = conexion.execute(
+                "SELECT id, remitente, destinatarios, contenido, intentos FROM mensajes"
+                " WHERE estado = ? AND proximo_intento <= ? ORDER BY id LIMIT ?",
+                (PENDIENTE, ahora, self.lote)
+            ).fetchall()
+            for fila in filas:
+                cursor = conexion.execute(
+                    "UPDATE mensajes SET estado = ?, reclamado = ? WHERE id = ? AND estado = ?",
+                    (ENVIANDO, ahora, fila[0], PENDIENTE)
+                )
+                if cursor.rowcount == 1:
+                    reclamados.append(fila)
+        return reclamados
+
+    def _espera(self, intentos):
+        espera = min(self.espera_base * (2 ** (intentos - 1)), self.espera_max)
+        return espera * random.uniform(0.8, 1.2)
+
+    def _registrar_resultado(self, id_mensaje, intentos, error=None):
+        ahora = time.time()
+        with self._conectar() as conexion:
+            if error is None:
+                conexion.execute(
+                    "UPDATE mensajes SET estado = ?, enviado = ?, intentos = ?, ultimo_error = NULL WHERE id = ?",
+                    (ENVIADO, ahora, intentos, id_mensaje)
+                )
+                return
+            definitivo = _es_permanente(error) or intentos >= self.max_intentos
+            conexion.execute(
+                "UPDATE mensajes SET estado = ?, intentos = ?, proximo_intento = ?, ultimo_error = ? WHERE id = ?",
+                (FALLIDO if definitivo else PENDIENTE, intentos,
+                 ahora + self._espera(intentos), f"{type(error).__name__}: {error}", id_mensaje)
+            )
+
+    def procesar_pendientes(self):
+        """Enviar lo que esté vencido en la bandeja; devuelve cuántos se enviaron"""
+        reclamados = self._reclamar()
+        if not reclamados:
+            return 0
+
+        resultados = self.pool.enviar_lote([
+            (remitente, json.loads(destinatarios), contenido)
+            for _, remitente, destinatarios, contenido, _ in reclamados
+        ])
+        enviados = 0
+        for (id_mensaje, _, _, _, intentos), error in zip(reclamados, resultados):
+            self._registrar_resultado(id_mensaje, intentos + 1, error)
+            if error is None:
+                enviados += 1
+            else:
+                self.ultimo_error = f"{type(error).__name__}: {error}"
+        if enviados:
+            self.ultimo_envio = time.time()
+        return enviados
+
+    def _purgar_enviados(self):
+        with self._conectar() as conexion:
+            conexion.execute(
+                "DELETE FROM mensajes WHERE estado = ? AND enviado < ?",
+                (ENVIADO, time.time() - RETENCION_ENVIADOS)
+            )
+
+    def _ciclo(self):
+        while not self.detener.is_set():
+            try:
+                self.procesar_pendientes()
+                self._purgar_enviados()
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+            self.despertar.wait(self.intervalo)
+            self.despertar.clear()
+
+    def iniciar(self):
+        """Lanzar el hilo de envío (una vez por proceso)"""
+        if self.hilo is None or not self.hilo.is_alive():
+            self.detener.clear()
+            self.hilo = threading.Thread(target=self._ciclo, name="bandeja_correo", daemon=True)
+            self.hilo.start()
+
+    def parar(self):
+        self.detener.set()
+        self.despertar.set()
+
+    def reintentar_fallidos(self):
+        """Devolver a la cola los mensajes que agotaron sus intentos"""
+        with self._conectar() as conexion:
+            cursor = conexion.execute(
+                "UPDATE mensajes SET estado = ?, intentos = 0, proximo_intento = ? WHERE estado = ?",
+                (PENDIENTE, time.time(), FALLIDO)
+            )
+        self.despertar.set()
+        return cursor.rowcount
+
+    def estadisticas(self):
+        with self._conectar() as conexion:
+            conteos = dict(conexion.execute(
+                "SELECT estado, COUNT(*) FROM mensajes GROUP BY estado"
+            ).fetchall())
+        return {
+            'pendientes': conteos.get(PENDIENTE, 0) + conteos.get(ENVIANDO, 0),
+            'enviados': conteos.get(ENVIADO, 0),
+            'fallidos': conteos.get(FALLIDO, 0),
+            'ultimo_error': self.ultimo_error,
+            'ultimo_envio': self.ultimo_envio
+        }
+
+
+_bandeja = None
+_lock_bandeja = threading.Lock()
+
+
+def obtener_bandeja_correo():
+    """Bandeja del proceso con su hilo de envío ya en marcha"""
+    global _bandeja
+    with _lock_bandeja:
+        if _bandeja is None:
+            directorio = st.secrets.get(
+                "bandeja_correo_dir", os.path.join(tempfile.gettempdir(), "escuela_bandeja")
+            )
+            _bandeja = BandejaCorreo(
+                ruta_db=os.path.join(directorio, "bandeja_correo.sqlite3"),
+                pool=obtener_pool_smtp(),
+                max_intentos=int(st.secrets.get("bandeja_max_intentos", 8))
+            )
+            _bandeja.iniciar()
+        return _bandeja
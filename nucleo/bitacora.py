@@ -0,0 +1,226 @@
+import atexit
+import glob
+import json
+import os
+import posixpath
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from nucleo.cache_csv import cache_csv
+from nucleo.delta_log import anexar_operaciones, guardar_tabla, operacion_anexar
+from nucleo.espejo_local import invalidar_espejo
+from nucleo.pool_sftp import obtener_pool_sftp
+
+# =============================================================================
+# BITÁCORA DE SOLO ANEXAR CON BUFFER Y DIARIO LOCAL
+# =============================================================================
+#
+# registrar() escribe una línea en un diario local y la deja en memoria: costo
+# constante por evento, sin red. Un hilo vacía el buffer al servidor como un
+# solo anexo al delta de bitacora.csv cuando junta `bitacora_lote` eventos o
+# pasan `bitacora_espera` segundos (secrets.toml). El diario se borra solo
+# cuando el servidor confirmó; si el proceso muere antes, el siguiente proceso
+# en la misma máquina lo reenvía al arrancar.
+
+COLUMNAS_BITACORA = ['timestamp', 'usuario', 'accion', 'detalles', 'ip']
+
+
+def entrada_bitacora(usuario, accion, detalles, ip='localhost'):
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'usuario': usuario,
+        'accion': accion,
+        'detalles': detalles,
+        'ip': ip
+    }
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class EscritorBitacora:
+    def __init__(self, pool, ruta_csv, directorio_diario, max_lote=50, max_espera=10):
+        self.pool = pool
+        self.ruta_csv = ruta_csv
+        self.directorio_diario = directorio_diario
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.pendientes = []
+        self.rotados = []
+        self.ultimo_error = None
+        self.eventos_enviados = 0
+        self.lock = threading.Lock()
+        self.lock_envio = threading.Lock()
+        self.despertar = threading.Event()
+        self.detener = threading.Event()
+        self.hilo = None
+
+        os.makedirs(directorio_diario, exist_ok=True)
+        self.ruta_diario = os.path.join(directorio_diario, f"diario-{os.getpid()}.jsonl")
+        self._adoptar_diarios_huerfanos()
+        self.diario = open(self.ruta_diario, 'a', encoding='utf-8')
+
+    def _adoptar_diarios_huerfanos(self):
+        """Recuperar lo que procesos muertos dejaron sin enviar"""
+        for ruta in sorted(glob.glob(os.path.join(self.directorio_diario, "diario-*.jsonl*"))):
+            try:
+                pid = int(os.path.basename(ruta).split('-')[1].split('.')[0])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and _proceso_vivo(pid):
+                continue
+            # Tomarlo con un rename: si otro proceso que arranca a la vez ganó, se salta
+            adoptado = f"{self.ruta_diario}.adoptado-{time.time_ns()}"
+            try:
+                os.replace(ruta, adoptado)
+            except FileNotFoundError:
+                continue
+            with open(adoptado, encoding='utf-8') as archivo:
+                for linea in archivo:
+                    try:
+                        self.pendientes.append(json.loads(linea))
+                    except ValueError:
+                        pass  # última línea a medio escribir
+            self.rotados.append(adoptado)
+
+    def registrar(self, entrada):
+        """Anotar un evento (O(1), sin red); lo persiste el hilo de envío"""
+        linea = json.dumps(entrada, ensure_ascii=False) + '\n'
+        with self.lock:
+            self.diario.write(linea)
+            self.diario.flush()
+            self.pendientes.append(entrada)
+            lleno = len(self.pendientes) >= self.max_lote
+        if lleno:
+            self.despertar.set()
+
+    def _rotar_diario(self):
+        """Apartar el diario actual (llamar con self.lock tomado)"""
+        self.diario.close()
+        rotado = f"{self.ruta_diario}.enviando-{time.time_ns()}"
+        os.replace(self.ruta_diario, rotado)
+        self.rotados.append(rotado)
+        self.diario = open(self.ruta_diario, 'a', encoding='utf-8')
+
+    def _anexar_remoto(self, lote):
+        sesion = self.pool.adquirir()
+        descartar = False
+        try:
+            try:
+                if anexar_operaciones(sesion.sftp, self.ruta_csv, [operacion_anexar(e) for e in lote]):
+                    cache_csv.invalidar(self.ruta_csv)
+            except FileNotFoundError:
+                # Primera entrada: la bitácora todavía no existe en el servidor
+                guardar_tabla(sesion.sftp, self.ruta_csv,
+                              pd.DataFrame(lote, columns=COLUMNAS_BITACORA).to_csv(index=False))
+                cache_csv.invalidar(self.ruta_csv)
+            invalidar_espejo(self.ruta_csv)
+        except Exception:
+            descartar = True
+            raise
+        finally:
+            self.pool.liberar(sesion, descartar=descartar)
+
+    def vaciar(self):
+        """Enviar todo lo pendiente en un solo anexo; devuelve cuántos eventos se enviaron"""
+        with self.lock_envio:
+            with self.lock:
+                if not self.pendientes:
+                    return 0
+                lote, self.pendientes = self.pendientes, []
+                if self.diario.tell():
+                    self._rotar_diario()
+                confirmados = list(self.rotados)
+            try:
+                self._anexar_remoto(lote)
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                with self.lock:
+                    self.pendientes = lote + self.pendientes
+                return 0
+
+            with self.lock:
+                self.rotados = [ruta for ruta in self.rotados if ruta not in confirmados]
+                self.eventos_enviados += len(lote)
+            for ruta in confirmados:
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+            return len(lote)
+
+    def _ciclo(self):
+        while not self.detener.is_set():
+            self.despertar.wait(self.max_espera)
+            self.despertar.clear()
+            try:
+                self.vaciar()
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+
+    def iniciar(self):
+        """Lanzar el hilo de envío (una vez por proceso)"""
+        if self.hilo is None or not self.hilo.is_alive():
+            self.detener.clear()
+            self.hilo = threading.Thread(target=self._ciclo, name="bitacora", daemon=True)
+            self.hilo.start()
+        if self.pendientes:
+            self.despertar.set()  # lo heredado de un proceso anterior sale ya
+
+    def parar(self):
+        """Detener el hilo e intentar un último envío"""
+        self.detener.set()
+        self.despertar.set()
+        try:
+            self.vaciar()
+        except Exception:
+            pass
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                'pendientes': len(self.pendientes),
+                'enviados': self.eventos_enviados,
+                'ultimo_error': self.ultimo_error
+            }
+
+
+_escritor = None
+_lock_escritor = threading.Lock()
+
+
+def obtener_escritor_bitacora():
+    """Escritor de bitácora del proceso con su hilo de envío en marcha"""
+    global _escritor
+    with _lock_escritor:
+        if _escritor is None:
+            base_remota = st.secrets.get("remote_dir", "/home/POLANCO6/ESCUELA")
+            _escritor = EscritorBitacora(
+                pool=obtener_pool_sftp(),
+                ruta_csv=posixpath.join(base_remota, "datos", "bitacora.csv"),
+                directorio_diario=st.secrets.get(
+                    "bitacora_dir", os.path.join(tempfile.gettempdir(), "escuela_bitacora")
+                ),
+                max_lote=int(st.secrets.get("bitacora_lote", 50)),
+                max_espera=st.secrets.get("bitacora_espera", 10)
+            )
+            _escritor.iniciar()
+            atexit.register(_escritor.parar)
+        return _escritor
+
+
+def registrar_evento(usuario, accion, detalles, ip='localhost'):
+    """Atajo para las apps: anotar un evento en la bitácora compartida"""
+    obtener_escritor_bitacora().registrar(entrada_bitacora(usuario, accion, detalles, ip))
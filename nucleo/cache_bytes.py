@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+from nucleo.transferencia import descargar_por_bloques
+
+# =============================================================================
+# CACHE LRU DE BYTES PARA DESCARGAS DE DOCUMENTOS
+# =============================================================================
+
+class CacheBytes:
+    """Contenido de archivos remotos por (ruta, mtime, tamaño), acotado en bytes totales"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_por_archivo=None):
+        self.max_bytes = max_bytes
+        # Un archivo enorme no debe vaciar la cache entera
+        self.max_por_archivo = max_por_archivo if max_por_archivo is not None else max_bytes // 4
+        self.entradas = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.descargas = 0
+
+    def _buscar(self, clave):
+        with self.lock:
+            contenido = self.entradas.get(clave)
+            if contenido is not None:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+            return contenido
+
+    def _guardar(self, clave, contenido):
+        if len(contenido) > self.max_por_archivo:
+            return
+        with self.lock:
+            if clave in self.entradas:
+                return
+            # Versiones anteriores del mismo archivo ya no sirven
+            for anterior in [c for c in self.entradas if c[0] == clave[0]]:
+                self.total -= len(self.entradas.pop(anterior))
+            self.entradas[clave] = contenido
+            self.total += len(contenido)
+            while self.total > self.max_bytes:
+                _, expulsado = self.entradas.popitem(last=False)
+                self.total -= len(expulsado)
+
+    def obtener(self, sftp, ruta_remota, progreso=None):
+        """Bytes del archivo remoto; solo se descarga si no está en cache con el mismo mtime/tamaño"""
+        atributos = sftp.stat(ruta_remota)
+        clave = (ruta_remota, atributos.st_mtime, atributos.st_size)
+        contenido = self._buscar(clave)
+        if contenido is not None:
+            return contenido
+
+        contenido = descargar_por_bloques(sftp, ruta_remota, progreso=progreso)
+        with self.lock:
+            self.descargas += 1
+        self._guardar(clave, contenido)
+        return contenido
+
+    def invalidar(self, ruta_remota=None):
+        with self.lock:
+            if ruta_remota is None:
+                self.entradas.clear()
+                self.total = 0
+                return
+            for clave in [c for c in self.entradas if c[0] == ruta_remota]:
+                self.total -= len(self.entradas.pop(clave))
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                'archivos': len(self.entradas),
+                'bytes': self.total,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'descargas': self.descargas
+            }
+
+
+# Una sola cache por proceso para los documentos de uploads/
+cache_documentos = CacheBytes()
@@ -0,0 +1,79 @@
+import threading
+
+from nucleo.columnar import leer_sidecar_sftp
+from nucleo.delta_log import aplicar_operaciones, leer_delta_sftp, tamano_delta_sftp
+from nucleo.escritura_atomica import sellar_version
+from nucleo.esquemas import aplicar_esquema
+from nucleo.lectura_csv import leer_csv_sftp
+
+# =============================================================================
+# CACHE DE CSV REMOTOS VALIDADA POR st_mtime / st_size
+# =============================================================================
+
+class CacheCSV:
+    """DataFrames ya parseados por ruta remota; el servidor sigue siendo la fuente de verdad"""
+
+    def __init__(self):
+        self.entradas = {}
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.descargas = 0
+
+    def obtener(self, sftp, ruta_remota, copiar=True):
+        """Devolver el CSV remoto, descargándolo solo si cambió desde la última lectura
+
+        Lanza FileNotFoundError si el archivo no existe en el servidor. Las
+        filas del delta (.csv.delta) se aplican encima; si solo creció el
+        delta, se leen únicamente los bytes nuevos. El DataFrame devuelto lleva
+        en attrs la versión remota leída, que exigen los guardados completos.
+        Con copiar=False se devuelve el DataFrame de la cache, compartido por
+        todas las sesiones: no debe modificarse en sitio.
+        """
+        atributos = sftp.stat(ruta_remota)
+        firma = (atributos.st_mtime, atributos.st_size)
+        tamano_delta = tamano_delta_sftp(sftp, ruta_remota)
+        version = firma + (tamano_delta,)
+
+        with self.lock:
+            entrada = self.entradas.get(ruta_remota)
+
+        if entrada is not None and entrada['firma'] == firma:
+            operaciones, offset = leer_delta_sftp(sftp, ruta_remota, atributos.st_size,
+                                                  entrada['offset_delta'], tamano_delta)
+            if operaciones is not None:
+                df = entrada['df']
+                if operaciones:
+                    df = aplicar_esquema(aplicar_operaciones(df, operaciones), ruta_remota)
+                with self.lock:
+                    self.entradas[ruta_remota] = {'firma': firma, 'df': df, 'offset_delta': offset}
+                    self.aciertos += 1
+                # Copia: las pantallas modifican sus DataFrames en sitio
+                return sellar_version(df.copy() if copiar else df, version)
+
+        # Preferir la copia columnar vigente: menos bytes y sin parsear texto
+        df = leer_sidecar_sftp(sftp, ruta_remota, atributos)
+        if df is None:
+            df = leer_csv_sftp(sftp, ruta_remota)
+
+        operaciones, offset = leer_delta_sftp(sftp, ruta_remota, atributos.st_size, tamano_delta=tamano_delta)
+        if operaciones:
+            df = aplicar_operaciones(df, operaciones)
+        # Una sidecar anterior al esquema, o filas del delta, pueden traer tipos inferidos
+        aplicar_esquema(df, ruta_remota)
+
+        with self.lock:
+            self.entradas[ruta_remota] = {'firma': firma, 'df': df, 'offset_delta': offset}
+            self.descargas += 1
+        return sellar_version(df.copy() if copiar else df, version)
+
+    def invalidar(self, ruta_remota=None):
+        """Olvidar una ruta (tras escribirla) o toda la cache"""
+        with self.lock:
+            if ruta_remota is None:
+                self.entradas.clear()
+            else:
+                self.entradas.pop(ruta_remota, None)
+
+
+# Una sola cache por proceso, compartida por todas las sesiones
+cache_csv = CacheCSV()
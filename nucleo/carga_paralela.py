@@ -0,0 +1,70 @@
+import socket
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from nucleo.cache_csv import cache_csv
+
+# =============================================================================
+# CARGA CONCURRENTE DE TABLAS CSV SOBRE EL POOL SFTP
+# =============================================================================
+
+def _cargar_tabla(pool, ruta_remota, timeout_tabla, espejo=None, copiar=True):
+    """Descargar una tabla (o reutilizarla si no cambió) con su propia sesión del pool"""
+    if espejo is not None and espejo.tiene_copia(ruta_remota):
+        return espejo.leer_csv(ruta_remota, copiar=copiar)
+
+    sesion = pool.adquirir()
+    descartar = False
+    try:
+        # El timeout del canal corta lecturas bloqueadas de esta tabla
+        sesion.sftp.get_channel().settimeout(timeout_tabla)
+        return cache_csv.obtener(sesion.sftp, ruta_remota, copiar=copiar)
+    except FileNotFoundError:
+        raise
+    except Exception:
+        descartar = True
+        raise
+    finally:
+        try:
+            sesion.sftp.get_channel().settimeout(None)
+        except Exception:
+            descartar = True
+        pool.liberar(sesion, descartar=descartar)
+
+
+def cargar_tablas_en_paralelo(pool, rutas_remotas, max_hilos=4, timeout_tabla=60, espejo=None, copiar=True):
+    """Descargar varias tablas a la vez; devuelve (datos, fallos)
+
+    `datos` tiene un DataFrame por cada nombre de `rutas_remotas` (vacío si
+    falló) y `fallos` asocia cada tabla fallida con su excepción. Con un
+    `espejo` activo, las tablas replicadas se leen del disco local. Con
+    copiar=False se devuelven los DataFrames compartidos del proceso.
+    """
+    datos = {nombre: pd.DataFrame() for nombre in rutas_remotas}
+    fallos = {}
+
+    hilos = max(1, min(max_hilos, len(rutas_remotas)))
+    tandas = -(-len(rutas_remotas) // hilos)
+    ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="carga_csv")
+    try:
+        futuros = {
+            ejecutor.submit(_cargar_tabla, pool, ruta, timeout_tabla, espejo, copiar): nombre
+            for nombre, ruta in rutas_remotas.items()
+        }
+        terminados, pendientes = wait(futuros, timeout=timeout_tabla * tandas)
+
+        for futuro in terminados:
+            nombre = futuros[futuro]
+            try:
+                datos[nombre] = futuro.result()
+            except Exception as e:
+                fallos[nombre] = e
+
+        for futuro in pendientes:
+            futuro.cancel()
+            fallos[futuros[futuro]] = socket.timeout(f"sin respuesta tras {timeout_tabla}s")
+    finally:
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+
+    return datos, fallos
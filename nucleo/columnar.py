@@ -0,0 +1,111 @@
+import os
+from io import StringIO
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow llega con streamlit, pero sin él se sigue usando solo CSV
+    pa = None
+    feather = None
+
+from nucleo.escritura_atomica import escribir_atomico
+from nucleo.esquemas import aplicar_esquema, opciones_lectura
+
+# =============================================================================
+# COPIA COLUMNAR (ARROW IPC) JUNTO A CADA CSV
+# =============================================================================
+#
+# inscritos.csv  ->  inscritos.csv.arrow
+#
+# El CSV sigue siendo la fuente de verdad. La copia .arrow solo se usa si es
+# más reciente que el CSV y guarda el tamaño exacto del CSV del que salió.
+
+EXTENSION_SIDECAR = '.arrow'
+CLAVE_TAMANO_CSV = b'escuela_csv_bytes'
+
+
+def sidecar_disponible():
+    return pa is not None
+
+
+def ruta_sidecar(ruta_csv):
+    return ruta_csv + EXTENSION_SIDECAR
+
+
+def serializar_sidecar(texto_csv, ruta_csv):
+    """Convertir el texto CSV recién guardado a bytes Arrow IPC comprimidos
+
+    Se vuelve a parsear el propio CSV con el esquema de la tabla para que los
+    tipos sean exactamente los que obtendría leer_csv_sftp (las categorías
+    quedan como columnas de diccionario).
+    """
+    df = aplicar_esquema(pd.read_csv(StringIO(texto_csv), **opciones_lectura(ruta_csv)), ruta_csv)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[CLAVE_TAMANO_CSV] = str(len(texto_csv.encode('utf-8'))).encode()
+    tabla = tabla.replace_schema_metadata(metadatos)
+
+    buffer = pa.BufferOutputStream()
+    feather.write_feather(tabla, buffer, compression='zstd')
+    return buffer.getvalue().to_pybytes()
+
+
+def _tabla_a_dataframe(tabla, tamano_csv):
+    metadatos = tabla.schema.metadata or {}
+    if metadatos.get(CLAVE_TAMANO_CSV) != str(tamano_csv).encode():
+        return None
+    return tabla.to_pandas()
+
+
+def escribir_sidecar(sftp, ruta_csv, texto_csv):
+    """Escribir la copia .arrow después del CSV; si no se puede, borrar la anterior"""
+    if not sidecar_disponible():
+        return False
+    ruta = ruta_sidecar(ruta_csv)
+    try:
+        escribir_atomico(sftp, ruta, serializar_sidecar(texto_csv, ruta_csv))
+        return True
+    except Exception:
+        # Columnas con tipos mezclados no se pueden pasar a Arrow: queda solo el CSV
+        try:
+            sftp.remove(ruta)
+        except Exception:
+            pass
+        return False
+
+
+def leer_sidecar_sftp(sftp, ruta_csv, atributos_csv):
+    """DataFrame desde la copia .arrow remota, o None si no existe o no está vigente"""
+    if not sidecar_disponible():
+        return None
+    try:
+        atributos = sftp.stat(ruta_sidecar(ruta_csv))
+    except FileNotFoundError:
+        return None
+    if atributos.st_mtime < atributos_csv.st_mtime:
+        return None
+
+    try:
+        with sftp.file(ruta_sidecar(ruta_csv), 'rb') as archivo_remoto:
+            archivo_remoto.prefetch()
+            contenido = archivo_remoto.read()
+        tabla = feather.read_table(pa.BufferReader(contenido))
+        return _tabla_a_dataframe(tabla, atributos_csv.st_size)
+    except Exception:
+        return None
+
+
+def leer_sidecar_local(ruta_csv_local):
+    """Igual que leer_sidecar_sftp pero sobre la copia del espejo local"""
+    if not sidecar_disponible():
+        return None
+    ruta = ruta_sidecar(ruta_csv_local)
+    try:
+        atributos_csv = os.stat(ruta_csv_local)
+        if int(os.stat(ruta).st_mtime) < int(atributos_csv.st_mtime):
+            return None
+        return _tabla_a_dataframe(feather.read_table(ruta), atributos_csv.st_size)
+    except Exception:
+        return None
@@ -0,0 +1,74 @@
+import os
+
+import streamlit as st
+
+from nucleo.cache_csv import cache_csv
+from nucleo.carga_paralela import cargar_tablas_en_paralelo
+from nucleo.espejo_local import invalidar_espejo, obtener_espejo
+from nucleo.pool_sftp import obtener_pool_sftp
+from nucleo.tablas_perezosas import TablasPerezosas
+
+# =============================================================================
+# ALMACÉN DE DATOS DEL PROCESO (UNA COPIA DE CADA TABLA PARA TODAS LAS SESIONES)
+# =============================================================================
+#
+# Las tablas se parsean una vez por versión remota y todas las sesiones de
+# escuela10.py, migracion10.py y aspirantes10.py reciben el mismo DataFrame:
+# la memoria crece con el tamaño de los datos, no con el número de sesiones.
+# Esos DataFrames son de solo lectura; quien vaya a editar una tabla trabaja
+# sobre df.copy() (conserva en attrs la versión que exigen los guardados).
+
+# Carpeta remota de cada tabla bajo remote_dir
+TABLAS = {
+    'inscritos': 'datos',
+    'estudiantes': 'datos',
+    'egresados': 'datos',
+    'contratados': 'datos',
+    'actualizaciones_academicas': 'datos',
+    'certificaciones': 'datos',
+    'programas_educativos': 'datos',
+    'costos_programas': 'datos',
+    'usuarios': 'config',
+    'roles_permisos': 'config',
+    'bitacora': 'datos'
+}
+
+
+class DatosCompartidos:
+    def __init__(self, pool, base_remota, max_hilos=4):
+        self.pool = pool
+        self.base_remota = base_remota
+        self.max_hilos = max_hilos
+        self.rutas = {nombre: os.path.join(base_remota, carpeta, f"{nombre}.csv")
+                      for nombre, carpeta in TABLAS.items()}
+
+    def ruta(self, nombre):
+        """Ruta remota de una tabla ('' si no es una tabla conocida)"""
+        return self.rutas.get(nombre, "")
+
+    def cargar(self, nombres=None):
+        """Tablas pedidas (todas por defecto) como DataFrames compartidos; devuelve (datos, fallos)
+
+        Cada llamada solo consulta el servidor (un stat por tabla): se descarga
+        lo que cambió y el resto es el mismo objeto que ya usan otras sesiones.
+        """
+        rutas = {nombre: self.rutas[nombre] for nombre in (nombres or self.rutas)}
+        return cargar_tablas_en_paralelo(self.pool, rutas, max_hilos=self.max_hilos,
+                                         espejo=obtener_espejo(),
+                                         copiar=False)
+
+    def perezosas(self, al_fallar=None):
+        """Tablas de este rerun que se piden al servidor solo cuando una pantalla las usa"""
+        return TablasPerezosas(self, al_fallar)
+
+    def invalidar(self, ruta_remota=None):
+        """Olvidar una tabla recién escrita (o todas): la próxima carga la vuelve a leer"""
+        cache_csv.invalidar(ruta_remota)
+        for ruta in ([ruta_remota] if ruta_remota else self.rutas.values()):
+            invalidar_espejo(ruta)
+
+
+@st.cache_resource
+def obtener_datos_compartidos():
+    """Almacén de datos del proceso, compartido por todas las sesiones"""
+    return DatosCompartidos(obtener_pool_sftp(), st.secrets.get("remote_dir", "/home/POLANCO6/ESCUELA"))
@@ -0,0 +1,346 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+from nucleo.columnar import escribir_sidecar
+from nucleo.escritura_atomica import ConflictoEscritura, escribir_atomico, sellar_version, version_de
+from nucleo.esquemas import asignar_valor, quitar_categorias_sin_uso
+from nucleo.lectura_csv import leer_csv_sftp
+
+# =============================================================================
+# REGISTRO DELTA POR TABLA (ANEXAR / PARCHAR / ELIMINAR FILAS)
+# =============================================================================
+#
+# inscritos.csv        ->  tabla base
+# inscritos.csv.delta  ->  JSON por línea con los cambios posteriores
+#
+# La primera línea del delta guarda el tamaño en bytes del CSV sobre el que se
+# creó: si el CSV se reescribe (compactación o guardado completo) ese delta
+# deja de aplicarse y el siguiente cambio abre uno nuevo. Los lectores leen
+# solo los bytes añadidos desde la última vez.
+#
+# La versión de una tabla es (mtime del CSV, tamaño del CSV, tamaño del delta):
+# los lectores la guardan en df.attrs y los guardados completos la exigen.
+#
+# Quien escribe (anexar al delta, reescribir la base y descartar su delta)
+# toma antes inscritos.csv.lock, creado en modo exclusivo: un anexo nunca cae
+# entre el rename de la base y el borrado del delta, ni se trunca. El delta se
+# crea de una vez (cabecera incluida, temporal + rename) y después solo crece
+# en modo 'a'. Los lectores no toman el candado.
+#
+# Mientras se tiene, un hilo renueva el mtime del candado por su propio canal
+# SFTP: solo se rompe el de un proceso que dejó de renovarlo, no el de un
+# escritor lento. Al soltarlo se borra solo si aún guarda nuestro identificador.
+
+EXTENSION_DELTA = '.delta'
+EXTENSION_CANDADO = '.lock'
+LIMITE_BYTES_DELTA = 256 * 1024
+# Un candado que no cambia en este tiempo quedó de un proceso caído
+CANDADO_ABANDONADO = 30
+ESPERA_CANDADO = 60
+# Cada cuánto renueva su candado quien lo tiene (muy por debajo de CANDADO_ABANDONADO)
+RENOVACION_CANDADO = 5
+
+
+def ruta_delta(ruta_csv):
+    return ruta_csv + EXTENSION_DELTA
+
+
+def ruta_candado(ruta_csv):
+    return ruta_csv + EXTENSION_CANDADO
+
+
+def _leer_candado(sftp, ruta):
+    try:
+        with sftp.file(ruta, 'r') as archivo_remoto:
+            return archivo_remoto.read().decode('utf-8', 'replace').strip()
+    except FileNotFoundError:
+        return None
+
+
+def _renovar_candado(sftp, ruta, identificador, detener):
+    """Tocar el candado cada RENOVACION_CANDADO segundos mientras siga siendo nuestro"""
+    # Un SFTPClient no admite peticiones de varios hilos: la renovación usa su
+    # propio canal sobre la misma conexión SSH
+    try:
+        canal = sftp.get_channel().get_transport().open_sftp_client()
+    except Exception:
+        return
+    try:
+        while not detener.wait(RENOVACION_CANDADO):
+            if _leer_candado(canal, ruta) != identificador:
+                return  # nos lo rompieron: no mantener vivo el de otro
+            ahora = int(time.time())
+            canal.utime(ruta, (ahora, ahora))
+    except Exception:
+        pass
+    finally:
+        canal.close()
+
+
+@contextmanager
+def bloqueo_tabla(sftp, ruta_csv):
+    """Candado de escritura de la tabla en el servidor (compartido por todas las réplicas)"""
+    ruta = ruta_candado(ruta_csv)
+    identificador = uuid.uuid4().hex
+    visto = None  # (mtime, tamaño) del candado ajeno y desde cuándo lo vemos igual
+    limite = time.monotonic() + ESPERA_CANDADO
+    espera = 0.05
+    while True:
+        try:
+            with sftp.file(ruta, 'x') as archivo_remoto:
+                archivo_remoto.write(identificador)
+            break
+        except FileNotFoundError:
+            raise
+        except IOError:
+            pass
+
+        # Ocupado: esperar, o romperlo si su dueño murió (sin comparar relojes con el servidor)
+        try:
+            atributos = sftp.stat(ruta)
+            huella = (atributos.st_mtime, atributos.st_size)
+            if visto is None or visto[0] != huella:
+                visto = (huella, time.monotonic())
+            elif time.monotonic() - visto[1] > CANDADO_ABANDONADO:
+                sftp.remove(ruta)
+                visto = None
+                continue
+        except FileNotFoundError:
+            continue
+        if time.monotonic() > limite:
+            raise TimeoutError(f"{ruta_csv} lleva {ESPERA_CANDADO}s bloqueada por otro escritor")
+        time.sleep(espera)
+        espera = min(espera * 2, 1.0)
+
+    detener = threading.Event()
+    renovador = threading.Thread(target=_renovar_candado, args=(sftp, ruta, identificador, detener),
+                                 name="renovar_candado", daemon=True)
+    renovador.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        renovador.join()
+        # Si otro lo rompió y ya tiene el suyo, ese no se toca
+        if _leer_candado(sftp, ruta) == identificador:
+            try:
+                sftp.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+def operacion_anexar(fila):
+    return {'op': 'anexar', 'fila': fila}
+
+
+def operacion_parchar(campo, valor, cambios):
+    return {'op': 'parchar', 'campo': campo, 'valor': valor, 'cambios': cambios}
+
+
+def operacion_eliminar(campo, valor):
+    return {'op': 'eliminar', 'campo': campo, 'valor': valor}
+
+
+def _linea(objeto):
+    return json.dumps(objeto, ensure_ascii=False, default=str) + '\n'
+
+
+def _coincidencias(df, campo, valor):
+    if campo not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df[campo].astype(str).str.strip() == str(valor).strip()
+
+
+def aplicar_operaciones(df, operaciones):
+    """Aplicar en orden las operaciones del delta; `df` no se modifica (puede estar compartido)"""
+    original = df
+    filas_nuevas = []
+
+    def volcar_filas(df):
+        if not filas_nuevas:
+            return df
+        nuevas = pd.DataFrame(filas_nuevas)
+        filas_nuevas.clear()
+        if df.empty and len(df.columns) == 0:
+            return nuevas
+        return pd.concat([df, nuevas], ignore_index=True)
+
+    for operacion in operaciones:
+        tipo = operacion.get('op')
+        if tipo == 'anexar':
+            # Anexos consecutivos se concatenan de una vez
+            filas_nuevas.append(operacion['fila'])
+            continue
+
+        df = volcar_filas(df)
+        if tipo == 'parchar':
+            if df is original:
+                df = df.copy()
+            mascara = _coincidencias(df, operacion['campo'], operacion['valor'])
+            for columna, valor in operacion['cambios'].items():
+                asignar_valor(df, mascara, columna, valor)
+        elif tipo == 'eliminar':
+            df = df[~_coincidencias(df, operacion['campo'], operacion['valor'])].reset_index(drop=True)
+
+    df = volcar_filas(df)
+    # value_counts() de un rol o estatus ya sin filas no debe contarlo con 0
+    return df if df is original else quitar_categorias_sin_uso(df)
+
+
+def parsear_delta(contenido, tamano_csv, desde=0):
+    """Operaciones completas de `contenido` (bytes leídos a partir de `desde`)
+
+    Devuelve (operaciones, nuevo_offset), o (None, 0) si el delta pertenece a
+    otra versión del CSV.
+    """
+    operaciones = []
+    offset = desde
+    for linea in contenido.splitlines(keepends=True):
+        if not linea.endswith(b'\n'):
+            break  # línea a medio escribir: se leerá en la próxima consulta
+        objeto = json.loads(linea.decode('utf-8'))
+        if offset == 0:
+            if objeto.get('base_bytes') != tamano_csv:
+                return None, 0
+        else:
+            operaciones.append(objeto)
+        offset += len(linea)
+    return operaciones, offset
+
+
+def tamano_delta_sftp(sftp, ruta_csv):
+    try:
+        return sftp.stat(ruta_delta(ruta_csv)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def version_tabla(sftp, ruta_csv):
+    """Versión actual de la tabla en el servidor, o None si no existe"""
+    try:
+        atributos = sftp.stat(ruta_csv)
+    except FileNotFoundError:
+        return None
+    return (atributos.st_mtime, atributos.st_size, tamano_delta_sftp(sftp, ruta_csv))
+
+
+def leer_delta_sftp(sftp, ruta_csv, tamano_csv, desde=0, tamano_delta=None):
+    """Leer del delta remoto solo lo añadido desde el byte `desde`"""
+    if tamano_delta is None:
+        tamano_delta = tamano_delta_sftp(sftp, ruta_csv)
+    if tamano_delta == 0:
+        return [], 0
+    if tamano_delta < desde:
+        return None, 0
+    if tamano_delta == desde:
+        return [], desde
+
+    with sftp.file(ruta_delta(ruta_csv), 'rb') as archivo_remoto:
+        archivo_remoto.seek(desde)
+        contenido = archivo_remoto.read()
+    return parsear_delta(contenido, tamano_csv, desde)
+
+
+def leer_delta_local(ruta_csv_local, tamano_csv):
+    """Operaciones del delta de la copia del espejo local"""
+    try:
+        with open(ruta_delta(ruta_csv_local), 'rb') as archivo:
+            contenido = archivo.read()
+    except FileNotFoundError:
+        return []
+    operaciones, _ = parsear_delta(contenido, tamano_csv)
+    return operaciones or []
+
+
+def anexar_operaciones(sftp, ruta_csv, operaciones, df=None):
+    """Escribir operaciones en el delta de la tabla; compacta si crece demasiado
+
+    Lanza FileNotFoundError si la tabla base todavía no existe. Devuelve True
+    si se compactó (el CSV base fue reescrito). Si `df` (la tabla ya
+    modificada en memoria) estaba al día, su versión avanza con el delta.
+    """
+    sftp.stat(ruta_csv)  # sin tabla base no hay delta (ni candado) que crear
+    with bloqueo_tabla(sftp, ruta_csv):
+        atributos_csv = sftp.stat(ruta_csv)
+        tamano_csv = atributos_csv.st_size
+        ruta = ruta_delta(ruta_csv)
+        al_dia = version_de(df) == (atributos_csv.st_mtime, tamano_csv, tamano_delta_sftp(sftp, ruta_csv))
+
+        delta_vigente = False
+        try:
+            with sftp.file(ruta, 'rb') as archivo_remoto:
+                cabecera = archivo_remoto.readline()
+            delta_vigente = json.loads(cabecera).get('base_bytes') == tamano_csv
+        except (FileNotFoundError, ValueError, AttributeError):
+            pass
+
+        contenido = ''.join(_linea(operacion) for operacion in operaciones)
+        if delta_vigente:
+            with sftp.file(ruta, 'a') as archivo_remoto:
+                archivo_remoto.write(contenido)
+        else:
+            # Delta nuevo (o de una base anterior, ya incluida en ella): se crea completo de una vez
+            escribir_atomico(sftp, ruta, _linea({'base_bytes': tamano_csv}) + contenido)
+
+        compactado = sftp.stat(ruta).st_size > LIMITE_BYTES_DELTA and _compactar(sftp, ruta_csv)
+        if al_dia:
+            sellar_version(df, version_tabla(sftp, ruta_csv))
+    return compactado
+
+
+def descartar_delta(sftp, ruta_csv):
+    """Borrar el delta tras reescribir la tabla completa (ya está incluido en el CSV)
+
+    Llamar con el candado de la tabla tomado, junto con la reescritura.
+    """
+    try:
+        sftp.remove(ruta_delta(ruta_csv))
+    except FileNotFoundError:
+        pass
+
+
+def guardar_tabla(sftp, ruta_csv, texto_csv, version_esperada=None):
+    """Reescribir la tabla completa de forma atómica y devolver su nueva versión
+
+    `version_esperada` es la versión con la que se cargó (None: la tabla no
+    existía); lanza ConflictoEscritura si otra sesión la cambió entretanto.
+    """
+    with bloqueo_tabla(sftp, ruta_csv):
+        return _guardar_tabla(sftp, ruta_csv, texto_csv, version_esperada)
+
+
+def _guardar_tabla(sftp, ruta_csv, texto_csv, version_esperada):
+    def comprobar():
+        actual = version_tabla(sftp, ruta_csv)
+        if actual != version_esperada:
+            raise ConflictoEscritura(ruta_csv, version_esperada, actual)
+
+    escribir_atomico(sftp, ruta_csv, texto_csv, comprobar)
+    escribir_sidecar(sftp, ruta_csv, texto_csv)
+    descartar_delta(sftp, ruta_csv)
+    return version_tabla(sftp, ruta_csv)
+
+
+def compactar(sftp, ruta_csv):
+    """Reescribir el CSV base con el delta aplicado y borrar el delta"""
+    with bloqueo_tabla(sftp, ruta_csv):
+        return _compactar(sftp, ruta_csv)
+
+
+def _compactar(sftp, ruta_csv):
+    version = version_tabla(sftp, ruta_csv)
+    operaciones, _ = leer_delta_sftp(sftp, ruta_csv, version[1], tamano_delta=version[2])
+    if not operaciones:
+        return False
+
+    df = aplicar_operaciones(leer_csv_sftp(sftp, ruta_csv), operaciones)
+    try:
+        _guardar_tabla(sftp, ruta_csv, df.to_csv(index=False, encoding='utf-8'), version)
+    except ConflictoEscritura:
+        return False  # otro escritor se adelantó; se compactará en el próximo anexo
+    return True
@@ -0,0 +1,75 @@
+import uuid
+
+# =============================================================================
+# ESCRITURA ATÓMICA EN EL SERVIDOR (TEMPORAL + posix_rename)
+# =============================================================================
+#
+# usuarios.csv.tmp-1a2b3c4d  ->  usuarios.csv
+#
+# Un lector en otra app ve el archivo anterior completo o el nuevo completo,
+# nunca uno a medio escribir.
+
+CLAVE_VERSION = 'version_remota'
+
+
+class ConflictoEscritura(Exception):
+    """La tabla cambió en el servidor desde que se cargó"""
+
+    def __init__(self, ruta, esperada, actual):
+        super().__init__(f"{ruta} fue modificado por otra sesión desde que se cargó")
+        self.ruta = ruta
+        self.esperada = esperada
+        self.actual = actual
+
+
+def ruta_temporal(ruta):
+    return f"{ruta}.tmp-{uuid.uuid4().hex[:8]}"
+
+
+def es_temporal(nombre):
+    return '.tmp-' in nombre
+
+
+def escribir_atomico(sftp, ruta, contenido, comprobar=None):
+    """Escribir `contenido` en un temporal y renombrarlo sobre `ruta`
+
+    `comprobar` se llama justo antes del rename y puede lanzar
+    ConflictoEscritura para cancelar la escritura (el temporal se borra).
+    """
+    temporal = ruta_temporal(ruta)
+    modo = 'wb' if isinstance(contenido, bytes) else 'w'
+    try:
+        with sftp.file(temporal, modo) as archivo_remoto:
+            archivo_remoto.set_pipelined(True)
+            archivo_remoto.write(contenido)
+
+        if comprobar is not None:
+            comprobar()
+
+        try:
+            sftp.posix_rename(temporal, ruta)
+        except IOError:
+            # Servidor sin la extensión posix-rename: rename normal no sobrescribe
+            try:
+                sftp.remove(ruta)
+            except FileNotFoundError:
+                pass
+            sftp.rename(temporal, ruta)
+    except BaseException:
+        try:
+            sftp.remove(temporal)
+        except Exception:
+            pass
+        raise
+
+
+def version_de(df):
+    """Versión remota con la que se cargó un DataFrame (o None si se desconoce)"""
+    return df.attrs.get(CLAVE_VERSION) if df is not None else None
+
+
+def sellar_version(df, version):
+    """Recordar en el DataFrame la versión remota a la que corresponde"""
+    if df is not None:
+        df.attrs[CLAVE_VERSION] = version
+    return df
@@ -0,0 +1,224 @@
+import os
+import posixpath
+import stat
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from nucleo.columnar import leer_sidecar_local
+from nucleo.delta_log import EXTENSION_CANDADO, aplicar_operaciones, leer_delta_local, ruta_delta
+from nucleo.escritura_atomica import es_temporal, sellar_version
+from nucleo.esquemas import aplicar_esquema, opciones_lectura
+from nucleo.pool_sftp import obtener_pool_sftp
+
+# =============================================================================
+# ESPEJO LOCAL DE datos/ Y config/ CON SINCRONIZACIÓN EN SEGUNDO PLANO
+# =============================================================================
+#
+# Opcional. Se activa en secrets.toml con:
+#
+#     espejo_local = true
+#     espejo_dir = "/var/tmp/escuela_espejo"   # opcional
+#     espejo_intervalo = 60                     # segundos, opcional
+#
+# Las lecturas se sirven desde disco local; las escrituras siguen yendo al
+# servidor y la copia local de ese archivo se descarta hasta el siguiente ciclo.
+
+class EspejoLocal:
+    def __init__(self, pool, base_remota, directorio_local, subdirectorios=("datos", "config"),
+                 intervalo=60, max_desfase=None):
+        self.pool = pool
+        self.base_remota = base_remota.rstrip('/')
+        self.directorio_local = directorio_local
+        self.subdirectorios = subdirectorios
+        self.intervalo = intervalo
+        # Pasado este tiempo sin sincronizar, las lecturas vuelven al servidor
+        self.max_desfase = max_desfase if max_desfase is not None else intervalo * 5
+        self.ultima_sincronizacion = None
+        self.ultimo_error = None
+        self.invalidadas = {}
+        self.generacion = 0
+        self.parseados = {}
+        self.lock = threading.Lock()
+        self.detener = threading.Event()
+        self.hilo = None
+
+    def ruta_local(self, ruta_remota):
+        """Ruta en disco local equivalente a una ruta del servidor (o None si no se replica)"""
+        ruta_remota = posixpath.normpath(ruta_remota)
+        for subdirectorio in self.subdirectorios:
+            prefijo = posixpath.join(self.base_remota, subdirectorio) + '/'
+            if ruta_remota.startswith(prefijo):
+                relativa = ruta_remota[len(self.base_remota) + 1:]
+                return os.path.join(self.directorio_local, *relativa.split('/'))
+        return None
+
+    def sincronizar(self):
+        """Descargar los archivos cuyo mtime/tamaño remoto difiere de la copia local"""
+        descargados = 0
+        sesion = self.pool.adquirir()
+        descartar = False
+        try:
+            for subdirectorio in self.subdirectorios:
+                directorio_remoto = posixpath.join(self.base_remota, subdirectorio)
+                directorio_local = os.path.join(self.directorio_local, subdirectorio)
+                os.makedirs(directorio_local, exist_ok=True)
+
+                try:
+                    atributos = sesion.sftp.listdir_attr(directorio_remoto)
+                except FileNotFoundError:
+                    continue
+
+                presentes = set()
+                for atributo in atributos:
+                    if (not stat.S_ISREG(atributo.st_mode or 0) or es_temporal(atributo.filename)
+                            or atributo.filename.endswith(EXTENSION_CANDADO)):
+                        continue
+                    presentes.add(atributo.filename)
+                    ruta_remota = posixpath.join(directorio_remoto, atributo.filename)
+                    ruta_local = os.path.join(directorio_local, atributo.filename)
+
+                    with self.lock:
+                        invalidada = self.invalidadas.get(ruta_remota)
+                    if invalidada is None and self._esta_al_dia(ruta_local, atributo):
+                        continue
+
+                    # Descarga a temporal + rename para que un lector nunca vea un archivo a medias
+                    temporal = ruta_local + '.tmp'
+                    sesion.sftp.get(ruta_remota, temporal)
+                    os.utime(temporal, (atributo.st_atime or atributo.st_mtime, atributo.st_mtime))
+                    os.replace(temporal, ruta_local)
+                    with self.lock:
+                        # Si hubo otra escritura durante la descarga, sigue invalidada
+                        if self.invalidadas.get(ruta_remota) == invalidada:
+                            self.invalidadas.pop(ruta_remota, None)
+                    descargados += 1
+
+                # Borrar copias de archivos que ya no existen en el servidor
+                for nombre in os.listdir(directorio_local):
+                    if nombre not in presentes and not nombre.endswith('.tmp'):
+                        os.remove(os.path.join(directorio_local, nombre))
+
+            self.ultima_sincronizacion = time.monotonic()
+            self.ultimo_error = None
+            return descargados
+        except Exception as e:
+            descartar = True
+            self.ultimo_error = e
+            raise
+        finally:
+            self.pool.liberar(sesion, descartar=descartar)
+
+    def _esta_al_dia(self, ruta_local, atributo):
+        try:
+            local = os.stat(ruta_local)
+        except FileNotFoundError:
+            return False
+        return local.st_size == atributo.st_size and int(local.st_mtime) == int(atributo.st_mtime)
+
+    def _ciclo(self):
+        while not self.detener.is_set():
+            try:
+                self.sincronizar()
+            except Exception:
+                pass
+            self.detener.wait(self.intervalo)
+
+    def iniciar(self):
+        """Lanzar el hilo de sincronización (una vez por proceso)"""
+        if self.hilo is None or not self.hilo.is_alive():
+            self.detener.clear()
+            self.hilo = threading.Thread(target=self._ciclo, name="espejo_local", daemon=True)
+            self.hilo.start()
+
+    def parar(self):
+        self.detener.set()
+
+    def tiene_copia(self, ruta_remota):
+        """La copia local existe, no fue invalidada y la última sincronización es reciente"""
+        if self.ultima_sincronizacion is None:
+            return False
+        if time.monotonic() - self.ultima_sincronizacion > self.max_desfase:
+            return False
+        with self.lock:
+            if ruta_remota in self.invalidadas:
+                return False
+        ruta_local = self.ruta_local(ruta_remota)
+        return ruta_local is not None and os.path.exists(ruta_local)
+
+    def leer_csv(self, ruta_remota, copiar=True):
+        """Leer la copia local, reutilizando el DataFrame si el archivo no cambió
+
+        Con copiar=False se devuelve el DataFrame compartido (solo lectura).
+        """
+        ruta_local = self.ruta_local(ruta_remota)
+        atributos = os.stat(ruta_local)
+        try:
+            atributos_delta = os.stat(ruta_delta(ruta_local))
+            firma_delta = (atributos_delta.st_mtime_ns, atributos_delta.st_size)
+        except FileNotFoundError:
+            firma_delta = None
+        firma = (atributos.st_mtime_ns, atributos.st_size, firma_delta)
+        # Misma versión que daría el servidor: la copia conserva su mtime
+        version = (int(atributos.st_mtime), atributos.st_size, firma_delta[1] if firma_delta else 0)
+
+        with self.lock:
+            entrada = self.parseados.get(ruta_local)
+        if entrada is None or entrada[0] != firma:
+            df = leer_sidecar_local(ruta_local)
+            if df is None:
+                opciones = opciones_lectura(ruta_local)
+                try:
+                    df = pd.read_csv(ruta_local, encoding='utf-8', **opciones)
+                except UnicodeDecodeError:
+                    df = pd.read_csv(ruta_local, encoding='latin-1', **opciones)
+            operaciones = leer_delta_local(ruta_local, atributos.st_size)
+            if operaciones:
+                df = aplicar_operaciones(df, operaciones)
+            aplicar_esquema(df, ruta_local)
+            entrada = (firma, df)
+            with self.lock:
+                self.parseados[ruta_local] = entrada
+        return sellar_version(entrada[1].copy() if copiar else entrada[1], version)
+
+    def invalidar(self, ruta_remota):
+        """Marcar una ruta como escrita en el servidor: se lee en remoto hasta resincronizar"""
+        with self.lock:
+            self.generacion += 1
+            self.invalidadas[ruta_remota] = self.generacion
+
+
+_espejo = None
+_lock_espejo = threading.Lock()
+
+
+def obtener_espejo():
+    """Espejo del proceso si está activado en secrets.toml, o None"""
+    global _espejo
+    try:
+        if not st.secrets.get("espejo_local", False):
+            return None
+    except Exception:
+        return None
+
+    with _lock_espejo:
+        if _espejo is None:
+            _espejo = EspejoLocal(
+                pool=obtener_pool_sftp(),
+                base_remota=st.secrets.get("remote_dir", "/home/POLANCO6/ESCUELA"),
+                directorio_local=st.secrets.get(
+                    "espejo_dir", os.path.join(tempfile.gettempdir(), "escuela_espejo")
+                ),
+                intervalo=st.secrets.get("espejo_intervalo", 60)
+            )
+            _espejo.iniciar()
+        return _espejo
+
+
+def invalidar_espejo(ruta_remota):
+    """Avisar al espejo (si existe) de que una ruta se acaba de escribir en el servidor"""
+    if _espejo is not None:
+        _espejo.invalidar(ruta_remota)
@@ -0,0 +1,172 @@
+import posixpath
+
+import pandas as pd
+
+# =============================================================================
+# ESQUEMAS TIPADOS POR TABLA
+# =============================================================================
+#
+# TEXTO      identificadores y datos libres: se leen como str, así "123" nunca
+#            pasa a 123 ni a 123.0 (matrícula, usuario, password, teléfono...)
+# CATEGORIA  pocos valores distintos (rol, estatus, programa, género...):
+#            dtype category, comparaciones y groupby sobre códigos enteros
+# FECHA      se conservan como texto ISO (los formularios, strptime y las
+#            pantallas de detalle los consumen así; ningún reporte filtra
+#            ni agrupa por fecha)
+#
+# Las columnas que no aparecen en el esquema se dejan a la inferencia de pandas.
+
+TEXTO = 'texto'
+CATEGORIA = 'categoria'
+FECHA = 'fecha'
+
+_COMUNES = {
+    'matricula': TEXTO,
+    'usuario': TEXTO,
+    'nombre_completo': TEXTO,
+    'email': TEXTO,
+    'telefono': TEXTO,
+    'folio': TEXTO,
+    'curp': TEXTO,
+    'codigo_postal': TEXTO,
+    'documentos_subidos': TEXTO,
+    'documentos_guardados': TEXTO,
+    'estatus': CATEGORIA,
+    'programa': CATEGORIA,
+    'genero': CATEGORIA,
+    'estado': CATEGORIA,
+    'nacionalidad': CATEGORIA,
+    'fecha_registro': FECHA,
+    'fecha_nacimiento': FECHA
+}
+
+ESQUEMAS = {
+    'inscritos': {
+        'programa_interes': CATEGORIA,
+        'como_se_entero': CATEGORIA
+    },
+    'estudiantes': {
+        'programa_interes': CATEGORIA,
+        'como_se_entero': CATEGORIA,
+        'fecha_inscripcion': FECHA,
+        'fecha_ingreso': FECHA
+    },
+    'egresados': {
+        'programa_original': CATEGORIA,
+        'nivel_academico': CATEGORIA,
+        'estado_laboral': CATEGORIA,
+        'fecha_graduacion': FECHA,
+        'fecha_actualizacion': FECHA
+    },
+    'contratados': {
+        'puesto': CATEGORIA,
+        'departamento': CATEGORIA,
+        'tipo_contrato': CATEGORIA,
+        'fecha_contratacion': FECHA,
+        'fecha_inicio': FECHA,
+        'fecha_fin': FECHA
+    },
+    'usuarios': {
+        'password': TEXTO,
+        'nombre': TEXTO,
+        'rol': CATEGORIA
+    },
+    'roles_permisos': {
+        'rol': CATEGORIA
+    },
+    'bitacora': {
+        'timestamp': FECHA,
+        'accion': CATEGORIA,
+        'detalles': TEXTO,
+        'ip': CATEGORIA
+    },
+    'certificaciones': {
+        'tipo_certificacion': CATEGORIA,
+        'institucion': CATEGORIA,
+        'fecha_obtencion': FECHA,
+        'fecha_vencimiento': FECHA
+    },
+    'costos_programas': {
+        'tipo_programa': CATEGORIA,
+        'modalidad': CATEGORIA
+    },
+    'programas_educativos': {
+        'nivel': CATEGORIA,
+        'modalidad': CATEGORIA
+    },
+    'actualizaciones_academicas': {
+        'tipo_actualizacion': CATEGORIA,
+        'fecha_actualizacion': FECHA
+    }
+}
+
+
+def nombre_tabla(ruta_csv):
+    """inscritos.csv (o su ruta completa) -> 'inscritos'"""
+    nombre = posixpath.basename(str(ruta_csv).replace('\\', '/'))
+    return nombre[:-4] if nombre.endswith('.csv') else nombre
+
+
+def esquema_de(ruta_csv):
+    """Tipos declarados para las columnas de la tabla (comunes + propios)"""
+    esquema = dict(_COMUNES)
+    esquema.update(ESQUEMAS.get(nombre_tabla(ruta_csv), {}))
+    return esquema
+
+
+def opciones_lectura(ruta_csv):
+    """Argumentos extra para pd.read_csv: todo lo declarado se lee como texto"""
+    # Columnas que no existen en el archivo se ignoran
+    return {'dtype': {columna: str for columna in esquema_de(ruta_csv)}}
+
+
+def _texto(valor):
+    if isinstance(valor, str) or pd.isna(valor):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))  # 123.0 de una lectura inferida -> "123"
+    return str(valor)
+
+
+def _como_texto(serie):
+    if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return serie
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    return serie.map(_texto).astype(object)
+
+
+def aplicar_esquema(df, ruta_csv):
+    """Dejar las columnas declaradas con su tipo (sobre el mismo DataFrame, que se devuelve)"""
+    if df is None or len(df.columns) == 0:
+        return df
+    for columna, tipo in esquema_de(ruta_csv).items():
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if tipo == CATEGORIA:
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                df[columna] = _como_texto(serie).astype('category')
+        else:
+            df[columna] = _como_texto(serie)
+    return quitar_categorias_sin_uso(df)
+
+
+def quitar_categorias_sin_uso(df):
+    """Descartar categorías que ya no usa ninguna fila (tras eliminar o parchar filas)"""
+    for columna in df.columns:
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype) and len(serie.cat.categories) > serie.nunique():
+            df[columna] = serie.cat.remove_unused_categories()
+    return df
+
+
+def asignar_valor(df, filas, columna, valor):
+    """df.loc[filas, columna] = valor, admitiendo valores nuevos en columnas categóricas"""
+    if columna not in df.columns:
+        df[columna] = None
+    serie = df[columna]
+    if (isinstance(serie.dtype, pd.CategoricalDtype) and not pd.isna(valor)
+            and valor not in serie.cat.categories):
+        df[columna] = serie.cat.add_categories([valor])
+    df.loc[filas, columna] = valor
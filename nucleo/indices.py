@@ -0,0 +1,124 @@
+import threading
+import weakref
+
+import pandas as pd
+
+from nucleo.escritura_atomica import version_de
+from nucleo.tablas_perezosas import materializar
+
+# =============================================================================
+# ÍNDICES HASH EN MEMORIA (CLAVE NORMALIZADA -> POSICIONES DE FILA)
+# =============================================================================
+#
+# Cada índice pertenece a un DataFrame concreto (no a un nombre de tabla): el
+# DataFrame compartido de la caché tiene el suyo, que todas las sesiones
+# reutilizan, y la copia que edita una sesión nunca lo sustituye. Cada acierto
+# se comprueba contra la fila real; si un índice quedó desactualizado por una
+# edición en sitio, se reconstruye.
+
+def normalizar_clave(valor, ignorar_mayusculas=False):
+    clave = str(valor).strip()
+    return clave.lower() if ignorar_mayusculas else clave
+
+
+class IndiceTabla:
+    """Mapas por columna, construidos la primera vez que se consultan"""
+
+    def __init__(self, df):
+        # Referencia débil: el índice no mantiene viva la tabla que indexa
+        self._df = weakref.ref(df)
+        self.mapas = {}
+        self.lock = threading.Lock()
+
+    @property
+    def df(self):
+        return self._df()
+
+    def _mapa(self, campo, ignorar_mayusculas):
+        clave_mapa = (campo, ignorar_mayusculas)
+        with self.lock:
+            mapa = self.mapas.get(clave_mapa)
+        if mapa is None:
+            mapa = {}
+            columna = self.df[campo].astype(str).str.strip()
+            if ignorar_mayusculas:
+                columna = columna.str.lower()
+            for posicion, clave in enumerate(columna):
+                mapa.setdefault(clave, []).append(posicion)
+            with self.lock:
+                self.mapas[clave_mapa] = mapa
+        return mapa
+
+    def posiciones(self, campo, valor, ignorar_mayusculas=False):
+        if campo not in self.df.columns:
+            return []
+        return self._mapa(campo, ignorar_mayusculas).get(normalizar_clave(valor, ignorar_mayusculas), [])
+
+
+# (nombre_tabla, id(df)) -> (referencia débil a df, firma, índice)
+_indices = {}
+_lock_indices = threading.Lock()
+
+
+def _firma(df):
+    return (version_de(df), len(df), tuple(df.columns))
+
+
+def _olvidar(clave):
+    def al_liberar(_referencia):
+        with _lock_indices:
+            entrada = _indices.get(clave)
+            if entrada is not None and entrada[0]() is None:
+                del _indices[clave]
+    return al_liberar
+
+
+def obtener_indice(nombre_tabla, df):
+    """Índice de este DataFrame, construyéndolo si hace falta"""
+    clave = (nombre_tabla, id(df))
+    firma = _firma(df)
+    with _lock_indices:
+        entrada = _indices.get(clave)
+        # id() se reutiliza tras liberar un objeto: la referencia débil confirma que es el mismo
+        if entrada is None or entrada[0]() is not df or entrada[1] != firma:
+            entrada = (weakref.ref(df, _olvidar(clave)), firma, IndiceTabla(df))
+            _indices[clave] = entrada
+    return entrada[2]
+
+
+def invalidar_indice(nombre_tabla=None, df=None):
+    """Descartar el índice de un DataFrame, los de una tabla o todos"""
+    with _lock_indices:
+        if nombre_tabla is None:
+            _indices.clear()
+        elif df is not None:
+            _indices.pop((nombre_tabla, id(df)), None)
+        else:
+            for clave in [clave for clave in _indices if clave[0] == nombre_tabla]:
+                del _indices[clave]
+
+
+def buscar_posiciones(nombre_tabla, df, campo, valor, ignorar_mayusculas=False):
+    """Posiciones (iloc) de las filas de `df` cuyo `campo` coincide con `valor`"""
+    df = materializar(df)
+    if df.empty or campo not in df.columns:
+        return []
+
+    clave = normalizar_clave(valor, ignorar_mayusculas)
+    for _ in range(2):
+        posiciones = obtener_indice(nombre_tabla, df).posiciones(campo, valor, ignorar_mayusculas)
+        # Verificar contra la fila real: el DataFrame pudo editarse en sitio tras indexarlo
+        if all(posicion < len(df) and normalizar_clave(df[campo].iat[posicion], ignorar_mayusculas) == clave
+               for posicion in posiciones):
+            return posiciones
+        invalidar_indice(nombre_tabla, df)
+    return posiciones
+
+
+def buscar_filas(nombre_tabla, df, campo, valor, ignorar_mayusculas=False):
+    """Filas de `df` cuyo `campo` coincide con `valor` (DataFrame vacío si no hay)"""
+    df = materializar(df)
+    posiciones = buscar_posiciones(nombre_tabla, df, campo, valor, ignorar_mayusculas)
+    if not posiciones:
+        return df.iloc[0:0] if not df.empty else pd.DataFrame()
+    return df.iloc[posiciones]
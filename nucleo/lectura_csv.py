@@ -0,0 +1,20 @@
+import pandas as pd
+
+from nucleo.esquemas import aplicar_esquema, opciones_lectura
+
+# =============================================================================
+# LECTURA DE CSV REMOTOS
+# =============================================================================
+
+def leer_csv_sftp(sftp, ruta_remota):
+    """Leer un CSV remoto probando utf-8 y luego latin-1, con los tipos de su esquema"""
+    opciones = opciones_lectura(ruta_remota)
+    with sftp.file(ruta_remota, 'r') as archivo_remoto:
+        # Lectura anticipada en paralelo de los bloques del archivo
+        archivo_remoto.prefetch()
+        try:
+            df = pd.read_csv(archivo_remoto, encoding='utf-8', **opciones)
+        except UnicodeDecodeError:
+            archivo_remoto.seek(0)
+            df = pd.read_csv(archivo_remoto, encoding='latin-1', **opciones)
+    return aplicar_esquema(df, ruta_remota)
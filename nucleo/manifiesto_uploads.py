@@ -0,0 +1,259 @@
+import json
+import posixpath
+import re
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from nucleo.escritura_atomica import ConflictoEscritura, escribir_atomico, es_temporal
+from nucleo.transferencia import subir_por_bloques, tamano_bloque_configurado
+
+# =============================================================================
+# MANIFIESTO DE uploads/: MATRÍCULA -> ARCHIVOS
+# =============================================================================
+#
+# /home/POLANCO6/ESCUELA/uploads_manifiesto.json
+#
+#     {"directorio_mtime": 1718000000,
+#      "archivos": {"MAT-INS12345_Juan_240101120000_CURP.pdf":
+#                       {"matricula": "MAT-INS12345", "tipo": "CURP", "extension": "pdf",
+#                        "tamano": 18342, "mtime": 1718000000, "sha256": "..."}}}
+#
+# Vive fuera de uploads/ para que escribirlo no cambie el mtime del directorio.
+# Si el mtime de uploads/ difiere del registrado, alguien tocó el directorio
+# sin pasar por aquí y se reconcilia con un solo listdir_attr.
+
+NOMBRE_MANIFIESTO = "uploads_manifiesto.json"
+REINTENTOS_CONFLICTO = 3
+
+# escuela10:    MAT-EST12345.NombreCompleto.TipoDocumento.24-01-01.12.00.pdf
+# aspirantes10: MAT-INS12345_Nombre_Completo_240101120000_TIPO_DOCUMENTO.pdf
+_PATRON_ASPIRANTES = re.compile(r'^[^._]+_.*_\d{12}_(?P<tipo>.+)\.[^.]+$')
+
+
+def matricula_de_archivo(nombre):
+    """La matrícula es el prefijo del nombre hasta el primer '.' o '_'"""
+    return re.split(r'[._]', nombre, maxsplit=1)[0]
+
+
+def tipo_de_archivo(nombre):
+    coincidencia = _PATRON_ASPIRANTES.match(nombre)
+    if coincidencia:
+        return coincidencia.group('tipo')
+    partes = nombre.split('.')
+    if len(partes) >= 7:
+        return partes[2]
+    return ''
+
+
+def _entrada(nombre, atributos, sha256=None):
+    return {
+        'matricula': matricula_de_archivo(nombre),
+        'tipo': tipo_de_archivo(nombre),
+        'extension': nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else '',
+        'tamano': atributos.st_size,
+        'mtime': atributos.st_mtime,
+        'sha256': sha256
+    }
+
+
+class ManifiestoUploads:
+    def __init__(self, directorio_uploads):
+        self.directorio_uploads = directorio_uploads.rstrip('/')
+        self.ruta_manifiesto = posixpath.join(posixpath.dirname(self.directorio_uploads), NOMBRE_MANIFIESTO)
+        self.datos = {'directorio_mtime': None, 'archivos': {}}
+        self.por_matricula = {}
+        self.firma_manifiesto = None
+        self.lock = threading.RLock()
+
+    def _firma_remota(self, sftp):
+        try:
+            atributos = sftp.stat(self.ruta_manifiesto)
+        except FileNotFoundError:
+            return None
+        return (atributos.st_mtime, atributos.st_size)
+
+    def _indexar(self):
+        self.por_matricula = {}
+        for nombre, entrada in self.datos['archivos'].items():
+            self.por_matricula.setdefault(entrada['matricula'], set()).add(nombre)
+
+    def _leer(self, sftp):
+        """Recargar el manifiesto si cambió en el servidor"""
+        firma = self._firma_remota(sftp)
+        if firma == self.firma_manifiesto:
+            return
+        if firma is None:
+            self.datos = {'directorio_mtime': None, 'archivos': {}}
+        else:
+            with sftp.file(self.ruta_manifiesto, 'r') as archivo_remoto:
+                self.datos = json.loads(archivo_remoto.read())
+        self.firma_manifiesto = firma
+        self._indexar()
+
+    def _escribir(self, sftp):
+        """Guardar el manifiesto; ConflictoEscritura si otro proceso lo cambió desde que se leyó"""
+        esperada = self.firma_manifiesto
+
+        def comprobar():
+            actual = self._firma_remota(sftp)
+            if actual != esperada:
+                raise ConflictoEscritura(self.ruta_manifiesto, esperada, actual)
+
+        escribir_atomico(sftp, self.ruta_manifiesto, json.dumps(self.datos, ensure_ascii=False), comprobar)
+        self.firma_manifiesto = self._firma_remota(sftp)
+
+    def _reconciliar(self, sftp, mtime_directorio):
+        """Ajustar el manifiesto al contenido real de uploads/ con un solo listdir_attr"""
+        archivos = self.datos['archivos']
+        presentes = set()
+        for atributo in sftp.listdir_attr(self.directorio_uploads):
+            if not stat.S_ISREG(atributo.st_mode or 0) or es_temporal(atributo.filename):
+                continue
+            presentes.add(atributo.filename)
+            anterior = archivos.get(atributo.filename)
+            if (anterior is None or anterior['tamano'] != atributo.st_size
+                    or anterior['mtime'] != atributo.st_mtime):
+                archivos[atributo.filename] = _entrada(atributo.filename, atributo)
+        for nombre in set(archivos) - presentes:
+            del archivos[nombre]
+        self.datos['directorio_mtime'] = mtime_directorio
+        self._indexar()
+
+    def _modificar(self, sftp, cambio, mtime_previo=None):
+        """Aplicar `cambio(sftp)` sobre el manifiesto al día y guardarlo, reintentando si hay conflicto
+
+        `mtime_previo` es el mtime de uploads/ justo antes de la operación propia:
+        si el manifiesto estaba al día en ese momento no hace falta reconciliar.
+        """
+        for intento in range(REINTENTOS_CONFLICTO):
+            self._leer(sftp)
+            try:
+                mtime_directorio = sftp.stat(self.directorio_uploads).st_mtime
+            except FileNotFoundError:
+                mtime_directorio = None
+            if mtime_directorio != self.datos['directorio_mtime']:
+                if mtime_previo is not None and mtime_previo == self.datos['directorio_mtime']:
+                    self.datos['directorio_mtime'] = mtime_directorio  # solo cambió por nuestra operación
+                else:
+                    self._reconciliar(sftp, mtime_directorio)
+            if cambio is not None:
+                cambio(sftp)
+                self._indexar()
+            try:
+                self._escribir(sftp)
+                return
+            except ConflictoEscritura:
+                self.firma_manifiesto = None  # forzar relectura
+        # Sin poder publicarlo queda al día solo en memoria; el siguiente cambio lo reintenta
+
+    def sincronizar(self, sftp):
+        """Dejar el manifiesto al día (dos stat si nadie tocó uploads/ por fuera)"""
+        with self.lock:
+            self._leer(sftp)
+            try:
+                mtime_directorio = sftp.stat(self.directorio_uploads).st_mtime
+            except FileNotFoundError:
+                return
+            if mtime_directorio != self.datos['directorio_mtime']:
+                self._modificar(sftp, None)
+
+    def documentos(self, sftp, matricula):
+        """Archivos de una matrícula: lista de dicts con nombre, ruta y metadatos"""
+        with self.lock:
+            self.sincronizar(sftp)
+            resultado = []
+            for nombre in sorted(self.por_matricula.get(str(matricula).strip(), ())):
+                entrada = dict(self.datos['archivos'][nombre])
+                entrada['nombre'] = nombre
+                entrada['ruta'] = posixpath.join(self.directorio_uploads, nombre)
+                resultado.append(entrada)
+            return resultado
+
+    def subir(self, sftp, nombre, contenido, progreso=None):
+        """Subir un archivo (bytes u objeto tipo archivo) a uploads/ por bloques y registrarlo"""
+        ruta = posixpath.join(self.directorio_uploads, nombre)
+        with self.lock:
+            self.sincronizar(sftp)
+            mtime_previo = self.datos['directorio_mtime']
+            # El parcial se nombra por matrícula y checksum: un reintento del mismo
+            # documento lo reanuda aunque el nombre final lleve otra marca de tiempo
+            sha256 = subir_por_bloques(sftp, contenido, ruta, progreso=progreso,
+                                       clave=matricula_de_archivo(nombre))
+
+            def cambio(sftp):
+                self.datos['archivos'][nombre] = _entrada(nombre, sftp.stat(ruta), sha256)
+            self._modificar(sftp, cambio, mtime_previo)
+
+    def subir_varios(self, sftp, archivos, max_hilos=4):
+        """Subir varios archivos a la vez sobre la misma conexión y registrarlos con un solo guardado
+
+        `archivos` es una lista de (nombre, contenido). Devuelve {nombre: excepción}
+        con los que fallaron; los demás quedan subidos y en el manifiesto.
+        """
+        with self.lock:
+            self.sincronizar(sftp)
+            mtime_previo = self.datos['directorio_mtime']
+
+        # Leído aquí: los hilos no tocan st.secrets
+        tamano_bloque = tamano_bloque_configurado()
+        transporte = sftp.get_channel().get_transport()
+
+        def subir_en_canal(nombre, contenido):
+            # Un SFTPClient no admite peticiones de varios hilos: cada subida abre
+            # su propio canal SFTP sobre la misma conexión SSH (sin nuevo handshake)
+            canal = transporte.open_sftp_client()
+            try:
+                return subir_por_bloques(canal, contenido, posixpath.join(self.directorio_uploads, nombre),
+                                         tamano_bloque=tamano_bloque, clave=matricula_de_archivo(nombre))
+            finally:
+                canal.close()
+
+        subidos = {}
+        fallos = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_hilos, len(archivos))),
+                                thread_name_prefix="subida_uploads") as ejecutor:
+            futuros = {ejecutor.submit(subir_en_canal, nombre, contenido): nombre
+                       for nombre, contenido in archivos}
+            for futuro, nombre in futuros.items():
+                try:
+                    subidos[nombre] = futuro.result()
+                except Exception as e:
+                    fallos[nombre] = e
+
+        if subidos:
+            with self.lock:
+                def cambio(sftp):
+                    for nombre, sha256 in subidos.items():
+                        ruta = posixpath.join(self.directorio_uploads, nombre)
+                        self.datos['archivos'][nombre] = _entrada(nombre, sftp.stat(ruta), sha256)
+                self._modificar(sftp, cambio, mtime_previo)
+        return fallos
+
+    def renombrar(self, sftp, nombre_viejo, nombre_nuevo):
+        """Renombrar un archivo de uploads/ conservando su entrada"""
+        with self.lock:
+            self.sincronizar(sftp)
+            mtime_previo = self.datos['directorio_mtime']
+            sftp.rename(posixpath.join(self.directorio_uploads, nombre_viejo),
+                        posixpath.join(self.directorio_uploads, nombre_nuevo))
+
+            def cambio(sftp):
+                anterior = self.datos['archivos'].pop(nombre_viejo, None)
+                atributos = sftp.stat(posixpath.join(self.directorio_uploads, nombre_nuevo))
+                self.datos['archivos'][nombre_nuevo] = _entrada(
+                    nombre_nuevo, atributos, anterior.get('sha256') if anterior else None
+                )
+            self._modificar(sftp, cambio, mtime_previo)
+
+
+_manifiestos = {}
+_lock_manifiestos = threading.Lock()
+
+
+def obtener_manifiesto_uploads(directorio_uploads):
+    """Manifiesto del proceso para un directorio de uploads"""
+    with _lock_manifiestos:
+        if directorio_uploads not in _manifiestos:
+            _manifiestos[directorio_uploads] = ManifiestoUploads(directorio_uploads)
+        return _manifiestos[directorio_uploads]
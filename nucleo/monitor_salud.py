@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import streamlit as st
+
+from nucleo.pool_sftp import obtener_pool_sftp
+from nucleo.pool_smtp import obtener_pool_smtp
+
+# =============================================================================
+# MONITOR DE SALUD EN SEGUNDO PLANO (SSH / SMTP) CON HISTORIAL DE LATENCIAS
+# =============================================================================
+#
+# Un hilo por proceso ejecuta cada sonda cada `salud_intervalo` segundos
+# (secrets.toml, 60 por defecto) y guarda estado y latencia. El dashboard solo
+# lee el último resultado: renderizar no abre ninguna conexión.
+
+class ResultadoSonda:
+    def __init__(self, ok, latencia_ms, mensaje):
+        self.fecha = datetime.now()
+        self.ok = ok
+        self.latencia_ms = latencia_ms
+        self.mensaje = mensaje
+
+
+def sonda_ssh(pool_sftp):
+    """Ida y vuelta SFTP sobre una sesión del pool (incluye el handshake si hay que abrirla)"""
+    def sondear():
+        sesion = pool_sftp.adquirir()
+        descartar = False
+        try:
+            sesion.sftp.normalize('.')
+            return "✅ Activa"
+        except Exception:
+            descartar = True
+            raise
+        finally:
+            pool_sftp.liberar(sesion, descartar=descartar)
+    return sondear
+
+
+def sonda_smtp(pool_smtp):
+    """NOOP sobre una sesión autenticada del pool SMTP"""
+    def sondear():
+        sesion = pool_smtp.adquirir()
+        descartar = False
+        try:
+            codigo = sesion.servidor.noop()[0]
+            if codigo != 250:
+                raise RuntimeError(f"NOOP respondió {codigo}")
+            return "✅ Conexión SMTP exitosa"
+        except Exception:
+            descartar = True
+            raise
+        finally:
+            pool_smtp.liberar(sesion, descartar=descartar)
+    return sondear
+
+
+class MonitorSalud:
+    def __init__(self, sondas, intervalo=60, max_historial=120):
+        self.sondas = sondas
+        self.intervalo = intervalo
+        self.historial = {nombre: deque(maxlen=max_historial) for nombre in sondas}
+        self.lock = threading.Lock()
+        self.despertar = threading.Event()
+        self.detener = threading.Event()
+        self.hilo = None
+
+    def sondear(self):
+        """Ejecutar todas las sondas una vez y registrar su resultado"""
+        for nombre, sonda in self.sondas.items():
+            inicio = time.perf_counter()
+            try:
+                mensaje = sonda()
+                ok = True
+            except Exception as e:
+                mensaje = f"❌ {type(e).__name__}: {e}"
+                ok = False
+            resultado = ResultadoSonda(ok, (time.perf_counter() - inicio) * 1000, mensaje)
+            with self.lock:
+                self.historial[nombre].append(resultado)
+
+    def _ciclo(self):
+        while not self.detener.is_set():
+            try:
+                self.sondear()
+            except Exception:
+                pass
+            self.despertar.wait(self.intervalo)
+            self.despertar.clear()
+
+    def iniciar(self):
+        """Lanzar el hilo de sondeo (una vez por proceso)"""
+        if self.hilo is None or not self.hilo.is_alive():
+            self.detener.clear()
+            self.hilo = threading.Thread(target=self._ciclo, name="monitor_salud", daemon=True)
+            self.hilo.start()
+
+    def parar(self):
+        self.detener.set()
+        self.despertar.set()
+
+    def solicitar_sondeo(self):
+        """Adelantar el siguiente sondeo sin esperar su resultado"""
+        self.despertar.set()
+
+    def ultimo(self, nombre):
+        """Último ResultadoSonda de una sonda, o None si aún no corrió"""
+        with self.lock:
+            historial = self.historial.get(nombre)
+            return historial[-1] if historial else None
+
+    def latencias(self):
+        """{sonda: [(fecha, latencia_ms, ok)]} en orden cronológico"""
+        with self.lock:
+            return {nombre: [(r.fecha, r.latencia_ms, r.ok) for r in historial]
+                    for nombre, historial in self.historial.items()}
+
+
+_monitor = None
+_lock_monitor = threading.Lock()
+
+
+def obtener_monitor_salud():
+    """Monitor del proceso con las sondas SSH y SMTP ya en marcha"""
+    global _monitor
+    with _lock_monitor:
+        if _monitor is None:
+            # Los pools se obtienen aquí: el hilo no lee st.secrets
+            _monitor = MonitorSalud(
+                sondas={
+                    'SSH': sonda_ssh(obtener_pool_sftp()),
+                    'SMTP': sonda_smtp(obtener_pool_smtp())
+                },
+                intervalo=st.secrets.get("salud_intervalo", 60)
+            )
+            _monitor.iniciar()
+        return _monitor
@@ -0,0 +1,145 @@
+import html
+import re
+import threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html.parser import HTMLParser
+from string import Formatter
+
+# =============================================================================
+# PLANTILLAS DE CORREO PRECOMPILADAS (HTML + TEXTO PLANO)
+# =============================================================================
+#
+# Una plantilla se escribe como el cuerpo HTML de siempre con huecos {nombre}.
+# Al registrarla se parte una sola vez en (texto fijo, hueco) y se deriva la
+# versión en texto plano; enviar solo rellena los huecos. Registrar de nuevo
+# la misma fuente (cada rerun de Streamlit) devuelve la ya compilada.
+
+class Lista:
+    """Valor de un hueco que se muestra como <li> en HTML y como viñetas en texto"""
+
+    def __init__(self, elementos):
+        self.elementos = [str(elemento) for elemento in elementos]
+
+    def como_html(self):
+        return ''.join(f'<li>{html.escape(elemento)}</li>' for elemento in self.elementos)
+
+    def como_texto(self):
+        return ''.join(f'\n  - {elemento}' for elemento in self.elementos)
+
+
+def _compilar(fuente):
+    """Partir la fuente en [(texto_fijo, hueco_o_None)]"""
+    partes = []
+    for literal, campo, _, _ in Formatter().parse(fuente):
+        partes.append((literal, campo or None))
+    return partes
+
+
+def _rellenar(partes, valores, como_html):
+    salida = []
+    for literal, campo in partes:
+        salida.append(literal)
+        if campo is None:
+            continue
+        valor = valores[campo]
+        if isinstance(valor, Lista):
+            salida.append(valor.como_html() if como_html else valor.como_texto())
+        else:
+            salida.append(html.escape(str(valor)) if como_html else str(valor))
+    return ''.join(salida)
+
+
+_BLOQUES = {'p', 'div', 'h1', 'h2', 'h3', 'h4', 'tr', 'ul', 'ol', 'table'}
+
+
+class _ExtractorTexto(HTMLParser):
+    """HTML -> texto legible conservando los huecos {nombre} como texto"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.trozos = []
+        self.ignorar = 0
+
+    def handle_starttag(self, etiqueta, atributos):
+        if etiqueta in ('style', 'head', 'script'):
+            self.ignorar += 1
+        elif etiqueta == 'br' or etiqueta in _BLOQUES:
+            self.trozos.append('\n')
+        elif etiqueta == 'li':
+            self.trozos.append('\n  - ')
+        elif etiqueta == 'td':
+            self.trozos.append(' ')
+
+    def handle_endtag(self, etiqueta):
+        if etiqueta in ('style', 'head', 'script'):
+            self.ignorar = max(0, self.ignorar - 1)
+        elif etiqueta in _BLOQUES:
+            self.trozos.append('\n')
+
+    def handle_data(self, datos):
+        if not self.ignorar:
+            self.trozos.append(datos)
+
+
+def html_a_texto(fuente_html):
+    extractor = _ExtractorTexto()
+    extractor.feed(fuente_html)
+    extractor.close()
+    lineas = [re.sub(r'[ \t\r\f\v]+', ' ', linea).strip() for linea in ''.join(extractor.trozos).split('\n')]
+    # Como mucho una línea en blanco seguida
+    texto = re.sub(r'\n{3,}', '\n\n', '\n'.join(lineas))
+    return texto.strip() + '\n'
+
+
+class PlantillaCorreo:
+    def __init__(self, nombre, asunto, cuerpo_html):
+        self.nombre = nombre
+        self.fuente = (asunto, cuerpo_html)
+        self.asunto = _compilar(asunto)
+        self.html = _compilar(cuerpo_html)
+        # Los huecos son texto para el parser, así que la versión plana se deriva una vez
+        self.texto = _compilar(html_a_texto(cuerpo_html))
+        self.huecos = {campo for partes in (self.asunto, self.html) for _, campo in partes if campo}
+
+    def renderizar(self, **valores):
+        """Devuelve (asunto, html, texto) con los huecos rellenos"""
+        faltan = self.huecos - set(valores)
+        if faltan:
+            raise KeyError(f"Plantilla '{self.nombre}': faltan {', '.join(sorted(faltan))}")
+        return (_rellenar(self.asunto, valores, como_html=False),
+                _rellenar(self.html, valores, como_html=True),
+                _rellenar(self.texto, valores, como_html=False))
+
+    def mensaje(self, remitente, destinatario, copia=None, **valores):
+        """MIME multipart/alternative listo para encolar"""
+        asunto, cuerpo_html, cuerpo_texto = self.renderizar(**valores)
+        mensaje = MIMEMultipart('alternative')
+        mensaje['From'] = remitente
+        mensaje['To'] = destinatario
+        if copia:
+            mensaje['Cc'] = copia
+        mensaje['Subject'] = asunto
+        # El último alternativo es el preferido por el cliente
+        mensaje.attach(MIMEText(cuerpo_texto, 'plain', 'utf-8'))
+        mensaje.attach(MIMEText(cuerpo_html, 'html', 'utf-8'))
+        return mensaje
+
+
+_plantillas = {}
+_lock_plantillas = threading.Lock()
+
+
+def registrar_plantilla(nombre, asunto, cuerpo_html):
+    """Compilar la plantilla una vez por proceso (o de nuevo si su fuente cambió)"""
+    with _lock_plantillas:
+        plantilla = _plantillas.get(nombre)
+        if plantilla is None or plantilla.fuente != (asunto, cuerpo_html):
+            plantilla = PlantillaCorreo(nombre, asunto, cuerpo_html)
+            _plantillas[nombre] = plantilla
+        return plantilla
+
+
+def obtener_plantilla(nombre):
+    with _lock_plantillas:
+        return _plantillas[nombre]
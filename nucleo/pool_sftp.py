@@ -0,0 +1,200 @@
+import posixpath
+import threading
+import time
+
+import paramiko
+import streamlit as st
+
+from nucleo.transferencia import limpiar_parciales
+
+# =============================================================================
+# POOL DE SESIONES SFTP COMPARTIDO POR TODO EL PROCESO
+# =============================================================================
+
+class SesionSFTP:
+    """Conexión SSH + canal SFTP reutilizable dentro del pool"""
+
+    def __init__(self, ssh, sftp):
+        self.ssh = ssh
+        self.sftp = sftp
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+        self.prestada_desde = None
+        self.hilo = None  # hilo que tiene la sesión prestada
+
+    def esta_activa(self):
+        """Verificar que el transporte SSH siga abierto"""
+        transporte = self.ssh.get_transport() if self.ssh else None
+        return transporte is not None and transporte.is_active()
+
+    def verificar(self):
+        """Chequeo de salud con una operación SFTP mínima"""
+        try:
+            if not self.esta_activa():
+                return False
+            self.sftp.normalize('.')
+            return True
+        except Exception:
+            return False
+
+    def cerrar(self):
+        """Cerrar canal SFTP y conexión SSH"""
+        try:
+            if self.sftp:
+                self.sftp.close()
+            if self.ssh:
+                self.ssh.close()
+        except:
+            pass
+
+
+class PoolSFTP:
+    def __init__(self, hostname, port, username, password, max_inactivas=4,
+                 max_inactividad=300, intervalo_verificacion=30, timeout=30, al_iniciar=None):
+        self.parametros = {
+            'hostname': hostname,
+            'port': port,
+            'username': username,
+            'password': password,
+            'timeout': timeout
+        }
+        self.max_inactivas = max_inactivas
+        self.max_inactividad = max_inactividad
+        self.intervalo_verificacion = intervalo_verificacion
+        self.inactivas = []
+        self.prestadas = set()
+        self.lock = threading.Lock()
+        self.conexiones_creadas = 0
+        # Tarea de mantenimiento (sftp) -> None que se ejecuta con la primera conexión
+        self.al_iniciar = al_iniciar
+        self.iniciado = False
+
+    def _iniciar(self, sesion):
+        """Ejecutar `al_iniciar` una sola vez; un fallo no impide usar la sesión"""
+        with self.lock:
+            if self.iniciado or self.al_iniciar is None:
+                return
+            self.iniciado = True
+        try:
+            self.al_iniciar(sesion.sftp)
+        except Exception:
+            pass
+
+    def _crear_sesion(self):
+        """Abrir una conexión SSH nueva (handshake completo)"""
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(**self.parametros)
+        transporte = ssh.get_transport()
+        if transporte is not None:
+            transporte.set_keepalive(30)
+        sesion = SesionSFTP(ssh, ssh.open_sftp())
+        with self.lock:
+            self.conexiones_creadas += 1
+        return sesion
+
+    def _depurar(self):
+        """Cerrar sesiones inactivas caducadas y recuperar préstamos abandonados"""
+        ahora = time.monotonic()
+        descartadas = []
+        with self.lock:
+            vigentes = []
+            for sesion in self.inactivas:
+                if ahora - sesion.ultimo_uso > self.max_inactividad:
+                    descartadas.append(sesion)
+                else:
+                    vigentes.append(sesion)
+            self.inactivas = vigentes
+
+            # Un préstamo que nunca se devolvió (su hilo terminó sin liberarlo) se cierra;
+            # uno largo de un hilo vivo (una subida lenta) sigue en uso y no se toca
+            for sesion in list(self.prestadas):
+                if sesion.hilo is not None and not sesion.hilo.is_alive():
+                    self.prestadas.discard(sesion)
+                    descartadas.append(sesion)
+
+        for sesion in descartadas:
+            sesion.cerrar()
+
+    def adquirir(self):
+        """Tomar una sesión sana del pool o crear una nueva"""
+        self._depurar()
+
+        while True:
+            with self.lock:
+                sesion = self.inactivas.pop() if self.inactivas else None
+            if sesion is None:
+                sesion = self._crear_sesion()
+                self._iniciar(sesion)
+                break
+
+            # Solo se hace el viaje de ida y vuelta si la sesión lleva tiempo sin usarse
+            inactiva_por = time.monotonic() - sesion.ultimo_uso
+            if inactiva_por < self.intervalo_verificacion and sesion.esta_activa():
+                break
+            if sesion.verificar():
+                break
+            sesion.cerrar()
+
+        sesion.prestada_desde = time.monotonic()
+        sesion.hilo = threading.current_thread()
+        with self.lock:
+            self.prestadas.add(sesion)
+        return sesion
+
+    def liberar(self, sesion, descartar=False):
+        """Devolver una sesión al pool (o cerrarla si está rota o sobra)"""
+        if sesion is None:
+            return
+        sesion.ultimo_uso = time.monotonic()
+        sesion.prestada_desde = None
+        sesion.hilo = None
+
+        with self.lock:
+            self.prestadas.discard(sesion)
+            conservar = (not descartar and sesion.esta_activa()
+                         and len(self.inactivas) < self.max_inactivas)
+            if conservar:
+                self.inactivas.append(sesion)
+
+        if not conservar:
+            sesion.cerrar()
+
+    def cerrar_todo(self):
+        """Cerrar todas las sesiones inactivas del pool"""
+        with self.lock:
+            inactivas, self.inactivas = self.inactivas, []
+        for sesion in inactivas:
+            sesion.cerrar()
+
+    def estadisticas(self):
+        """Resumen del estado del pool para diagnóstico"""
+        with self.lock:
+            return {
+                'inactivas': len(self.inactivas),
+                'prestadas': len(self.prestadas),
+                'conexiones_creadas': self.conexiones_creadas
+            }
+
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def obtener_pool_sftp():
+    """Pool único por proceso para las credenciales de secrets.toml"""
+    clave = (st.secrets["remote_host"], st.secrets["remote_port"], st.secrets["remote_user"])
+    with _lock_pools:
+        pool = _pools.get(clave)
+        if pool is None:
+            directorio_uploads = posixpath.join(st.secrets.get("remote_dir", "/home/POLANCO6/ESCUELA"), "uploads")
+            pool = PoolSFTP(
+                hostname=st.secrets["remote_host"],
+                port=st.secrets["remote_port"],
+                username=st.secrets["remote_user"],
+                password=st.secrets["remote_password"],
+                # Parciales de subidas abortadas que ya nadie va a reanudar
+                al_iniciar=lambda sftp: limpiar_parciales(sftp, directorio_uploads)
+            )
+            _pools[clave] = pool
+        return pool
@@ -0,0 +1,240 @@
+import smtplib
+import threading
+import time
+
+import streamlit as st
+
+# =============================================================================
+# POOL DE CONEXIONES SMTP AUTENTICADAS COMPARTIDO POR TODO EL PROCESO
+# =============================================================================
+#
+# Igual que el pool SFTP: las sesiones (ya con STARTTLS y login hechos) se
+# prestan y se devuelven. Gmail corta las conexiones ociosas y limita los
+# mensajes por conexión, así que las sesiones caducan pronto y se jubilan
+# tras un número de envíos.
+
+# Respuesta 421: el servidor cierra la sesión, hay que abrir otra
+CODIGO_CIERRE = 421
+
+
+def configuracion_smtp():
+    """Servidor y credenciales SMTP desde secrets.toml"""
+    return {
+        'smtp_server': st.secrets.get("smtp_server", "smtp.gmail.com"),
+        'smtp_port': int(st.secrets.get("smtp_port", 587)),
+        'email_user': st.secrets.get("email_user", ""),
+        'email_password': st.secrets.get("email_password", "")
+    }
+
+
+def es_desconexion(error):
+    """La sesión quedó inservible (el mensaje puede reintentarse en otra)"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, OSError)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == CODIGO_CIERRE
+
+
+class SesionSMTP:
+    """Conexión SMTP autenticada reutilizable dentro del pool"""
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+        self.prestada_desde = None
+        self.hilo = None  # hilo que tiene la sesión prestada
+        self.enviados = 0
+
+    def esta_activa(self):
+        return self.servidor is not None and self.servidor.sock is not None
+
+    def verificar(self):
+        """Chequeo de salud con un NOOP"""
+        try:
+            return self.esta_activa() and self.servidor.noop()[0] == 250
+        except Exception:
+            return False
+
+    def cerrar(self):
+        try:
+            self.servidor.quit()
+        except Exception:
+            try:
+                self.servidor.close()
+            except Exception:
+                pass
+
+
+class PoolSMTP:
+    def __init__(self, servidor, puerto, usuario, password, max_inactivas=2, max_inactividad=120,
+                 intervalo_verificacion=30, max_mensajes_por_sesion=90, timeout=30):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.password = password
+        self.max_inactivas = max_inactivas
+        self.max_inactividad = max_inactividad
+        self.intervalo_verificacion = intervalo_verificacion
+        self.max_mensajes_por_sesion = max_mensajes_por_sesion
+        self.timeout = timeout
+        self.inactivas = []
+        self.prestadas = set()
+        self.lock = threading.Lock()
+        self.conexiones_creadas = 0
+        self.mensajes_enviados = 0
+
+    def _crear_sesion(self):
+        """Conectar, STARTTLS y login (el viaje caro que el pool evita repetir)"""
+        servidor = smtplib.SMTP(self.servidor, self.puerto, timeout=self.timeout)
+        try:
+            servidor.starttls()
+            servidor.login(self.usuario, self.password)
+        except Exception:
+            servidor.close()
+            raise
+        with self.lock:
+            self.conexiones_creadas += 1
+        return SesionSMTP(servidor)
+
+    def _depurar(self):
+        """Cerrar sesiones ociosas caducadas y préstamos abandonados"""
+        ahora = time.monotonic()
+        descartadas = []
+        with self.lock:
+            vigentes = []
+            for sesion in self.inactivas:
+                if ahora - sesion.ultimo_uso > self.max_inactividad:
+                    descartadas.append(sesion)
+                else:
+                    vigentes.append(sesion)
+            self.inactivas = vigentes
+
+            # Solo préstamos cuyo hilo terminó sin liberarlos: un envío largo sigue en uso
+            for sesion in list(self.prestadas):
+                if sesion.hilo is not None and not sesion.hilo.is_alive():
+                    self.prestadas.discard(sesion)
+                    descartadas.append(sesion)
+
+        for sesion in descartadas:
+            sesion.cerrar()
+
+    def adquirir(self):
+        """Tomar una sesión sana del pool o abrir una nueva"""
+        self._depurar()
+
+        while True:
+            with self.lock:
+                sesion = self.inactivas.pop() if self.inactivas else None
+            if sesion is None:
+                sesion = self._crear_sesion()
+                break
+
+            inactiva_por = time.monotonic() - sesion.ultimo_uso
+            if inactiva_por < self.intervalo_verificacion and sesion.esta_activa():
+                break
+            if sesion.verificar():
+                break
+            sesion.cerrar()
+
+        sesion.prestada_desde = time.monotonic()
+        sesion.hilo = threading.current_thread()
+        with self.lock:
+            self.prestadas.add(sesion)
+        return sesion
+
+    def liberar(self, sesion, descartar=False):
+        """Devolver una sesión al pool (o cerrarla si está rota, agotada o sobra)"""
+        if sesion is None:
+            return
+        sesion.ultimo_uso = time.monotonic()
+        sesion.prestada_desde = None
+        sesion.hilo = None
+
+        with self.lock:
+            self.prestadas.discard(sesion)
+            conservar = (not descartar and sesion.esta_activa()
+                         and sesion.enviados < self.max_mensajes_por_sesion
+                         and len(self.inactivas) < self.max_inactivas)
+            if conservar:
+                self.inactivas.append(sesion)
+
+        if not conservar:
+            sesion.cerrar()
+
+    def enviar_lote(self, mensajes):
+        """Enviar varios mensajes reutilizando sesiones del pool
+
+        `mensajes` es una lista de (remitente, destinatarios, contenido). Devuelve
+        una lista paralela con None (enviado) o la excepción de cada mensaje. Si
+        la sesión se cae a mitad se abre otra y se reintenta ese mensaje una vez;
+        si no se puede abrir ninguna, el resto del lote recibe ese error.
+        """
+        resultados = []
+        sesion = None
+        try:
+            for posicion, (remitente, destinatarios, contenido) in enumerate(mensajes):
+                error = None
+                for intento in range(2):
+                    if sesion is None:
+                        try:
+                            sesion = self.adquirir()
+                        except Exception as e:
+                            resultados.extend([e] * (len(mensajes) - posicion))
+                            return resultados
+                    try:
+                        sesion.servidor.sendmail(remitente, destinatarios, contenido)
+                        sesion.enviados += 1
+                        with self.lock:
+                            self.mensajes_enviados += 1
+                        error = None
+                        break
+                    except Exception as e:
+                        error = e
+                        if not es_desconexion(e):
+                            break  # el servidor rechazó este mensaje; la sesión sigue sirviendo
+                        self.liberar(sesion, descartar=True)
+                        sesion = None
+                resultados.append(error)
+
+                if sesion is not None and sesion.enviados >= self.max_mensajes_por_sesion:
+                    self.liberar(sesion)
+                    sesion = None
+        finally:
+            self.liberar(sesion)
+        return resultados
+
+    def cerrar_todo(self):
+        with self.lock:
+            inactivas, self.inactivas = self.inactivas, []
+        for sesion in inactivas:
+            sesion.cerrar()
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                'inactivas': len(self.inactivas),
+                'prestadas': len(self.prestadas),
+                'conexiones_creadas': self.conexiones_creadas,
+                'mensajes_enviados': self.mensajes_enviados
+            }
+
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def obtener_pool_smtp():
+    """Pool único por proceso para las credenciales de secrets.toml"""
+    config = configuracion_smtp()
+    clave = (config['smtp_server'], config['smtp_port'], config['email_user'])
+    with _lock_pools:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = PoolSMTP(
+                servidor=config['smtp_server'],
+                puerto=config['smtp_port'],
+                usuario=config['email_user'],
+                password=config['email_password']
+            )
+            _pools[clave] = pool
+        return pool
@@ -0,0 +1,208 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from nucleo.cache_csv import cache_csv
+from nucleo.datos_compartidos import obtener_datos_compartidos
+from nucleo.delta_log import (anexar_operaciones, guardar_tabla, operacion_anexar, operacion_eliminar,
+                              operacion_parchar)
+from nucleo.escritura_atomica import ConflictoEscritura, sellar_version, version_de
+from nucleo.espejo_local import invalidar_espejo, obtener_espejo
+from nucleo.pool_sftp import obtener_pool_sftp
+
+# =============================================================================
+# CARGA Y EDICIÓN REMOTA VIA SSH (COMÚN A LAS TRES APPS)
+# =============================================================================
+
+class CargadorRemoto:
+    def __init__(self, avisar_faltantes=True):
+        self.ssh = None
+        self.sftp = None
+        self.sesion = None
+        self.nivel = 0
+        self.avisar_faltantes = avisar_faltantes
+
+    def conectar(self):
+        """Tomar una conexión SSH del pool compartido del proceso"""
+        try:
+            # Llamadas anidadas reutilizan la sesión ya prestada
+            if self.sesion is not None:
+                if self.sesion.esta_activa():
+                    self.nivel += 1
+                    return True
+                obtener_pool_sftp().liberar(self.sesion, descartar=True)
+
+            self.sesion = obtener_pool_sftp().adquirir()
+            self.ssh = self.sesion.ssh
+            self.sftp = self.sesion.sftp
+            self.nivel = 1
+            return True
+        except Exception as e:
+            self.sesion = None
+            self.ssh = None
+            self.sftp = None
+            self.nivel = 0
+            st.error(f"❌ Error de conexión SSH: {e}")
+            return False
+
+    def desconectar(self):
+        """Devolver la conexión SSH al pool (no cierra el canal)"""
+        try:
+            if self.sesion is None:
+                return
+            self.nivel -= 1
+            if self.nivel <= 0:
+                obtener_pool_sftp().liberar(self.sesion)
+                self.sesion = None
+                self.ssh = None
+                self.sftp = None
+                self.nivel = 0
+        except:
+            pass
+
+    def crear_directorio_remoto(self, ruta):
+        """Crear directorio remoto recursivamente si no existe (requiere conexión abierta)"""
+        try:
+            self.sftp.stat(ruta)
+            return True  # El directorio ya existe
+        except FileNotFoundError:
+            try:
+                partes = ruta.strip('/').split('/')
+                path_actual = ''
+                for parte in partes:
+                    if parte:
+                        path_actual += '/' + parte
+                        try:
+                            self.sftp.stat(path_actual)
+                        except FileNotFoundError:
+                            self.sftp.mkdir(path_actual)
+                return True
+            except Exception as e:
+                st.error(f"❌ Error creando directorio {ruta}: {e}")
+                return False
+
+    def cargar_csv_remoto(self, ruta_remota):
+        """DataFrame compartido (solo lectura) de un CSV remoto; vacío si no se pudo cargar"""
+        # Modo espejo: leer la copia local sincronizada en segundo plano
+        espejo = obtener_espejo()
+        if espejo is not None and espejo.tiene_copia(ruta_remota):
+            try:
+                return espejo.leer_csv(ruta_remota, copiar=False)
+            except Exception:
+                pass
+
+        try:
+            if not self.conectar():
+                return pd.DataFrame()
+
+            # Reutilizar el DataFrame del proceso si mtime/tamaño no cambiaron
+            try:
+                return cache_csv.obtener(self.sftp, ruta_remota, copiar=False)
+            except FileNotFoundError:
+                if self.avisar_faltantes:
+                    st.warning(f"📁 Archivo remoto no encontrado: {os.path.basename(ruta_remota)}")
+                return pd.DataFrame()
+
+        except Exception as e:
+            st.warning(f"⚠️ Error cargando {os.path.basename(ruta_remota)}: {str(e)}")
+            return pd.DataFrame()
+        finally:
+            self.desconectar()
+
+
+class EditorRemoto:
+    """Guardados de tablas sobre la sesión del cargador: CSV completo o solo el delta"""
+
+    def __init__(self, cargador):
+        self.cargador = cargador
+        self.datos = obtener_datos_compartidos()
+        self.base_remota = self.datos.base_remota
+
+    def obtener_ruta_archivo(self, tipo_datos):
+        """Obtener ruta remota del archivo según el tipo de datos"""
+        return self.datos.ruta(tipo_datos)
+
+    def crear_directorio_remoto(self, directorio):
+        return self.cargador.crear_directorio_remoto(directorio)
+
+    def despues_de_escribir(self, ruta_remota):
+        """Gancho tras cada escritura confirmada (las apps invalidan aquí sus propias caches)"""
+
+    def avisar_conflicto(self, ruta_remota):
+        st.error(f"⚠️ {os.path.basename(ruta_remota)} fue modificado por otra sesión desde que se cargó. "
+                 "Recarga la página y vuelve a aplicar los cambios.")
+
+    def guardar_dataframe_remoto(self, df, ruta_remota, version_esperada=None, crear_directorio=False):
+        """Guardar DataFrame en el servidor remoto
+
+        Se escribe a un temporal y se renombra; si la tabla cambió en el servidor
+        desde que se cargó `df`, no se sobrescribe y se avisa del conflicto.
+        """
+        if version_esperada is None:
+            version_esperada = version_de(df)
+        try:
+            if not self.cargador.conectar():
+                st.error(f"❌ No se pudo conectar para guardar {os.path.basename(ruta_remota)}")
+                return False
+
+            if crear_directorio and not self.crear_directorio_remoto(os.path.dirname(ruta_remota)):
+                return False
+
+            # Subir al servidor remoto (temporal + rename atómico)
+            nueva_version = guardar_tabla(self.cargador.sftp, ruta_remota,
+                                          df.to_csv(index=False, encoding='utf-8'), version_esperada)
+            sellar_version(df, nueva_version)
+            self.datos.invalidar(ruta_remota)
+            self.despues_de_escribir(ruta_remota)
+            return True
+
+        except ConflictoEscritura:
+            # Sin esto, la recarga que pide el aviso podría servir la misma copia vieja
+            # (caché del proceso o espejo local) hasta la siguiente sincronización
+            self.datos.invalidar(ruta_remota)
+            self.avisar_conflicto(ruta_remota)
+            return False
+        except Exception as e:
+            st.error(f"❌ Error guardando archivo remoto {os.path.basename(ruta_remota)}: {e}")
+            return False
+        finally:
+            self.cargador.desconectar()
+
+    def _escribir_delta(self, operaciones, ruta_remota, df=None):
+        """Escribir operaciones en el delta de la tabla (sin reescribir el CSV)"""
+        try:
+            if not self.cargador.conectar():
+                return False
+            if anexar_operaciones(self.cargador.sftp, ruta_remota, operaciones, df):
+                cache_csv.invalidar(ruta_remota)  # se compactó: el CSV base cambió
+            invalidar_espejo(ruta_remota)
+            self.despues_de_escribir(ruta_remota)
+            return True
+        except FileNotFoundError:
+            return False  # la tabla base todavía no existe
+        except Exception as e:
+            st.warning(f"⚠️ No se pudo escribir el delta de {os.path.basename(ruta_remota)}: {e}")
+            return False
+        finally:
+            self.cargador.desconectar()
+
+    def anexar_filas_remoto(self, df, ruta_remota, filas):
+        """Enviar solo las filas nuevas; si no es posible, guardar la tabla completa (df ya las incluye)"""
+        if self._escribir_delta([operacion_anexar(fila) for fila in filas], ruta_remota, df):
+            return True
+        return self.guardar_dataframe_remoto(df, ruta_remota)
+
+    def parchar_fila_remoto(self, df, ruta_remota, campo, valor, cambios):
+        """Enviar solo los campos modificados de la fila campo == valor; si no, guardar la tabla completa"""
+        if campo in df.columns and pd.notna(valor) and str(valor).strip() != '':
+            if self._escribir_delta([operacion_parchar(campo, valor, cambios)], ruta_remota, df):
+                return True
+        return self.guardar_dataframe_remoto(df, ruta_remota)
+
+    def eliminar_filas_remoto(self, df, ruta_remota, campo, valor):
+        """Enviar solo la baja de las filas campo == valor; si no, guardar la tabla completa (df ya sin ellas)"""
+        if pd.notna(valor) and str(valor).strip() != '':
+            if self._escribir_delta([operacion_eliminar(campo, valor)], ruta_remota, df):
+                return True
+        return self.guardar_dataframe_remoto(df, ruta_remota)
@@ -0,0 +1,78 @@
+# =============================================================================
+# TABLAS PEREZOSAS: SE CARGAN DEL ALMACÉN LA PRIMERA VEZ QUE SE USAN
+# =============================================================================
+#
+# Las apps declaran sus tablas al importar el script, pero ninguna se pide al
+# servidor hasta que una pantalla la toca: cada página paga solo las tablas que
+# usa. Dentro de un mismo rerun cada tabla se carga una sola vez.
+
+class TablasPerezosas:
+    def __init__(self, datos_compartidos, al_fallar=None):
+        self.datos = datos_compartidos
+        self.al_fallar = al_fallar  # al_fallar(nombre, ruta_remota, error)
+        self.cargadas = {}
+
+    def tabla(self, nombre):
+        """Proxy de la tabla: se comporta como su DataFrame (de solo lectura)"""
+        return TablaPerezosa(self, nombre)
+
+    def precargar(self, nombres):
+        """Cargar a la vez las tablas que una pantalla va a usar y aún no se pidieron"""
+        pendientes = [nombre for nombre in nombres if nombre not in self.cargadas]
+        if not pendientes:
+            return
+        datos, fallos = self.datos.cargar(pendientes)
+        for nombre in pendientes:
+            self.cargadas[nombre] = datos[nombre]
+            if nombre in fallos and self.al_fallar is not None:
+                self.al_fallar(nombre, self.datos.ruta(nombre), fallos[nombre])
+
+    def obtener(self, nombre):
+        if nombre not in self.cargadas:
+            self.precargar([nombre])
+        return self.cargadas[nombre]
+
+
+class TablaPerezosa:
+    __slots__ = ('_tablas', '_nombre')
+
+    def __init__(self, tablas, nombre):
+        self._tablas = tablas
+        self._nombre = nombre
+
+    def cargar(self):
+        """DataFrame real de la tabla (para pasarlo a pandas o a st.dataframe)"""
+        return self._tablas.obtener(self._nombre)
+
+    @property
+    def cargada(self):
+        return self._nombre in self._tablas.cargadas
+
+    def __getattr__(self, atributo):
+        return getattr(self.cargar(), atributo)
+
+    def __getitem__(self, clave):
+        return self.cargar()[clave]
+
+    def __setitem__(self, clave, valor):
+        raise TypeError(f"La tabla '{self._nombre}' es compartida por todas las sesiones: "
+                        "edita una copia (df.copy())")
+
+    def __len__(self):
+        return len(self.cargar())
+
+    def __iter__(self):
+        return iter(self.cargar())
+
+    def __contains__(self, clave):
+        return clave in self.cargar()
+
+    def __repr__(self):
+        if not self.cargada:
+            return f"<TablaPerezosa {self._nombre} (sin cargar)>"
+        return repr(self.cargar())
+
+
+def materializar(df):
+    """El DataFrame detrás de un proxy (o el mismo objeto si ya es un DataFrame)"""
+    return df.cargar() if isinstance(df, TablaPerezosa) else df
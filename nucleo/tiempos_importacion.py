@@ -0,0 +1,122 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+
+# =============================================================================
+# TIEMPOS DE IMPORTACIÓN DE LAS APPS (ARRANQUE EN FRÍO)
+# =============================================================================
+#
+# Mide en un intérprete nuevo las importaciones de nivel de módulo de cada app
+# (sys.modules vacío, como al arrancar el servidor) y avisa si alguna librería
+# pesada (gráficas, imágenes, columnar) se cargó al arrancar.
+#
+# Después mide el rerun: Streamlit vuelve a ejecutar el script en un espacio de
+# nombres nuevo con sys.modules ya poblado, así que se repiten varias veces las
+# importaciones y las definiciones de nivel de módulo (def, class) y se da la
+# media. Lo que cada página dibuja o consulta al servidor no entra en la cifra.
+#
+#   python -m nucleo.tiempos_importacion [escuela10.py migracion10.py ...]
+
+APPS = ('escuela10.py', 'migracion10.py', 'aspirantes10.py')
+REPETICIONES_RERUN = 20
+
+# Librerías que solo deben cargarse en las páginas que las usan
+PESADAS = ('matplotlib', 'seaborn', 'PIL', 'scipy', 'pyarrow')
+
+_MEDIR = r'''
+import json, sys, time
+codigo = compile(sys.argv[1], "<importaciones>", "exec")
+inicio = time.perf_counter()
+exec(codigo, {})
+arranque = time.perf_counter() - inicio
+pesadas = [nombre for nombre in sys.argv[2].split(",") if nombre in sys.modules]
+rerun = compile(sys.argv[3], "<rerun>", "exec")
+repeticiones = int(sys.argv[4])
+inicio = time.perf_counter()
+for _ in range(repeticiones):
+    exec(rerun, {"__name__": "__main__"})
+rerun = (time.perf_counter() - inicio) / repeticiones
+print(json.dumps({"arranque": arranque, "rerun": rerun, "pesadas": pesadas}))
+'''
+
+
+def _sentencias(ruta_app, tipos):
+    with open(ruta_app, encoding='utf-8') as archivo:
+        arbol = ast.parse(archivo.read(), filename=ruta_app)
+    return "\n".join(ast.unparse(nodo) for nodo in arbol.body if isinstance(nodo, tipos))
+
+
+def importaciones_de_app(ruta_app):
+    """Código con las sentencias import de nivel de módulo de un script"""
+    return _sentencias(ruta_app, (ast.Import, ast.ImportFrom))
+
+
+def rerun_de_app(ruta_app):
+    """Lo que un rerun repite sin tocar el servidor: importaciones y definiciones de nivel de módulo"""
+    return _sentencias(ruta_app, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef,
+                                  ast.ClassDef))
+
+
+def _modulos_mas_lentos(salida_importtime, importaciones, cuantos):
+    """Módulos que importa la app con más tiempo acumulado según -X importtime"""
+    raices = set()
+    for nodo in ast.parse(importaciones).body:
+        nombres = [alias.name for alias in nodo.names] if isinstance(nodo, ast.Import) else [nodo.module or ""]
+        raices.update(nombre.split(".")[0] for nombre in nombres)
+    tiempos = []
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, paquete = linea[len("import time:"):].split("|")
+        if paquete[1:].startswith(" ") or not acumulado.strip().isdigit():
+            continue  # solo módulos importados directamente
+        if paquete.strip().split(".")[0] not in raices:
+            continue  # arranque del intérprete (site, encodings...)
+        tiempos.append((int(acumulado) / 1e6, paquete.strip()))
+    return sorted(tiempos, reverse=True)[:cuantos]
+
+
+def medir_app(ruta_app, cuantos=5, repeticiones=REPETICIONES_RERUN):
+    """Tiempo de importación de una app en un proceso nuevo y de cada rerun (segundos)
+
+    Devuelve {'arranque', 'rerun', 'pesadas', 'mas_lentos'}. Las apps se miden
+    desde su propio directorio para que `nucleo` se resuelva como en producción.
+    """
+    ruta_app = os.path.abspath(ruta_app)
+    importaciones = importaciones_de_app(ruta_app)
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _MEDIR,
+         importaciones, ",".join(PESADAS), rerun_de_app(ruta_app), str(repeticiones)],
+        cwd=os.path.dirname(ruta_app), capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1] if resultado.stderr.strip()
+                           else f"código de salida {resultado.returncode}")
+    medicion = json.loads(resultado.stdout.strip().splitlines()[-1])
+    medicion['mas_lentos'] = _modulos_mas_lentos(resultado.stderr, importaciones, cuantos)
+    return medicion
+
+
+def main(apps=None):
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fallidas = 0
+    for app in apps or APPS:
+        try:
+            medicion = medir_app(os.path.join(base, app))
+        except Exception as e:
+            print(f"❌ {app}: {e}")
+            fallidas += 1
+            continue
+        print(f"📦 {app}: arranque en frío {medicion['arranque'] * 1000:.0f} ms, "
+              f"rerun {medicion['rerun'] * 1000:.1f} ms")
+        for segundos, paquete in medicion['mas_lentos']:
+            print(f"    {segundos * 1000:8.0f} ms  {paquete}")
+        if medicion['pesadas']:
+            print(f"    ⚠️ cargadas al arrancar: {', '.join(medicion['pesadas'])}")
+    return 1 if fallidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,203 @@
+import json
+import posixpath
+import stat
+import threading
+import time
+import uuid
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
+
+import streamlit as st
+
+from nucleo.columnar import escribir_sidecar
+from nucleo.delta_log import bloqueo_tabla, descartar_delta, version_tabla
+from nucleo.escritura_atomica import ConflictoEscritura, escribir_atomico
+from nucleo.pool_sftp import obtener_pool_sftp
+
+# =============================================================================
+# COMMIT TRANSACCIONAL DE VARIAS TABLAS (PREPARAR / MANIFIESTO / CAMBIAR)
+# =============================================================================
+#
+# 1. Cada tabla se escribe junto a su destino como <tabla>.csv.tmp-tx-<id>
+# 2. Se comprueban las versiones y se escribe transacciones/<id>.json
+# 3. Cada temporal se renombra sobre su tabla y se borra el manifiesto
+#
+# Un manifiesto presente significa que el commit está decidido: si el proceso
+# muere a mitad del paso 3, la recuperación completa los renombrados pendientes.
+# Temporales sin manifiesto son commits abortados y se borran. Del paso 2 al 3
+# se tiene el candado de cada tabla (nucleo.delta_log): ningún anexo al delta
+# cae entre la comprobación de versión y el descarte del delta.
+
+DIRECTORIO_TRANSACCIONES = "transacciones"
+PREFIJO_PREPARADO = ".tmp-tx-"
+# Antigüedad mínima de un temporal huérfano antes de borrarlo (otra réplica puede estar preparando)
+ANTIGUEDAD_HUERFANOS = 600
+
+
+def _ruta_preparada(ruta, id_transaccion):
+    return f"{ruta}{PREFIJO_PREPARADO}{id_transaccion}"
+
+
+def _asegurar_directorio(sftp, directorio):
+    try:
+        sftp.stat(directorio)
+    except FileNotFoundError:
+        sftp.mkdir(directorio)
+
+
+def _renombrar(sftp, origen, destino):
+    """Lanza FileNotFoundError si `origen` ya no existe"""
+    try:
+        sftp.posix_rename(origen, destino)
+    except FileNotFoundError:
+        raise
+    except IOError:
+        sftp.stat(origen)
+        try:
+            sftp.remove(destino)
+        except FileNotFoundError:
+            pass
+        sftp.rename(origen, destino)
+
+
+def commit_tablas(sftp, base_remota, tablas):
+    """Reemplazar varias tablas a la vez: o se aplican todas o ninguna
+
+    `tablas` es una lista de (ruta_csv, texto_csv, version_esperada); una
+    versión None exige que la tabla todavía no exista. Lanza ConflictoEscritura
+    (sin tocar nada) si alguna tabla cambió desde su carga.
+    """
+    id_transaccion = datetime.now().strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    preparadas = []
+    with ExitStack() as candados:
+        try:
+            # 1. Preparar: escrituras en serie sobre la misma sesión, sin esperar cada ACK
+            for ruta, texto_csv, _ in tablas:
+                temporal = _ruta_preparada(ruta, id_transaccion)
+                with sftp.file(temporal, 'w') as archivo_remoto:
+                    archivo_remoto.set_pipelined(True)
+                    archivo_remoto.write(texto_csv)
+                preparadas.append(temporal)
+
+            # Candados en orden fijo: dos commits con tablas en común no se bloquean mutuamente
+            for ruta in sorted({ruta for ruta, _, _ in tablas}):
+                candados.enter_context(bloqueo_tabla(sftp, ruta))
+
+            for ruta, _, version_esperada in tablas:
+                actual = version_tabla(sftp, ruta)
+                if actual != version_esperada:
+                    raise ConflictoEscritura(ruta, version_esperada, actual)
+
+            # 2. Manifiesto: a partir de aquí el commit está decidido
+            directorio = posixpath.join(base_remota, DIRECTORIO_TRANSACCIONES)
+            _asegurar_directorio(sftp, directorio)
+            manifiesto = {
+                'id': id_transaccion,
+                'fecha': datetime.now().isoformat(),
+                'archivos': [{'destino': ruta, 'preparado': temporal}
+                             for (ruta, _, _), temporal in zip(tablas, preparadas)]
+            }
+            ruta_manifiesto = posixpath.join(directorio, f"{id_transaccion}.json")
+            escribir_atomico(sftp, ruta_manifiesto, json.dumps(manifiesto, ensure_ascii=False, indent=2))
+        except BaseException:
+            for temporal in preparadas:
+                try:
+                    sftp.remove(temporal)
+                except Exception:
+                    pass
+            raise
+
+        # 3. Cambiar (con los candados aún tomados)
+        _aplicar_manifiesto(sftp, manifiesto, bloquear=False)
+        _borrar(sftp, ruta_manifiesto)
+
+    for ruta, texto_csv, _ in tablas:
+        escribir_sidecar(sftp, ruta, texto_csv)
+    return id_transaccion
+
+
+def _aplicar_manifiesto(sftp, manifiesto, bloquear=True):
+    """Renombrar los temporales que sigan pendientes (idempotente)"""
+    for archivo in manifiesto['archivos']:
+        with bloqueo_tabla(sftp, archivo['destino']) if bloquear else nullcontext():
+            try:
+                _renombrar(sftp, archivo['preparado'], archivo['destino'])
+            except FileNotFoundError:
+                continue  # ya renombrado (antes de la interrupción o por otra réplica)
+            descartar_delta(sftp, archivo['destino'])
+
+
+def _borrar(sftp, ruta):
+    try:
+        sftp.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def recuperar_transacciones(sftp, base_remota, subdirectorios=("datos", "config")):
+    """Completar commits interrumpidos y borrar preparaciones abandonadas
+
+    Devuelve la lista de ids de transacción completados.
+    """
+    completadas = []
+    directorio = posixpath.join(base_remota, DIRECTORIO_TRANSACCIONES)
+    try:
+        manifiestos = [nombre for nombre in sftp.listdir(directorio) if nombre.endswith('.json')]
+    except FileNotFoundError:
+        manifiestos = []
+
+    vigentes = set()
+    for nombre in sorted(manifiestos):
+        ruta_manifiesto = posixpath.join(directorio, nombre)
+        try:
+            with sftp.file(ruta_manifiesto, 'r') as archivo_remoto:
+                manifiesto = json.loads(archivo_remoto.read())
+        except FileNotFoundError:
+            continue
+        _aplicar_manifiesto(sftp, manifiesto)
+        _borrar(sftp, ruta_manifiesto)
+        completadas.append(manifiesto['id'])
+        vigentes.add(manifiesto['id'])
+
+    ahora = time.time()
+    for subdirectorio in subdirectorios:
+        try:
+            atributos = sftp.listdir_attr(posixpath.join(base_remota, subdirectorio))
+        except FileNotFoundError:
+            continue
+        for atributo in atributos:
+            if PREFIJO_PREPARADO not in atributo.filename or not stat.S_ISREG(atributo.st_mode or 0):
+                continue
+            id_transaccion = atributo.filename.split(PREFIJO_PREPARADO, 1)[1]
+            if id_transaccion in vigentes or ahora - (atributo.st_mtime or 0) < ANTIGUEDAD_HUERFANOS:
+                continue
+            _borrar(sftp, posixpath.join(base_remota, subdirectorio, atributo.filename))
+
+    return completadas
+
+
+_recuperacion_hecha = False
+_lock_recuperacion = threading.Lock()
+
+
+def recuperar_al_iniciar():
+    """Ejecutar la recuperación una sola vez por proceso; devuelve los ids completados"""
+    global _recuperacion_hecha
+    with _lock_recuperacion:
+        if _recuperacion_hecha:
+            return []
+
+        pool = obtener_pool_sftp()
+        sesion = pool.adquirir()
+        descartar = False
+        try:
+            completadas = recuperar_transacciones(
+                sesion.sftp, st.secrets.get("remote_dir", "/home/POLANCO6/ESCUELA")
+            )
+            _recuperacion_hecha = True
+            return completadas
+        except Exception:
+            descartar = True
+            raise
+        finally:
+            pool.liberar(sesion, descartar=descartar)
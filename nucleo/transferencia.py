@@ -0,0 +1,175 @@
+import hashlib
+import io
+import posixpath
+import stat
+import time
+
+import streamlit as st
+
+# =============================================================================
+# TRANSFERENCIAS POR BLOQUES (SUBIDA REANUDABLE / DESCARGA CON PROGRESO)
+# =============================================================================
+#
+# Tamaño de bloque configurable en secrets.toml:
+#
+#     sftp_bloque_kb = 256
+#
+# Una subida se escribe primero en <directorio>/.tmp-parcial-<clave>-<sha256>,
+# con la clave estable del archivo (la matrícula en uploads/) y el checksum de
+# su contenido, no su nombre final: si se corta, el siguiente intento con el
+# mismo contenido continúa desde el último byte confirmado en el servidor
+# aunque el nombre final lleve otra marca de tiempo, y al terminar se renombra.
+# Los parciales abandonados se barren al abrir el pool (nucleo.pool_sftp).
+
+TAMANO_BLOQUE_DEFECTO = 256 * 1024
+PREFIJO_PARCIAL = '.tmp-parcial-'
+# Un parcial sin tocar en este tiempo ya no se va a reanudar
+ANTIGUEDAD_PARCIALES = 24 * 3600
+
+
+def tamano_bloque_configurado():
+    try:
+        return int(st.secrets.get("sftp_bloque_kb", TAMANO_BLOQUE_DEFECTO // 1024)) * 1024
+    except Exception:
+        return TAMANO_BLOQUE_DEFECTO
+
+
+def _como_archivo(origen):
+    """Aceptar bytes o un objeto tipo archivo (UploadedFile de Streamlit, BytesIO, ...)"""
+    if isinstance(origen, (bytes, bytearray)):
+        return io.BytesIO(origen)
+    return origen
+
+
+def _tamano_origen(origen):
+    posicion = origen.tell()
+    tamano = origen.seek(0, io.SEEK_END)
+    origen.seek(posicion)
+    return tamano
+
+
+def _checksum(origen, tamano_bloque):
+    sha256 = hashlib.sha256()
+    origen.seek(0)
+    while True:
+        bloque = origen.read(tamano_bloque)
+        if not bloque:
+            break
+        sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+def ruta_parcial(directorio_remoto, clave, sha256):
+    clave = "".join(c for c in str(clave) if c.isalnum() or c in ('-', '_')) or 'archivo'
+    return posixpath.join(directorio_remoto, f"{PREFIJO_PARCIAL}{clave}-{sha256[:16]}")
+
+
+def subir_por_bloques(sftp, origen, ruta_remota, progreso=None, tamano_bloque=None, reanudar=True, clave=None):
+    """Subir `origen` a `ruta_remota` bloque a bloque; devuelve el sha256 del contenido
+
+    `progreso(transferidos, total)` se llama tras cada bloque. Con `reanudar`,
+    un parcial con la misma `clave` (por defecto el nombre del archivo) y el
+    mismo contenido se continúa.
+    """
+    tamano_bloque = tamano_bloque or tamano_bloque_configurado()
+    origen = _como_archivo(origen)
+    total = _tamano_origen(origen)
+
+    # El checksum se calcula en local antes de subir: identifica el parcial y se devuelve
+    sha256 = _checksum(origen, tamano_bloque)
+    parcial = ruta_parcial(posixpath.dirname(ruta_remota),
+                           clave if clave is not None else posixpath.basename(ruta_remota), sha256)
+
+    desde = 0
+    if reanudar:
+        try:
+            desde = min(sftp.stat(parcial).st_size, total)
+        except FileNotFoundError:
+            desde = 0
+    # Solo se reanuda en frontera de bloque: lo escrito después se reescribe
+    desde -= desde % tamano_bloque
+    origen.seek(desde)
+
+    with sftp.file(parcial, 'r+b' if desde else 'wb') as archivo_remoto:
+        archivo_remoto.set_pipelined(True)
+        archivo_remoto.seek(desde)
+        if desde:
+            archivo_remoto.truncate(desde)
+        transferidos = desde
+        if progreso:
+            progreso(transferidos, total)
+        while True:
+            bloque = origen.read(tamano_bloque)
+            if not bloque:
+                break
+            archivo_remoto.write(bloque)
+            transferidos += len(bloque)
+            if progreso:
+                progreso(transferidos, total)
+
+    try:
+        sftp.posix_rename(parcial, ruta_remota)
+    except IOError:
+        try:
+            sftp.remove(ruta_remota)
+        except FileNotFoundError:
+            pass
+        sftp.rename(parcial, ruta_remota)
+    return sha256
+
+
+def limpiar_parciales(sftp, directorio_remoto, antiguedad=ANTIGUEDAD_PARCIALES):
+    """Borrar los parciales de subidas abandonadas en `directorio_remoto`; devuelve cuántos"""
+    try:
+        atributos = sftp.listdir_attr(directorio_remoto)
+    except FileNotFoundError:
+        return 0
+
+    borrados = 0
+    ahora = time.time()
+    for atributo in atributos:
+        # También los del formato anterior (<archivo>.tmp-parcial-<tamaño>-<huella>)
+        if PREFIJO_PARCIAL not in atributo.filename or not stat.S_ISREG(atributo.st_mode or 0):
+            continue
+        if ahora - (atributo.st_mtime or 0) < antiguedad:
+            continue  # puede ser una subida en curso o por reanudar
+        try:
+            sftp.remove(posixpath.join(directorio_remoto, atributo.filename))
+            borrados += 1
+        except FileNotFoundError:
+            pass
+    return borrados
+
+
+def descargar_por_bloques(sftp, ruta_remota, destino=None, progreso=None, tamano_bloque=None):
+    """Leer `ruta_remota` en bloques con lecturas adelantadas
+
+    Escribe en `destino` (objeto tipo archivo) y lo devuelve; sin destino
+    devuelve los bytes.
+    """
+    tamano_bloque = tamano_bloque or tamano_bloque_configurado()
+    salida = destino if destino is not None else io.BytesIO()
+
+    with sftp.file(ruta_remota, 'rb') as archivo_remoto:
+        total = archivo_remoto.stat().st_size
+        archivo_remoto.prefetch(total)
+        transferidos = 0
+        while True:
+            bloque = archivo_remoto.read(tamano_bloque)
+            if not bloque:
+                break
+            salida.write(bloque)
+            transferidos += len(bloque)
+            if progreso:
+                progreso(transferidos, total)
+
+    return salida if destino is not None else salida.getvalue()
+
+
+def barra_progreso(texto):
+    """Callback de progreso que actualiza un st.progress"""
+    barra = st.progress(0.0, text=texto)
+
+    def actualizar(transferidos, total):
+        barra.progress(min(transferidos / total, 1.0) if total else 1.0, text=texto)
+    return actualizar